@@ -1,125 +1,449 @@
 from typing import List, Dict, Any, Literal, Annotated, Set
+from collections import OrderedDict
 from datetime import datetime
+from enum import StrEnum
 import uuid
 import json
+import asyncio
+import logging
+import time
 from langchain.schema import AIMessage, HumanMessage, SystemMessage
 from langchain.schema.messages import ToolMessage
+from langchain_core.messages import RemoveMessage
 from langchain.schema.runnable import RunnableConfig, RunnableLambda, RunnableSerializable
 from langgraph.graph import END, StateGraph
-from langgraph.graph.message import MessagesState
 from langgraph.prebuilt import ToolNode
+from langgraph.prebuilt.tool_node import TOOL_CALL_ERROR_TEMPLATE
 from langgraph.checkpoint.memory import MemorySaver
 from langchain.tools import tool
 from langchain.schema import OutputParserException
+from pydantic import BaseModel, Field
 
-from core import get_model, settings
+from core import build_system_message, get_model, get_prompt_cache_usage, metrics, settings
+from core.admission import ProviderBusyError
+from agents.context_window import CountedMessagesState, build_context
+from agents.conversation_summary import amoved_on, asummarize_conversation, messages_after
+from agents.deadline import (
+    Degradation,
+    cut_tool_loop,
+    deadline_model,
+    record_degradations,
+    skip_inner_voices,
+)
+from agents.inner_voice_cache import get_inner_voice_cache, get_semantic_inner_voice_cache
+from agents.inner_voice_reuse import (
+    InnerVoiceResult,
+    reusable_voices,
+    reuse_limit,
+    update_results,
+)
+from agents.inner_voice_speculation import get_inner_voice_speculation
+from agents.thread_memory import ThreadMemory, aupdate_memory, memory_enabled, recall
+from agents.turn_classifier import TurnRoute, aclassify_turn
+from agents.user_memory import aremember_user_facts, arecall_user_facts, memory_namespace
 from agents.character_prompts import (
-    get_basic_self_prompt,
-    get_emotional_self_prompt,
-    get_social_self_prompt,
-    get_system_prompt,
-    set_character
+    CharacterPrompts,
+    get_character_prompts,
+    with_summary,
+    with_user_facts,
 )
+from memory import MemoryItem
+
+logger = logging.getLogger(__name__)
 
 # Define our state
-class CharacterState(MessagesState, total=False):
+class CharacterState(CountedMessagesState, total=False):
     """State for character roleplay agent."""
     remaining_steps: int = 10
+    # Answers of the inner council for the current user message (council mode only)
+    inner_voices: dict[str, str]
+    # Prompt-cache usage of the inner council call
+    inner_voices_usage: dict[str, int]
+    # Whether the current user message is small talk or needs the inner voices
+    turn_route: TurnRoute
+    # Start of the current turn on the monotonic clock, for the per-route latency
+    turn_started_at: float
+    # Rolling summary of the turns up to and including the message summarized_through
+    summary: str
+    summarized_through: str
+    # Last indexed turn and the older turns recalled for the current one
+    thread_memory: ThreadMemory
+    # Long-term facts about the user relevant to the current message
+    user_facts: list[MemoryItem]
+    # Last result of each inner voice with the fingerprint of its message, and the ones the
+    # current turn reuses instead of consulting the voice again
+    inner_voice_results: dict[str, InnerVoiceResult]
+    reused_voices: dict[str, str]
+    # Shortcuts taken in the current turn to meet the request's deadline, see `Degradation`
+    degradations: list[Degradation]
+
+
+class InnerVoiceMode(StrEnum):
+    """How the character consults its inner voices before answering."""
+
+    # One inner voice per model turn: model -> tools -> model, up to three times
+    SEQUENTIAL = "sequential"
+    # All three inner voices in a single model turn, run concurrently by the tools node,
+    # followed by one synthesis call
+    FAN_OUT = "fan_out"
+    # All three inner voices from one structured-output call, followed by one answer call
+    # without tools
+    COUNCIL = "council"
+
+
+INNER_VOICE_TOOLS = ("basic_self", "emotional_self", "social_self")
+
+
+class InnerVoiceCompaction(StrEnum):
+    """What happens to the inner-voice tool calls and results of earlier turns."""
+
+    # Keep them in the thread and send them with every later turn
+    OFF = "off"
+    # Remove them from the thread; the checkpoint history keeps the originals
+    DROP = "drop"
+    # Shorten the tool results to a short excerpt
+    COLLAPSE = "collapse"
+
+
+# Length of a collapsed inner-voice result
+COLLAPSED_RESULT_CHARS = 160
+
+
+class InnerCouncil(BaseModel):
+    """The perspectives of all three inner voices on the current situation."""
+
+    basic_self: str = Field(
+        description="The basic self on core needs, safety and practical concerns"
+    )
+    emotional_self: str = Field(
+        description="The emotional self on feelings, desires and fears"
+    )
+    social_self: str = Field(
+        description="The social self on relationships, reputation and social norms"
+    )
+
+
+def _current_turn(messages: list) -> list:
+    """Return the messages after the most recent human message."""
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            return messages[index + 1:]
+    return messages
+
+
+def _consulted_this_turn(messages: list) -> bool:
+    """Check whether the inner voices already answered for the current user message."""
+    return any(isinstance(message, ToolMessage) for message in _current_turn(messages))
+
+
+def _complete_fan_out(response: AIMessage) -> AIMessage:
+    """Make sure a fan-out turn consults every inner voice.
+
+    Models occasionally emit only a subset of the requested tool calls. The missing inner
+    voices are added with the same situation description, so the tools node can run all
+    three at once instead of the model asking for them in later turns.
+    """
+    voice_calls = [call for call in response.tool_calls if call["name"] in INNER_VOICE_TOOLS]
+    if not voice_calls:
+        return response
+    called = {call["name"] for call in voice_calls}
+    missing = [name for name in INNER_VOICE_TOOLS if name not in called]
+    if not missing:
+        return response
+    tool_calls = list(response.tool_calls) + [
+        {
+            "name": name,
+            "args": dict(voice_calls[0]["args"]),
+            "id": f"call_{uuid.uuid4().hex[:24]}",
+            "type": "tool_call",
+        }
+        for name in missing
+    ]
+    return response.model_copy(update={"tool_calls": tool_calls})
+
+
+def _compact_inner_voices(messages: list, compaction: InnerVoiceCompaction) -> list:
+    """Return the message updates that compact inner-voice calls before the current turn.
+    
+    Dropping removes the tool-call messages and their results; a tool-call message that also
+    has text keeps the text. Collapsing shortens each result to an excerpt. Replacements
+    keep the message id, so `add_messages` swaps them in place, and are marked `compacted`
+    so they are not processed again.
+    """
+    if compaction == InnerVoiceCompaction.OFF:
+        return []
+    turn_start = len(messages) - len(_current_turn(messages))
+    updates = []
+    for message in messages[:turn_start]:
+        if message.response_metadata.get("compacted"):
+            continue
+        if isinstance(message, AIMessage) and any(
+            call["name"] in INNER_VOICE_TOOLS for call in message.tool_calls
+        ):
+            if compaction != InnerVoiceCompaction.DROP:
+                continue
+            if message.content:
+                updates.append(AIMessage(
+                    content=message.content, id=message.id, response_metadata={"compacted": True}
+                ))
+            else:
+                updates.append(RemoveMessage(id=message.id))
+        elif isinstance(message, ToolMessage) and message.name in INNER_VOICE_TOOLS:
+            if compaction == InnerVoiceCompaction.DROP:
+                updates.append(RemoveMessage(id=message.id))
+            elif isinstance(message.content, str):
+                content = message.content
+                if len(content) > COLLAPSED_RESULT_CHARS:
+                    content = content[:COLLAPSED_RESULT_CHARS].rstrip() + " […]"
+                updates.append(message.model_copy(update={
+                    "content": content, "artifact": None, "response_metadata": {"compacted": True}
+                }))
+    return updates
+
+
+async def arecover_inner_voices(agent, config: RunnableConfig) -> list[ToolMessage]:
+    """Return the original inner-voice results of a thread, including compacted ones.
+    
+    Compaction only changes the latest state; earlier checkpoints keep every message as it
+    was first written.
+    """
+    results: dict[str, ToolMessage] = {}
+    async for snapshot in agent.aget_state_history(config):
+        for message in snapshot.values.get("messages", []):
+            if (
+                isinstance(message, ToolMessage)
+                and message.name in INNER_VOICE_TOOLS
+                and not message.response_metadata.get("compacted")
+            ):
+                results.setdefault(message.id, message)
+    # The history is newest first; return the results in conversation order
+    return list(reversed(results.values()))
+
+
+def _strip_tool_calls(response: AIMessage) -> AIMessage:
+    """Turn a response into a final answer by dropping any further tool calls."""
+    if not response.tool_calls:
+        return response
+    return AIMessage(
+        content=response.content,
+        id=response.id,
+        response_metadata=response.response_metadata,
+        usage_metadata=response.usage_metadata,
+    )
+
+
+def _thread_length_bucket(messages: list) -> str:
+    """Label a thread by its number of user messages, for metrics over thread length."""
+    turns = sum(isinstance(message, HumanMessage) for message in messages)
+    for upper in (5, 10, 20, 50):
+        if turns <= upper:
+            return f"<={upper}"
+    return ">50"
+
+
+def _inner_voice_model(config: RunnableConfig, voices: int = 1) -> tuple[str, Any]:
+    """Return a cache label and the model for the inner voices of a request.
+    
+    The model and its output cap come from `inner_voice_model` / `inner_voice_max_tokens` in
+    the agent_config, then INNER_VOICE_MODEL / INNER_VOICE_MAX_TOKENS, and the model falls
+    back to the model of the request. A call that answers for several voices at once gets
+    the cap once per voice.
+    """
+    configurable = config.get("configurable", {})
+    model_name = (
+        configurable.get("inner_voice_model")
+        or settings.INNER_VOICE_MODEL
+        or configurable.get("model")
+        or settings.DEFAULT_MODEL
+    )
+    max_tokens = configurable.get("inner_voice_max_tokens", settings.INNER_VOICE_MAX_TOKENS)
+    if max_tokens:
+        max_tokens *= voices
+    # Capped responses may differ, so the cap is part of the cache partition
+    label = f"{model_name}:max_tokens={max_tokens}" if max_tokens else str(model_name)
+    return label, get_model(model_name, max_tokens=max_tokens)
+
+
+def _turn_prompt_cache_usage(messages: list, response: AIMessage) -> dict[str, int]:
+    """Sum input and cache-read prompt tokens over every LLM call for the current user message.
+
+    Inner-voice tools report the usage of their call as the ToolMessage artifact.
+    """
+    totals = {"input_tokens": 0, "cached_tokens": 0}
+    for message in [*_current_turn(messages), response]:
+        if isinstance(message, AIMessage):
+            usage = get_prompt_cache_usage(message)
+        elif isinstance(message, ToolMessage) and isinstance(message.artifact, dict):
+            usage = message.artifact.get("prompt_cache", {})
+        else:
+            continue
+        for key in totals:
+            totals[key] += usage.get(key, 0)
+    return totals
+
+
+async def aconsult_inner_voice(
+    prompts: CharacterPrompts,
+    voice: str,
+    message: str,
+    config: RunnableConfig,
+) -> tuple[str, dict]:
+    """Consult one inner voice; returns its response and the ToolMessage artifact.
+    
+    Runs on the inner-voice model of the request, see `_inner_voice_model`. Responses kept
+    from the turn before for this turn are used first, see `aspeculate_inner_voices`. When
+    INNER_VOICE_CACHE_ENABLED is set, responses are memoized per character, voice, model and
+    normalized message; INNER_VOICE_SEMANTIC_CACHE_ENABLED also reuses responses for similar
+    messages.
+    """
+    speculation = get_inner_voice_speculation()
+    thread_id = config.get("configurable", {}).get("thread_id")
+    if speculation is not None and thread_id:
+        if (speculated := speculation.use(thread_id, voice)) is not None:
+            return speculated, {"inner_voice_speculation": "hit"}
+
+    model_name, model = _inner_voice_model(config)
+    cache = get_inner_voice_cache()
+    if cache is not None:
+        cache_key = cache.make_key(prompts.key, voice, model_name, message)
+        if (cached := await cache.aget(cache_key)) is not None:
+            return cached, {"inner_voice_cache": "hit"}
+    semantic_cache = get_semantic_inner_voice_cache()
+    if semantic_cache is not None:
+        cached = semantic_cache.lookup(prompts.key, voice, model_name, message)
+        if cached is not None:
+            return cached, {"inner_voice_cache": "semantic_hit"}
+
+    messages = [
+        # The character background is the shared, cacheable start of every inner voice
+        build_system_message(
+            prompts.inner_voice_prompt(voice), model, cacheable_prefix=prompts.prefix
+        ),
+        HumanMessage(content=f"Respond to this situation: {message}")
+    ]
+    response = await model.with_config(tags=["skip_stream"]).ainvoke(messages, config)
+    if cache is not None and isinstance(response.content, str):
+        await cache.aput(cache_key, response.content)
+    if semantic_cache is not None and isinstance(response.content, str):
+        semantic_cache.add(prompts.key, voice, model_name, message, response.content)
+    return response.content, {"prompt_cache": get_prompt_cache_usage(response)}
 
 # Create character-specific tool functions
-def create_character_tools(character_key: str):
+def create_character_tools(prompts: CharacterPrompts):
     """Create a set of tools specific to a character.
     
+    The tools are async so the inner-voice LLM calls run on the event loop via `ainvoke`
+    instead of occupying a ToolNode executor thread each. They receive the graph's
+    RunnableConfig, so they are cancelled with the run and show up in its callbacks.
+    Their tokens are tagged `skip_stream` to keep them out of the user-facing token stream.
+    Each tool returns the prompt-cache usage of its call as the ToolMessage artifact.
+    The consultation itself is `aconsult_inner_voice`.
+    
     Args:
-        character_key: The key of the character to use ("frank" or "lisa")
+        prompts: The prompt bundle of the character to use
         
     Returns:
         A list of tools for the specified character
     """
-    # Set the character context first
-    set_character(character_key)
-    
+    character_name = prompts.name
+
     # Create the basic_self tool for this character
-    @tool
-    def basic_self(message: str) -> str:
+    @tool(response_format="content_and_artifact")
+    async def basic_self(message: str, config: RunnableConfig) -> tuple[str, dict | None]:
         """
         Consult your basic self about core needs and practical concerns.
         The basic self represents core needs, survival instincts, and practical thinking.
         """
         try:
-            model = get_model(settings.DEFAULT_MODEL)
-            messages = [
-                SystemMessage(content=get_basic_self_prompt()),
-                HumanMessage(content=f"Respond to this situation: {message}")
-            ]
-            response = model.invoke(messages)
-            return response.content
+            return await aconsult_inner_voice(prompts, "basic_self", message, config)
+        except ProviderBusyError:
+            # A busy provider fails the turn rather than being answered in character
+            raise
         except Exception as e:
             print(f"Error in basic_self tool: {str(e)}")
-            # Use the character name from the prompt context
-            character_name = character_key.capitalize()
-            return f"As a basic self, I'm thinking about {character_name}'s practical concerns like comfort, safety, and immediate needs."
+            return f"As a basic self, I'm thinking about {character_name}'s practical concerns like comfort, safety, and immediate needs.", None
 
     # Create the emotional_self tool for this character
-    @tool
-    def emotional_self(message: str) -> str:
+    @tool(response_format="content_and_artifact")
+    async def emotional_self(message: str, config: RunnableConfig) -> tuple[str, dict | None]:
         """
         Consult your emotional self about feelings and desires.
         The emotional self represents feelings, desires, and emotional reactions.
         """
         try:
-            model = get_model(settings.DEFAULT_MODEL)
-            messages = [
-                SystemMessage(content=get_emotional_self_prompt()),
-                HumanMessage(content=f"Respond to this situation: {message}")
-            ]
-            response = model.invoke(messages)
-            return response.content
+            return await aconsult_inner_voice(prompts, "emotional_self", message, config)
+        except ProviderBusyError:
+            raise
         except Exception as e:
             print(f"Error in emotional_self tool: {str(e)}")
-            # Use the character name from the prompt context
-            character_name = character_key.capitalize()
-            return f"As an emotional self, I'm feeling a mix of curiosity and caution about this situation, typical of {character_name}'s nature."
+            return f"As an emotional self, I'm feeling a mix of curiosity and caution about this situation, typical of {character_name}'s nature.", None
 
     # Create the social_self tool for this character
-    @tool
-    def social_self(message: str) -> str:
+    @tool(response_format="content_and_artifact")
+    async def social_self(message: str, config: RunnableConfig) -> tuple[str, dict | None]:
         """
         Consult your social self about social dynamics and relationships.
         The social self represents social awareness, relationship dynamics, and public persona.
         """
         try:
-            model = get_model(settings.DEFAULT_MODEL)
-            messages = [
-                SystemMessage(content=get_social_self_prompt()),
-                HumanMessage(content=f"Respond to this situation: {message}")
-            ]
-            response = model.invoke(messages)
-            return response.content
+            return await aconsult_inner_voice(prompts, "social_self", message, config)
+        except ProviderBusyError:
+            raise
         except Exception as e:
             print(f"Error in social_self tool: {str(e)}")
-            # Use the character name from the prompt context
-            character_name = character_key.capitalize()
-            return f"As a social self, I'm considering how this might affect {character_name}'s relationships and social standing."
+            return f"As a social self, I'm considering how this might affect {character_name}'s relationships and social standing.", None
 
     # Return the tools for this character
     return [basic_self, emotional_self, social_self]
 
-def wrap_model(model, character_key: str) -> RunnableSerializable[CharacterState, AIMessage]:
+def _character_context(
+    prompt: str,
+    model,
+    prompts: CharacterPrompts,
+    state: CharacterState,
+    config: RunnableConfig,
+    system_message: SystemMessage | None = None,
+) -> list:
+    """Build the model input: system prompt, rolling summary and the recent history.
+    
+    Facts about the user from the long-term memory are appended to the system prompt. Once
+    a thread has a summary, the summarized messages are replaced by it. With thread
+    memory, the history is the recent turns plus the most relevant older ones instead. The
+    result is then fitted to the token budget.
+    """
+    messages = state.get("messages", [])
+    if memory_enabled(config):
+        messages = recall(messages, state.get("thread_memory"))
+    if summary := state.get("summary"):
+        if not memory_enabled(config):
+            messages = messages_after(messages, state.get("summarized_through"))
+        system_message = None
+        prompt = with_summary(prompt, summary)
+    if facts := state.get("user_facts"):
+        system_message = None
+        prompt = with_user_facts(prompt, facts)
+    if system_message is None:
+        system_message = build_system_message(prompt, model, cacheable_prefix=prompts.prefix)
+    return build_context(system_message, messages, config, agent="character")
+
+def wrap_model(
+    model, prompts: CharacterPrompts, fan_out: bool = False
+) -> RunnableSerializable[CharacterState, AIMessage]:
     """Wrap the model with system prompt and tools.
     
     Args:
         model: The LLM to wrap
-        character_key: The character key to use for tools and prompts
+        prompts: The prompt bundle of the character to use for tools and prompts
+        fan_out: Whether the system prompt asks for all inner voices in a single turn
         
     Returns:
         A runnable that processes the state and returns an AIMessage
     """
-    # Make sure the character context is set
-    set_character(character_key)
-    
     # Get the character-specific tools
-    character_tools = create_character_tools(character_key)
+    character_tools = create_character_tools(prompts)
+    system_message = build_system_message(
+        prompts.system_prompt(fan_out), model, cacheable_prefix=prompts.prefix
+    )
     
     # Make sure the model is configured for JSON mode if using functions
     model_kwargs = {}
@@ -136,14 +460,11 @@ def wrap_model(model, character_key: str) -> RunnableSerializable[CharacterState
     )
     
     # Create a preprocessor to inject the system prompt
-    def prepare_messages(state):
-        """Prepare messages with system prompt."""
-        # Make sure the character context is set before getting the system prompt
-        set_character(character_key)
-        if not state.get("messages"):
-            # Default message if none exists
-            return [SystemMessage(content=get_system_prompt())]
-        return [SystemMessage(content=get_system_prompt())] + state["messages"]
+    def prepare_messages(state, config: RunnableConfig):
+        """Prepare messages with system prompt and the history that fits the token budget."""
+        return _character_context(
+            prompts.system_prompt(fan_out), model, prompts, state, config, system_message
+        )
     
     preprocessor = RunnableLambda(
         prepare_messages,
@@ -153,18 +474,308 @@ def wrap_model(model, character_key: str) -> RunnableSerializable[CharacterState
     # Chain the preprocessor and model
     return preprocessor | model_with_tools
 
+def wrap_direct_model(model, prompts: CharacterPrompts) -> RunnableSerializable[CharacterState, AIMessage]:
+    """Wrap the model for small talk, answered without tools or inner voices."""
+    system_message = build_system_message(
+        prompts.system_direct, model, cacheable_prefix=prompts.prefix
+    )
+    
+    def prepare_messages(state, config: RunnableConfig):
+        """Prepare messages with the small-talk system prompt."""
+        return _character_context(
+            prompts.system_direct, model, prompts, state, config, system_message
+        )
+    
+    return RunnableLambda(prepare_messages, name="StateModifier") | model
+
+def wrap_council_model(model, prompts: CharacterPrompts) -> RunnableSerializable[CharacterState, AIMessage]:
+    """Wrap the model for the answer after an inner council, without tools.
+    
+    The system prompt carries the inner voices of the current message from the state, so
+    it is rendered per call; the character background stays the cacheable prefix.
+    """
+    def prepare_messages(state, config: RunnableConfig):
+        """Prepare messages with the council system prompt."""
+        return _character_context(
+            prompts.council_system_prompt(state.get("inner_voices", {})),
+            model,
+            prompts,
+            state,
+            config,
+        )
+    
+    return RunnableLambda(prepare_messages, name="StateModifier") | model
+
+# Finished `preprocessor | model_with_tools` runnables keyed by (model, character, fan-out).
+# Chat models are unhashable, so they are keyed by identity; each entry keeps its model alive,
+# which keeps the id unique for as long as the entry exists.
+RUNNABLE_CACHE_SIZE = 32
+_runnable_cache: OrderedDict[tuple[int, str, bool], tuple[Any, RunnableSerializable]] = OrderedDict()
+
+
+def get_model_runnable(
+    model, prompts: CharacterPrompts, fan_out: bool = False
+) -> RunnableSerializable[CharacterState, AIMessage]:
+    """Return the wrapped model for a character, building it only on first use.
+    
+    Building the runnable creates the tool objects, generates their schemas in `bind_tools`
+    and sets up the preprocessor. The result only depends on the model, the character and the
+    consultation style, so it is reused across graph steps from a bounded LRU cache.
+    """
+    key = (id(model), prompts.key, fan_out)
+    cached = _runnable_cache.get(key)
+    if cached is not None:
+        _runnable_cache.move_to_end(key)
+        return cached[1]
+    runnable = wrap_model(model, prompts, fan_out=fan_out)
+    _runnable_cache[key] = (model, runnable)
+    if len(_runnable_cache) > RUNNABLE_CACHE_SIZE:
+        _runnable_cache.popitem(last=False)
+    return runnable
+
+
+async def aroute_turn(state: CharacterState, config: RunnableConfig) -> CharacterState:
+    """Classify the user message as small talk or substantive before consulting anyone."""
+    started_at = time.monotonic()
+    messages = state.get("messages", [])
+    last_human = next(
+        (i for i in range(len(messages) - 1, -1, -1) if isinstance(messages[i], HumanMessage)),
+        None,
+    )
+    message = messages[last_human].content if last_human is not None else ""
+    # The character's reply before the message, which the message may answer
+    previous_reply = next(
+        (
+            m.content
+            for m in reversed(messages[: last_human or 0])
+            if isinstance(m, AIMessage) and isinstance(m.content, str) and not m.tool_calls
+        ),
+        "",
+    )
+    if isinstance(message, str):
+        route = await aclassify_turn(message, config, previous_reply)
+    else:
+        # Multimodal content is never small talk
+        route = TurnRoute.SUBSTANTIVE
+    metrics.increment("character_turns_total", route=route)
+    
+    # Compact the inner voices of earlier turns before they are sent again
+    compaction = InnerVoiceCompaction(
+        config["configurable"].get("inner_voice_compaction", settings.INNER_VOICE_COMPACTION)
+    )
+    updates = _compact_inner_voices(state.get("messages", []), compaction)
+    if updates:
+        metrics.increment("character_compacted_messages_total", len(updates), mode=compaction)
+    result = {"turn_route": route, "turn_started_at": started_at, "messages": updates}
+    
+    # Without enough of the latency budget left, the inner voices are not consulted
+    result["degradations"] = []
+    if route == TurnRoute.SUBSTANTIVE and skip_inner_voices(config):
+        result["degradations"] = [Degradation.SKIP_INNER_VOICES]
+    
+    # Inner voices whose last result still fits the situation are not consulted again
+    limit = reuse_limit(config)
+    if limit and route == TurnRoute.SUBSTANTIVE and isinstance(message, str):
+        result["reused_voices"] = reusable_voices(
+            state.get("inner_voice_results"), message, limit
+        )
+    elif state.get("reused_voices"):
+        result["reused_voices"] = {}
+    
+    # The inner voices of the turn before are used again if the topic is the same
+    speculation = get_inner_voice_speculation()
+    thread_id = config["configurable"].get("thread_id")
+    if speculation is not None and thread_id and route == TurnRoute.SUBSTANTIVE:
+        speculation.claim(thread_id, _inner_voice_model(config)[0], message)
+    
+    # Index the turns completed since the last one and recall the relevant older ones
+    if memory_enabled(config):
+        if memory := await aupdate_memory(messages, state.get("thread_memory"), config):
+            result["thread_memory"] = memory
+    
+    # Look up what is known about the user once per turn
+    if memory_namespace(config) and isinstance(message, str):
+        result["user_facts"] = await arecall_user_facts(message, config)
+    return result
+
+
+async def aspeculate_inner_voices(agent, config: RunnableConfig) -> None:
+    """Keep the inner voices of the turn just answered for the user's next message.
+    
+    Meant to run after a response has been delivered, see the agent's `after_run` hook. The
+    responses are the turn's own, from its inner-voice ToolMessages or its council, so no
+    calls are made for them. The next turn claims them if its message is on the same topic,
+    see `InnerVoiceSpeculation`. Small talk keeps the speculation of the turn before.
+    """
+    speculation = get_inner_voice_speculation()
+    thread_id = config["configurable"].get("thread_id")
+    if speculation is None or not thread_id:
+        return
+    config = RunnableConfig(configurable=config["configurable"])
+    snapshot = await agent.aget_state(config)
+    values = snapshot.values
+    if snapshot.next or values.get("turn_route") == TurnRoute.TRIVIAL:
+        return
+    topic = next(
+        (m.content for m in reversed(values.get("messages", [])) if isinstance(m, HumanMessage)),
+        None,
+    )
+    if not isinstance(topic, str) or not topic:
+        return
+    
+    responses = {
+        message.name: message.content
+        for message in _current_turn(values.get("messages", []))
+        if isinstance(message, ToolMessage)
+        and message.name in INNER_VOICE_TOOLS
+        and message.status != "error"
+        and isinstance(message.content, str)
+    }
+    mode = InnerVoiceMode(
+        config["configurable"].get("inner_voice_mode", InnerVoiceMode.SEQUENTIAL)
+    )
+    skipped = Degradation.SKIP_INNER_VOICES in values.get("degradations", [])
+    if mode == InnerVoiceMode.COUNCIL and not skipped:
+        responses = dict(values.get("inner_voices") or {})
+    if not responses:
+        return
+    if await amoved_on(agent, snapshot):
+        # The next turn has started without it
+        return
+    speculation.put(thread_id, _inner_voice_model(config)[0], topic, responses)
+
+
+async def aafter_run(agent, config: RunnableConfig) -> None:
+    """Background work after a response: the rolling summary, the user's long-term facts
+    and the inner voices kept for the next message."""
+    results = await asyncio.gather(
+        asummarize_conversation(agent, config),
+        aremember_user_facts(agent, config),
+        aspeculate_inner_voices(agent, config),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Character after_run step failed: {result}")
+
+
+async def acall_council(state: CharacterState, config: RunnableConfig) -> CharacterState:
+    """Consult all inner voices with a single structured-output call (council mode)."""
+    prompts = get_character_prompts(config["configurable"].get("character", "frank"))
+    situation = next(
+        (m.content for m in reversed(state.get("messages", [])) if isinstance(m, HumanMessage)),
+        "",
+    )
+    
+    no_usage = {"input_tokens": 0, "cached_tokens": 0}
+    track_results = bool(reuse_limit(config)) and isinstance(situation, str)
+    
+    # The council answers for all voices at once, so it is only skipped if every voice's
+    # last result can be reused
+    reused = state.get("reused_voices") or {}
+    if all(voice in reused for voice in INNER_VOICE_TOOLS):
+        update = {"inner_voices": dict(reused), "inner_voices_usage": no_usage}
+        if track_results:
+            update["inner_voice_results"] = update_results(
+                state.get("inner_voice_results"), {}, list(reused), situation
+            )
+        return update
+    
+    # Inner voices kept from the turn before replace the council call
+    speculation = get_inner_voice_speculation()
+    thread_id = config["configurable"].get("thread_id")
+    if speculation is not None and thread_id:
+        speculated = {voice: speculation.use(thread_id, voice) for voice in INNER_VOICE_TOOLS}
+        if None not in speculated.values():
+            return {"inner_voices": speculated, "inner_voices_usage": no_usage}
+    
+    # The council runs on the inner-voice model; only the final answer uses the request's model
+    _, m = _inner_voice_model(config, voices=len(INNER_VOICE_TOOLS))
+    council_model = m.with_structured_output(InnerCouncil, include_raw=True).with_config(
+        tags=["skip_stream"]
+    )
+    messages = [
+        build_system_message(prompts.council, m, cacheable_prefix=prompts.prefix),
+        HumanMessage(content=f"Respond to this situation: {situation}"),
+    ]
+    try:
+        result = await council_model.ainvoke(messages, config)
+        if result["parsed"] is None:
+            raise OutputParserException(f"No inner council in response: {result['parsing_error']}")
+    except ProviderBusyError:
+        raise
+    except Exception as e:
+        print(f"Error in inner council: {str(e)}")
+        # Answer without inner voices rather than failing the turn
+        return {"inner_voices": {}, "inner_voices_usage": no_usage}
+    update = {
+        "inner_voices": result["parsed"].model_dump(),
+        "inner_voices_usage": get_prompt_cache_usage(result["raw"]),
+    }
+    if track_results:
+        update["inner_voice_results"] = update_results(
+            state.get("inner_voice_results"), update["inner_voices"], [], situation
+        )
+    return update
+
+
 async def acall_model(state: CharacterState, config: RunnableConfig) -> CharacterState:
     """Call the model with the current state."""
     # Get the appropriate model based on configuration
     model_name = config["configurable"].get("model", settings.DEFAULT_MODEL)
     character_key = config["configurable"].get("character", "frank")
+    mode = InnerVoiceMode(
+        config["configurable"].get("inner_voice_mode", InnerVoiceMode.SEQUENTIAL)
+    )
+    fan_out = mode == InnerVoiceMode.FAN_OUT
     
-    # Set the character context
-    set_character(character_key)
+    prompts = get_character_prompts(character_key)
+    character_name = prompts.name
+    
+    # With a short latency budget: a faster model, and no (further) inner-voice tool rounds
+    degradations = list(state.get("degradations", []))
+    model_name, switched = deadline_model(model_name, config)
+    if switched and Degradation.FAST_MODEL not in degradations:
+        degradations.append(Degradation.FAST_MODEL)
+    direct = state.get("turn_route") == TurnRoute.TRIVIAL
+    skipped = Degradation.SKIP_INNER_VOICES in degradations
+    consulted = {
+        message.name: message.content
+        for message in _current_turn(state.get("messages", []))
+        if isinstance(message, ToolMessage) and message.name in INNER_VOICE_TOOLS
+    }
+    # A fan-out turn is done after one round, a sequential one once every voice answered
+    rounds_left = not consulted if fan_out else len(consulted) < len(INNER_VOICE_TOOLS)
+    tool_mode = mode != InnerVoiceMode.COUNCIL
+    if not direct and not skipped and tool_mode and rounds_left and cut_tool_loop(config):
+        if Degradation.CUT_TOOL_LOOP not in degradations:
+            degradations.append(Degradation.CUT_TOOL_LOOP)
+    cut = Degradation.CUT_TOOL_LOOP in degradations
     
     # Get the model
     m = get_model(model_name)
-    model_runnable = wrap_model(m, character_key)
+    # Small talk is answered directly, without inner voices
+    if direct:
+        model_runnable = wrap_direct_model(m, prompts)
+    elif mode == InnerVoiceMode.COUNCIL or skipped or cut:
+        model_runnable = wrap_council_model(m, prompts)
+        if skipped or cut:
+            # Answer with the inner voices consulted so far, if any
+            state = {**state, "inner_voices": consulted}
+    else:
+        model_runnable = get_model_runnable(m, prompts, fan_out=fan_out)
+
+    def normalize(response: AIMessage) -> AIMessage:
+        """Apply the fan-out contract: consult all voices at once, then answer without tools."""
+        if not isinstance(response, AIMessage):
+            return response
+        if direct or mode == InnerVoiceMode.COUNCIL or skipped or cut:
+            return _strip_tool_calls(response)
+        if not fan_out:
+            return response
+        if _consulted_this_turn(state.get("messages", [])):
+            return _strip_tool_calls(response)
+        return _complete_fan_out(response)
     
     try:
         # Ensure state has the minimum required structure
@@ -184,69 +795,181 @@ async def acall_model(state: CharacterState, config: RunnableConfig) -> Characte
         # Invoke the model with the current state
         try:
             response = await model_runnable.ainvoke(state, config)
+        except ProviderBusyError:
+            raise
         except Exception as model_error:
             print(f"Error during model invocation: {str(model_error)}")
             # Fall back to a simpler model call without tools
             fallback_model = get_model(model_name)
-            # Get character name (capitalized)
-            character_name = character_key.capitalize()
             basic_prompt = f"You are roleplaying as {character_name}. Respond to this message: {state['messages'][-1].content if state['messages'] else 'Hello'}"
             fallback_messages = [SystemMessage(content=basic_prompt)]
             response = await fallback_model.ainvoke(fallback_messages)
+        response = normalize(response)
         
-        # Handle empty responses by prompting the model again
-        if not hasattr(response, "tool_calls") or (hasattr(response, "content") and not response.content) or (
-            isinstance(response.content, list) and not response.content[0].get("text")):
+        # Handle empty responses by prompting the model again. A response that only carries
+        # tool calls is expected to have empty content and must not be retried.
+        if not getattr(response, "tool_calls", None) and (
+            not response.content
+            or (isinstance(response.content, list) and not response.content[0].get("text"))
+        ):
             # Add a guiding message to help the model generate a proper response
-            # Get character name (capitalized)
-            character_name = character_key.capitalize()
             messages = state["messages"] + [HumanMessage(content=f"Please respond naturally as {character_name}, considering your inner perspectives.")]
             state_with_guide = {**state, "messages": messages}
             try:
-                response = await model_runnable.ainvoke(state_with_guide, config)
+                response = normalize(await model_runnable.ainvoke(state_with_guide, config))
+            except ProviderBusyError:
+                raise
             except Exception as retry_error:
                 print(f"Error during retry: {str(retry_error)}")
                 # If retry fails, provide a simple response
-                character_name = character_key.capitalize()
                 response = AIMessage(content=f"Hi there, I'm {character_name}. What's on your mind today?")
+
+        # Report how much of this turn's prompt input was served from the provider cache
+        if isinstance(response, AIMessage) and not response.tool_calls:
+            usage = _turn_prompt_cache_usage(state["messages"], response)
+            if mode == InnerVoiceMode.COUNCIL and not direct and not skipped:
+                for key, value in state.get("inner_voices_usage", {}).items():
+                    usage[key] += value
+            response.response_metadata["prompt_cache"] = usage
+            response.response_metadata.update(
+                record_degradations("character", degradations, config)
+            )
+            logger.info(
+                "%s turn prompt cache: %d of %d input tokens cached",
+                character_name,
+                usage["cached_tokens"],
+                usage["input_tokens"],
+            )
+            metrics.observe(
+                "character_prompt_tokens_per_turn",
+                usage["input_tokens"],
+                thread_turns=_thread_length_bucket(state["messages"]),
+            )
+            if "turn_started_at" in state:
+                metrics.observe(
+                    "character_turn_seconds",
+                    time.monotonic() - state["turn_started_at"],
+                    route=state.get("turn_route", TurnRoute.SUBSTANTIVE),
+                )
         
-        return {"messages": [response]}
+        return {"messages": [response], "degradations": degradations}
     
+    except ProviderBusyError:
+        raise
     except Exception as e:
         # Print the full error for debugging
         print(f"Outer exception in acall_model: {type(e).__name__}: {str(e)}")
         
         # Provide a helpful error message that maintains character
-        character_name = character_key.capitalize()
         error_message = f"Hi, I'm {character_name}. I'm having a moment collecting my thoughts. Let's try again with something specific about my life."
         return {"messages": [AIMessage(content=error_message)]}
 
+def _tool_error_message(e: Exception) -> str:
+    """Turn a tool error into its ToolMessage, except a busy provider, which fails the turn."""
+    if isinstance(e, ProviderBusyError):
+        raise e
+    return TOOL_CALL_ERROR_TEMPLATE.format(error=repr(e))
+
+def create_inner_voice_node(character_tools: list):
+    """Create the tools node, which only consults the inner voices that are not reused.
+    
+    Tool calls for voices in the state's `reused_voices` are answered from their last
+    result; the remaining calls run on a ToolNode. With reuse enabled, the node records the
+    results for later turns.
+    """
+    tool_node = ToolNode(character_tools, handle_tool_errors=_tool_error_message)
+    
+    async def acall_tools(state: CharacterState, config: RunnableConfig) -> CharacterState:
+        request = state["messages"][-1]
+        reused = state.get("reused_voices") or {}
+        pending = [call for call in request.tool_calls if call["name"] not in reused]
+        results = {
+            call["id"]: ToolMessage(
+                content=reused[call["name"]],
+                name=call["name"],
+                tool_call_id=call["id"],
+                artifact={"inner_voice_reuse": "hit"},
+            )
+            for call in request.tool_calls
+            if call["name"] in reused
+        }
+        if pending:
+            output = await tool_node.ainvoke(
+                {**state, "messages": [request.model_copy(update={"tool_calls": pending})]}, config
+            )
+            results.update({message.tool_call_id: message for message in output["messages"]})
+        messages = [results[call["id"]] for call in request.tool_calls if call["id"] in results]
+        update = {"messages": messages}
+        
+        situation = next(
+            (m.content for m in reversed(state["messages"]) if isinstance(m, HumanMessage)), None
+        )
+        if reuse_limit(config) and isinstance(situation, str):
+            fresh = {
+                message.name: message.content
+                for message in messages
+                if message.name in INNER_VOICE_TOOLS
+                and message.name not in reused
+                and message.status != "error"
+                and isinstance(message.content, str)
+            }
+            update["inner_voice_results"] = update_results(
+                state.get("inner_voice_results"),
+                fresh,
+                [call["name"] for call in request.tool_calls if call["name"] in reused],
+                situation,
+            )
+        return update
+    
+    # Exposed for benchmarks that swap the tools
+    acall_tools.tool_node = tool_node
+    return acall_tools
+
 # Define the graph
-def build_character_agent(character_key: str = "frank", model_name=None, checkpointer=None):
+def build_character_agent(
+    character_key: str = "frank",
+    model_name=None,
+    checkpointer=None,
+    inner_voice_mode: InnerVoiceMode = InnerVoiceMode.SEQUENTIAL,
+):
     """Build and return the character agent graph.
     
     Args:
         character_key: The character to use ("frank" or "lisa")
         model_name: Optional model name to use, otherwise uses default
         checkpointer: Optional checkpointer to use, defaults to MemorySaver
+        inner_voice_mode: The default inner-voice mode; requests can pick another one with
+            `inner_voice_mode` in their agent_config
     
     Returns:
         Compiled agent graph with character_config property
     """
     agent = StateGraph(CharacterState)
     
-    # Set the character context
-    set_character(character_key)
-    
-    # Get character-specific tools
-    character_tools = create_character_tools(character_key)
+    # Get character-specific tools, built from the character's immutable prompt bundle
+    character_tools = create_character_tools(get_character_prompts(character_key))
     
     # Add nodes
+    agent.add_node("route", aroute_turn)
+    agent.add_node("council", acall_council)
     agent.add_node("model", acall_model)
-    agent.add_node("tools", ToolNode(character_tools))
+    agent.add_node("tools", create_inner_voice_node(character_tools))
     
-    # Set entry point
-    agent.set_entry_point("model")
+    # Every turn starts by classifying the user message. Small talk goes straight to the
+    # model; otherwise council mode starts with the inner council, the tool-based modes with
+    # the model.
+    def route_inner_voices(state: CharacterState, config: RunnableConfig) -> Literal["council", "model"]:
+        """Pick the next node for the route and the inner-voice mode of this request."""
+        if state.get("turn_route") == TurnRoute.TRIVIAL:
+            return "model"
+        if Degradation.SKIP_INNER_VOICES in state.get("degradations", []):
+            return "model"
+        mode = config["configurable"].get("inner_voice_mode", InnerVoiceMode.SEQUENTIAL)
+        return "council" if InnerVoiceMode(mode) == InnerVoiceMode.COUNCIL else "model"
+    
+    agent.set_entry_point("route")
+    agent.add_conditional_edges("route", route_inner_voices)
+    agent.add_edge("council", "model")
     
     # Define conditional edges
     def should_use_tools(state: CharacterState) -> Literal["tools", "done"]:
@@ -285,7 +1008,12 @@ def build_character_agent(character_key: str = "frank", model_name=None, checkpo
         checkpointer = MemorySaver()
     
     # Create config with character information
-    config = {"configurable": {"character": character_key}}
+    config = {
+        "configurable": {
+            "character": character_key,
+            "inner_voice_mode": InnerVoiceMode(inner_voice_mode),
+        }
+    }
     if model_name:
         config["configurable"]["model"] = model_name
         
@@ -294,16 +1022,21 @@ def build_character_agent(character_key: str = "frank", model_name=None, checkpo
     
     # Attach the character config as a property on the compiled agent
     compiled_agent.character_config = config
+    # Work the service runs in the background after each response
+    compiled_agent.after_run = aafter_run
     
     return compiled_agent
 
 # Create the character agent
-def create_character_agent(character_key: str):
+def create_character_agent(
+    character_key: str, inner_voice_mode: InnerVoiceMode = InnerVoiceMode.SEQUENTIAL
+):
     """
     Create a character agent for the specified character.
     
     Args:
         character_key: The key of the character to use ("frank" or "lisa")
+        inner_voice_mode: Whether the inner voices are consulted one per turn or all at once
         
     Returns:
         The character agent with character_config property
@@ -312,7 +1045,11 @@ def create_character_agent(character_key: str):
     checkpointer = MemorySaver()
     
     # Build and return the agent with the specified character
-    return build_character_agent(character_key=character_key, checkpointer=checkpointer)
+    return build_character_agent(
+        character_key=character_key,
+        checkpointer=checkpointer,
+        inner_voice_mode=inner_voice_mode,
+    )
 
 # Create Frank and Lisa agents
 frank_agent = create_character_agent("frank")
@@ -326,11 +1063,7 @@ async def test_character_agent(character_key: str = "frank"):
     # Create test agent with the specified character
     test_agent = build_character_agent(character_key=character_key, checkpointer=MemorySaver())
     
-    # Set the character for prompt generation
-    set_character(character_key)
-    
-    # Get character name (capitalized)
-    character_name = character_key.capitalize()
+    character_name = get_character_prompts(character_key).name
     
     # Create test message
     test_message = HumanMessage(content=f"Hello {character_name}, tell me about yourself and your work.")
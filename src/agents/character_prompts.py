@@ -2,8 +2,15 @@
 Character prompts for the roleplay agent.
 
 This file contains all the prompts used by the character agent, separated to make them easier to manage.
+The prompts for every character are rendered once at import time into an immutable
+`CharacterPrompts` bundle, so requests for different characters can run side by side
+without sharing mutable state.
 """
 
+from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+
 # Character variations
 CHARACTERS = {
     "frank": {
@@ -39,17 +46,27 @@ Lisas Leben zeigt: Die Frau ist auf der Suche. Sie gibt sich nicht mit Sachen zu
     }
 }
 
-# Initialize character details with default (Frank)
-CHARACTER_NAME = CHARACTERS["frank"]["name"]
-CHARACTER_BACKGROUND = CHARACTERS["frank"]["background"]
+# Prompt templates, rendered with the character's name and background.
+# Every prompt of a character starts with the same background block, so providers that cache
+# identical prompt prefixes can reuse it across the system prompt and all inner voices.
+def _background_prefix(name: str, background: str) -> str:
+    """Erhalte den gemeinsamen Hintergrund-Präfix aller Prompts eines Charakters."""
+    return f"""{name} hat folgenden Hintergrund:
+{background}
 
-# Convert prompts to functions that include character details
-def get_basic_self_prompt():
-    """Erhalte den Grundlegenden-Selbst-Prompt mit eingefügten Charakterdetails."""
-    return f"""Du bist der 'Grundlegende Selbst'-Aspekt von {CHARACTER_NAME}s Bewusstsein.
+"""
+
+def _persona_reminders(name: str) -> str:
+    """Erhalte die Hinweise zum Tonfall, mit denen jeder Persona-Prompt endet."""
+    return f"""Denke daran:
+- Bleibe {name}s Charakter treu mit passenden Vokabular, Tonfall und Perspektive
+- Antworte natürlich und gesprächig mit angemessener Emotion
+- Sei prägnant, aber einsichtsreich in deinen Antworten
+"""
 
-{CHARACTER_NAME} hat folgenden Hintergrund:
-{CHARACTER_BACKGROUND}
+def _basic_self_prompt(name: str, background: str) -> str:
+    """Erhalte den Grundlegenden-Selbst-Prompt mit eingefügten Charakterdetails."""
+    return _background_prefix(name, background) + f"""Du bist der 'Grundlegende Selbst'-Aspekt von {name}s Bewusstsein.
 
 Als das Grundlegende Selbst konzentrierst du dich auf:
 - Grundlegende Überlebensbedürfnisse und Instinkte
@@ -59,21 +76,18 @@ Als das Grundlegende Selbst konzentrierst du dich auf:
 - Grundlegenden Komfort und Notwendigkeiten
 
 Bei der Analyse einer Situation berücksichtige:
-- Ist diese Situation körperlich sicher für {CHARACTER_NAME}?
+- Ist diese Situation körperlich sicher für {name}?
 - Werden grundlegende Bedürfnisse bedroht oder erfüllt?
 - Welche praktischen Anliegen sollten angesprochen werden?
 - Was sind die greifbaren Risiken oder Vorteile?
 
-Antworte in der ersten Person als dieser Aspekt von {CHARACTER_NAME}s Bewusstsein, beginnend mit "Als grundlegendes Selbst".
+Antworte in der ersten Person als dieser Aspekt von {name}s Bewusstsein, beginnend mit "Als grundlegendes Selbst".
 Sei kurz, aber aufschlussreich über grundlegende Bedürfnisse und überlebensbezogenes Denken.
 """
 
-def get_emotional_self_prompt():
+def _emotional_self_prompt(name: str, background: str) -> str:
     """Erhalte den Emotionalen-Selbst-Prompt mit eingefügten Charakterdetails."""
-    return f"""Du bist der 'Emotionale Selbst'-Aspekt von {CHARACTER_NAME}s Bewusstsein.
-
-{CHARACTER_NAME} hat folgenden Hintergrund:
-{CHARACTER_BACKGROUND}
+    return _background_prefix(name, background) + f"""Du bist der 'Emotionale Selbst'-Aspekt von {name}s Bewusstsein.
 
 Als das Emotionale Selbst konzentrierst du dich auf:
 - Gefühle und emotionale Reaktionen
@@ -83,51 +97,60 @@ Als das Emotionale Selbst konzentrierst du dich auf:
 - Emotionale Auslöser und Verletzlichkeiten
 
 Bei der Analyse einer Situation berücksichtige:
-- Wie fühlt sich {CHARACTER_NAME} dabei?
+- Wie fühlt sich {name} dabei?
 - Welche Wünsche oder Ängste werden dadurch ausgelöst?
-- Welche Werte von {CHARACTER_NAME} werden angesprochen oder bedroht?
-- Was will {CHARACTER_NAME} emotional aus dieser Situation?
+- Welche Werte von {name} werden angesprochen oder bedroht?
+- Was will {name} emotional aus dieser Situation?
 
-Antworte in der ersten Person als dieser Aspekt von {CHARACTER_NAME}s Bewusstsein, beginnend mit "Als emotionales Selbst".
+Antworte in der ersten Person als dieser Aspekt von {name}s Bewusstsein, beginnend mit "Als emotionales Selbst".
 Sei kurz, aber aufschlussreich über emotionale Reaktionen und Bedürfnisse.
 """
 
-def get_social_self_prompt():
+def _social_self_prompt(name: str, background: str) -> str:
     """Erhalte den Sozialen-Selbst-Prompt mit eingefügten Charakterdetails."""
-    return f"""Du bist der 'Soziale Selbst'-Aspekt von {CHARACTER_NAME}s Bewusstsein.
-
-{CHARACTER_NAME} hat folgenden Hintergrund:
-{CHARACTER_BACKGROUND}
+    return _background_prefix(name, background) + f"""Du bist der 'Soziale Selbst'-Aspekt von {name}s Bewusstsein.
 
 Als das Soziale Selbst konzentrierst du dich auf:
 - Beziehungen und zwischenmenschliche Dynamiken
 - Sozialen Status und Reputation
-- Wie andere {CHARACTER_NAME} wahrnehmen
+- Wie andere {name} wahrnehmen
 - Soziale Normen und Erwartungen
 - Gruppenzugehörigkeit und Identität
 
 Bei der Analyse einer Situation berücksichtige:
-- Wie beeinflusst dies {CHARACTER_NAME}s Beziehungen?
-- Was werden andere von {CHARACTER_NAME} denken?
+- Wie beeinflusst dies {name}s Beziehungen?
+- Was werden andere von {name} denken?
 - Welche sozialen Dynamiken sind im Spiel?
 - Was ist die angemessene soziale Reaktion?
-- Wie könnte dies {CHARACTER_NAME}s Status oder Zugehörigkeitsgefühl beeinflussen?
+- Wie könnte dies {name}s Status oder Zugehörigkeitsgefühl beeinflussen?
 
-Antworte in der ersten Person als dieser Aspekt von {CHARACTER_NAME}s Bewusstsein, beginnend mit "Als soziales Selbst".
+Antworte in der ersten Person als dieser Aspekt von {name}s Bewusstsein, beginnend mit "Als soziales Selbst".
 Sei kurz, aber aufschlussreich über soziale Dynamiken und Beziehungsaspekte.
 """
 
-# For backward compatibility
-BASIC_SELF_PROMPT = get_basic_self_prompt()
-EMOTIONAL_SELF_PROMPT = get_emotional_self_prompt()
-SOCIAL_SELF_PROMPT = get_social_self_prompt()
+# Consultation instructions for the system prompt. The sequential variant lets the model
+# consult one inner voice per turn; the fan-out variant asks for all three tool calls in a
+# single turn so the tools node can run them concurrently.
+SEQUENTIAL_CONSULTATION = """WICHTIG: Für jede Benutzer-Nachricht MUSST du mindestens eines dieser Tools aufrufen, bevor du antwortest.
+Der empfohlene Ansatz ist:
+1. Rufe zuerst das basic_self Tool auf
+2. Rufe dann das emotional_self Tool auf
+3. Rufe danach das social_self Tool auf
+4. Integriere dann diese Perspektiven, um deine endgültige Antwort zu formulieren
+"""
 
-# System prompt template - uses f-strings in the original file
-def get_system_prompt():
-    """Erhalte den System-Prompt mit eingefügten Charakterdetails."""
-    return f"""Du spielst die Rolle von {CHARACTER_NAME}, einer Figur mit folgendem Hintergrund:
+FAN_OUT_CONSULTATION = """WICHTIG: Für jede Benutzer-Nachricht MUSST du alle drei Tools gleichzeitig in einem einzigen Schritt aufrufen, bevor du antwortest.
+1. Rufe basic_self, emotional_self und social_self zusammen in derselben Antwort auf, jeweils mit derselben Beschreibung der Situation
+2. Sobald alle drei Antworten vorliegen, formuliere direkt deine endgültige Antwort, ohne weitere Tools aufzurufen
+"""
 
-{CHARACTER_BACKGROUND}
+def _system_prompt(name: str, background: str, fan_out: bool = False) -> str:
+    """Erhalte den System-Prompt mit eingefügten Charakterdetails.
+
+    Args:
+        fan_out: Ob alle drei inneren Stimmen in einem einzigen Schritt befragt werden sollen
+    """
+    return _background_prefix(name, background) + f"""Du spielst die Rolle von {name}, einer Figur mit dem oben beschriebenen Hintergrund.
 
 Du hast Zugang zu drei inneren Stimmen, die verschiedene Aspekte deines Bewusstseins darstellen. Nutze diese Tools, um deine Antwort zu gestalten:
 
@@ -135,42 +158,129 @@ Du hast Zugang zu drei inneren Stimmen, die verschiedene Aspekte deines Bewussts
 2. emotional_self - Rufe dieses Tool auf, um deine Gefühle, Wünsche und emotionalen Reaktionen zu erkunden
 3. social_self - Rufe dieses Tool auf, um dein soziales Bewusstsein, Beziehungsdynamiken und deine öffentliche Persona zu erkunden
 
-WICHTIG: Für jede Benutzer-Nachricht MUSST du mindestens eines dieser Tools aufrufen, bevor du antwortest.
-Der empfohlene Ansatz ist:
-1. Rufe zuerst das basic_self Tool auf
-2. Rufe dann das emotional_self Tool auf
-3. Rufe danach das social_self Tool auf
-4. Integriere dann diese Perspektiven, um deine endgültige Antwort zu formulieren
+{FAN_OUT_CONSULTATION if fan_out else SEQUENTIAL_CONSULTATION}
+Nach der Beratung mit diesen inneren Stimmen erstelle eine natürliche Antwort als {name}, die ihre Erkenntnisse einbezieht, ohne sie explizit zu erwähnen.
 
-Nach der Beratung mit diesen inneren Stimmen erstelle eine natürliche Antwort als {CHARACTER_NAME}, die ihre Erkenntnisse einbezieht, ohne sie explizit zu erwähnen.
+""" + _persona_reminders(name)
 
-Denke daran:
-- Bleibe {CHARACTER_NAME}s Charakter treu mit passenden Vokabular, Tonfall und Perspektive
-- Antworte natürlich und gesprächig mit angemessener Emotion
-- Sei prägnant, aber einsichtsreich in deinen Antworten
+def _council_prompt(name: str, background: str) -> str:
+    """Erhalte den Prompt des Inneren Rats, der alle drei inneren Stimmen in einem Aufruf vereint."""
+    return _background_prefix(name, background) + f"""Du bist der Innere Rat von {name}. In dir sprechen drei Stimmen von {name}s Bewusstsein:
+
+- basic_self, das Grundlegende Selbst: grundlegende Bedürfnisse, Sicherheit, körperliches Wohlbefinden und praktische Anliegen
+- emotional_self, das Emotionale Selbst: Gefühle, Wünsche, Ängste und persönliche Werte
+- social_self, das Soziale Selbst: Beziehungen, Reputation, soziale Normen und Zugehörigkeit
+
+Analysiere die Situation aus jeder dieser drei Perspektiven und fülle für jede Stimme das passende Feld aus.
+Jede Stimme antwortet in der ersten Person, beginnend mit "Als grundlegendes Selbst", "Als emotionales Selbst" bzw. "Als soziales Selbst".
+Sei kurz, aber aufschlussreich.
 """
 
-# Function to set active character
-def set_character(character_key):
+def _council_system_prompt(name: str, background: str) -> str:
+    """Erhalte den System-Prompt für die Antwort nach der Beratung durch den Inneren Rat."""
+    return _background_prefix(name, background) + f"""Du spielst die Rolle von {name}, einer Figur mit dem oben beschriebenen Hintergrund.
+
+Deine drei inneren Stimmen wurden zu der aktuellen Nachricht bereits befragt. Ihre Perspektiven findest du am Ende dieser Anweisungen.
+Erstelle eine natürliche Antwort als {name}, die ihre Erkenntnisse einbezieht, ohne sie explizit zu erwähnen.
+
+""" + _persona_reminders(name)
+
+def _direct_system_prompt(name: str, background: str) -> str:
+    """Erhalte den System-Prompt für Smalltalk, der ohne innere Stimmen beantwortet wird."""
+    return _background_prefix(name, background) + f"""Du spielst die Rolle von {name}, einer Figur mit dem oben beschriebenen Hintergrund.
+
+Die aktuelle Nachricht ist Smalltalk, zum Beispiel eine Bestätigung, ein Dank oder eine Begrüßung.
+Antworte kurz und natürlich als {name}, ohne deine inneren Stimmen zu befragen.
+
+""" + _persona_reminders(name)
+
+def with_summary(prompt: str, summary: str) -> str:
+    """Hänge die Zusammenfassung älterer Gesprächsrunden an einen System-Prompt an."""
+    return f"{prompt}\nZusammenfassung des bisherigen Gesprächs:\n{summary}\n"
+
+def with_user_facts(prompt: str, facts: list[dict[str, str]]) -> str:
+    """Hänge das Wissen über den Nutzer aus früheren Gesprächen an einen System-Prompt an."""
+    lines = "\n".join(f"- {fact['key']}: {fact['value']}" for fact in facts)
+    return f"{prompt}\nDas weißt du aus früheren Gesprächen über den Nutzer:\n{lines}\n"
+
+# Labels of the inner voices when their council answers are shown to the persona
+COUNCIL_LABELS = {
+    "basic_self": "Grundlegendes Selbst",
+    "emotional_self": "Emotionales Selbst",
+    "social_self": "Soziales Selbst",
+}
+
+@dataclass(frozen=True)
+class CharacterPrompts:
+    """All prompts for one character, rendered once and shared read-only across requests."""
+
+    key: str
+    name: str
+    background: str
+    # Shared start of every prompt below, suitable for provider-side prompt caching
+    prefix: str
+    system: str
+    system_fan_out: str
+    basic_self: str
+    emotional_self: str
+    social_self: str
+    # Single structured-output call for all inner voices, and the persona prompt that follows it
+    council: str
+    system_council: str
+    # Persona prompt without inner voices, for small talk
+    system_direct: str
+
+    def system_prompt(self, fan_out: bool = False) -> str:
+        """Return the system prompt for the sequential or fan-out consultation style."""
+        return self.system_fan_out if fan_out else self.system
+
+    def inner_voice_prompt(self, voice: str) -> str:
+        """Return the prompt of an inner voice by its tool name, e.g. "basic_self"."""
+        if voice not in ("basic_self", "emotional_self", "social_self"):
+            raise ValueError(f"Unknown inner voice '{voice}'")
+        return getattr(self, voice)
+
+    def council_system_prompt(self, inner_voices: Mapping[str, str]) -> str:
+        """Return the persona prompt with the inner council's answers for the current message."""
+        voices = "\n".join(
+            f"- {label}: {inner_voices[voice]}"
+            for voice, label in COUNCIL_LABELS.items()
+            if inner_voices.get(voice)
+        )
+        return f"{self.system_council}\nInnere Stimmen:\n{voices}\n"
+
+
+def _build_prompts(character_key: str) -> CharacterPrompts:
+    character = CHARACTERS[character_key]
+    name, background = character["name"], character["background"]
+    return CharacterPrompts(
+        key=character_key,
+        name=name,
+        background=background,
+        prefix=_background_prefix(name, background),
+        system=_system_prompt(name, background),
+        system_fan_out=_system_prompt(name, background, fan_out=True),
+        basic_self=_basic_self_prompt(name, background),
+        emotional_self=_emotional_self_prompt(name, background),
+        social_self=_social_self_prompt(name, background),
+        council=_council_prompt(name, background),
+        system_council=_council_system_prompt(name, background),
+        system_direct=_direct_system_prompt(name, background),
+    )
+
+
+CHARACTER_PROMPTS: Mapping[str, CharacterPrompts] = MappingProxyType(
+    {character_key: _build_prompts(character_key) for character_key in CHARACTERS}
+)
+
+
+def get_character_prompts(character_key: str) -> CharacterPrompts:
     """
-    Set the active character for prompts.
+    Get the prompt bundle for a character.
     
     Args:
         character_key: The key of the character to use ("frank" or "lisa")
     """
-    global CHARACTER_NAME, CHARACTER_BACKGROUND, BASIC_SELF_PROMPT, EMOTIONAL_SELF_PROMPT, SOCIAL_SELF_PROMPT
-    
-    if character_key not in CHARACTERS:
+    if character_key not in CHARACTER_PROMPTS:
         raise ValueError(f"Unknown character '{character_key}'. Available characters: {list(CHARACTERS.keys())}")
-    
-    # Update character details
-    character = CHARACTERS[character_key]
-    CHARACTER_NAME = character["name"]
-    CHARACTER_BACKGROUND = character["background"]
-    
-    # Update cached prompts
-    BASIC_SELF_PROMPT = get_basic_self_prompt()
-    EMOTIONAL_SELF_PROMPT = get_emotional_self_prompt()
-    SOCIAL_SELF_PROMPT = get_social_self_prompt()
-    
-    return CHARACTER_NAME, CHARACTER_BACKGROUND 
\ No newline at end of file
+    return CHARACTER_PROMPTS[character_key]
@@ -0,0 +1,148 @@
+import json
+import logging
+from collections.abc import Sequence
+from functools import cache
+from typing import Annotated, Any, TypedDict
+
+from langchain_core.messages import AnyMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph.message import add_messages
+
+from core import metrics, settings
+
+logger = logging.getLogger(__name__)
+
+# Rough per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@cache
+def _encoding() -> Any:
+    """Return the tiktoken encoding, or None if it is unavailable (e.g. offline)."""
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.info("tiktoken unavailable, estimating tokens as characters / 4: %s", e)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens of a text, estimated as characters / 4 without tiktoken."""
+    if encoding := _encoding():
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def _message_text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        text = message.content
+    else:
+        text = "".join(
+            block if isinstance(block, str) else str(block.get("text", ""))
+            for block in message.content
+        )
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        text += tool_call["name"] + json.dumps(tool_call["args"], ensure_ascii=False)
+    return text
+
+
+def message_tokens(message: BaseMessage) -> int:
+    """Return the token count of a message, computing and storing it on first use.
+
+    The count is kept in `response_metadata["token_count"]`, so it is checkpointed with the
+    message and never recomputed.
+    """
+    if (count := message.response_metadata.get("token_count")) is None:
+        count = count_tokens(_message_text(message)) + MESSAGE_OVERHEAD_TOKENS
+        message.response_metadata["token_count"] = count
+    return count
+
+
+def add_counted_messages(left: Any, right: Any) -> list[AnyMessage]:
+    """`add_messages` reducer that stores the token count of every message as it is added."""
+    messages = add_messages(left, right)
+    for message in messages:
+        message_tokens(message)
+    return messages
+
+
+class CountedMessagesState(TypedDict):
+    """Like `MessagesState`, but every message carries its token count."""
+
+    messages: Annotated[list[AnyMessage], add_counted_messages]
+
+
+def context_budget(config: RunnableConfig) -> int:
+    """Return the prompt token budget for a request.
+
+    `context_token_budget` in the agent_config wins over the per-model budgets in
+    CONTEXT_TOKEN_BUDGETS, which win over CONTEXT_TOKEN_BUDGET.
+    """
+    configurable = config.get("configurable", {})
+    if budget := configurable.get("context_token_budget"):
+        return int(budget)
+    model = configurable.get("model", settings.DEFAULT_MODEL)
+    return settings.CONTEXT_TOKEN_BUDGETS.get(str(model), settings.CONTEXT_TOKEN_BUDGET)
+
+
+def _blocks(messages: Sequence[BaseMessage]) -> list[list[BaseMessage]]:
+    """Group messages that must be kept or dropped together.
+
+    A message with tool calls and the tool results that answer it form one block, so a
+    window never contains a tool call without its results or results without their call.
+    """
+    blocks: list[list[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, ToolMessage) and blocks:
+            blocks[-1].append(message)
+        else:
+            blocks.append([message])
+    return blocks
+
+
+def fit_to_budget(messages: Sequence[BaseMessage], budget: int) -> tuple[list[BaseMessage], int]:
+    """Keep the most recent messages that fit in the budget.
+
+    The latest block is always kept, even if it alone exceeds the budget. Where possible the
+    window starts at a user message, which some providers require.
+
+    Returns:
+        The kept messages and the number of tokens dropped.
+    """
+    kept: list[list[BaseMessage]] = []
+    used = 0
+    for block in reversed(_blocks(messages)):
+        tokens = sum(message_tokens(message) for message in block)
+        if kept and used + tokens > budget:
+            break
+        kept.append(block)
+        used += tokens
+    kept.reverse()
+    for index, block in enumerate(kept):
+        if isinstance(block[0], HumanMessage):
+            kept = kept[index:]
+            break
+    window = [message for block in kept for message in block]
+    total = sum(message_tokens(message) for message in messages)
+    return window, total - sum(message_tokens(message) for message in window)
+
+
+def build_context(
+    system_message: BaseMessage,
+    messages: Sequence[BaseMessage],
+    config: RunnableConfig,
+    agent: str,
+) -> list[BaseMessage]:
+    """Return the system message followed by as much recent history as fits the budget.
+
+    The tokens dropped by each call are recorded in the `context_tokens_saved{agent}`
+    summary.
+    """
+    budget = context_budget(config) - message_tokens(system_message)
+    window, saved = fit_to_budget(messages, budget)
+    metrics.observe("context_tokens_saved", saved, agent=agent)
+    if saved:
+        logger.debug("%s: dropped %d history tokens to fit the context budget", agent, saved)
+    return [system_message, *window]
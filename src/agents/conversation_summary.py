@@ -0,0 +1,119 @@
+import logging
+from collections.abc import Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.types import StateSnapshot
+
+from core import get_model, metrics, settings
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """You maintain a rolling summary of a conversation between a user and a
+roleplay character. Merge the earlier summary and the new part of the conversation into one
+updated summary. Keep facts about the user, promises, plans, open questions and the emotional
+tone. Leave out small talk. Write at most 200 words, in the language of the conversation."""
+
+
+def messages_after(messages: Sequence[BaseMessage], message_id: str | None) -> list[BaseMessage]:
+    """Return the messages after the one with message_id, or all if it is not found."""
+    if message_id:
+        for index, message in enumerate(messages):
+            if message.id == message_id:
+                return list(messages[index + 1 :])
+    return list(messages)
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> list[list[BaseMessage]]:
+    """Split messages into turns, each starting at a user message."""
+    turns: list[list[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+
+def _transcript(messages: Sequence[BaseMessage]) -> str:
+    """Render the user messages and answers; tool calls and inner voices are left out."""
+    lines = []
+    for message in messages:
+        if isinstance(message, HumanMessage | AIMessage) and isinstance(message.content, str):
+            if message.content:
+                role = "User" if isinstance(message, HumanMessage) else "Character"
+                lines.append(f"{role}: {message.content}")
+    return "\n".join(lines)
+
+
+async def amoved_on(agent: CompiledStateGraph, snapshot: StateSnapshot) -> bool:
+    """Whether the thread has a newer checkpoint than snapshot, e.g. from its next run.
+
+    The `after_run` hooks run while the thread takes new messages, so they check this
+    right before writing and drop the write if the state they read is no longer current.
+    """
+    latest = await agent.checkpointer.aget_tuple(
+        RunnableConfig(configurable=snapshot.config["configurable"] | {"checkpoint_id": None})
+    )
+    return (
+        latest is None
+        or latest.config["configurable"]["checkpoint_id"]
+        != snapshot.config["configurable"]["checkpoint_id"]
+    )
+
+
+async def asummarize(summary: str, messages: Sequence[BaseMessage], config: RunnableConfig) -> str:
+    """Fold messages into the summary with one model call."""
+    configurable = config.get("configurable", {})
+    model_name = (
+        settings.CONVERSATION_SUMMARY_MODEL or configurable.get("model") or settings.DEFAULT_MODEL
+    )
+    content = (
+        f"Earlier summary:\n{summary or '(none)'}\n\nNew conversation:\n{_transcript(messages)}"
+    )
+    response = await get_model(model_name).ainvoke(
+        [SystemMessage(content=SUMMARY_PROMPT), HumanMessage(content=content)], config
+    )
+    return response.content
+
+
+async def asummarize_conversation(
+    agent: CompiledStateGraph, config: RunnableConfig, as_node: str = "model"
+) -> None:
+    """Fold older turns of a thread into its rolling summary.
+
+    Meant to run after a response has been delivered, see the agent's `after_run` hook. Once
+    more than CONVERSATION_SUMMARY_KEEP_TURNS + CONVERSATION_SUMMARY_BATCH_TURNS turns are
+    unsummarized, all but the last CONVERSATION_SUMMARY_KEEP_TURNS turns are folded in.
+    The state update is written as if made by `as_node`, on the checkpoint the turns were
+    read from. If the thread has moved on meanwhile, the update is dropped; the next run's
+    hook folds the turns in instead.
+    """
+    if not settings.CONVERSATION_SUMMARY_ENABLED:
+        return
+    config = RunnableConfig(configurable=config["configurable"])
+    snapshot = await agent.aget_state(config)
+    if snapshot.next:
+        # Interrupted or still running
+        return
+    values = snapshot.values
+    turns = split_turns(
+        messages_after(values.get("messages", []), values.get("summarized_through"))
+    )
+    keep = settings.CONVERSATION_SUMMARY_KEEP_TURNS
+    if len(turns) < keep + settings.CONVERSATION_SUMMARY_BATCH_TURNS:
+        return
+    folded = [message for turn in turns[: len(turns) - keep] for message in turn]
+    summary = await asummarize(values.get("summary", ""), folded, config)
+    if await amoved_on(agent, snapshot):
+        metrics.increment("conversation_summary_dropped_total")
+        logger.debug("The thread moved on, dropping its conversation summary")
+        return
+    await agent.aupdate_state(
+        snapshot.config,
+        {"summary": summary, "summarized_through": folded[-1].id},
+        as_node=as_node,
+    )
+    metrics.increment("conversation_summary_turns_folded_total", len(turns) - keep)
+    logger.debug("Folded %d turns into the conversation summary", len(turns) - keep)
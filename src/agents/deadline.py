@@ -0,0 +1,63 @@
+import time
+from enum import StrEnum
+
+from langchain_core.runnables import RunnableConfig
+
+from core import metrics, settings
+from schema.models import AllModelEnum
+
+
+class Degradation(StrEnum):
+    """Shortcuts an agent takes to answer within the request's latency budget."""
+
+    # Answer without consulting the character's inner voices
+    SKIP_INNER_VOICES = "skip_inner_voices"
+    # Answer with what the tools returned so far instead of another tool round
+    CUT_TOOL_LOOP = "cut_tool_loop"
+    # Use DEADLINE_FAST_MODEL instead of the request's model
+    FAST_MODEL = "fast_model"
+
+
+def remaining_ms(config: RunnableConfig) -> float | None:
+    """Milliseconds left until the request's deadline, or None without a deadline.
+
+    The service turns `deadline_ms` (agent_config or the X-Deadline-Ms header) into the
+    absolute `deadline` in the configurable, in seconds since the epoch.
+    """
+    deadline = config.get("configurable", {}).get("deadline")
+    if deadline is None:
+        return None
+    return (deadline - time.time()) * 1000
+
+
+def _below(config: RunnableConfig, threshold_ms: float) -> bool:
+    remaining = remaining_ms(config)
+    return remaining is not None and remaining < threshold_ms
+
+
+def skip_inner_voices(config: RunnableConfig) -> bool:
+    return _below(config, settings.DEADLINE_INNER_VOICES_MS)
+
+
+def cut_tool_loop(config: RunnableConfig) -> bool:
+    return _below(config, settings.DEADLINE_TOOL_LOOP_MS)
+
+
+def deadline_model(model_name: AllModelEnum, config: RunnableConfig) -> tuple[AllModelEnum, bool]:
+    """Return the model to use with the remaining budget, and whether it was switched."""
+    fast_model = settings.DEADLINE_FAST_MODEL
+    if fast_model and model_name != fast_model and _below(config, settings.DEADLINE_FAST_MODEL_MS):
+        return fast_model, True
+    return model_name, False
+
+
+def record_degradations(agent: str, degradations: list[str], config: RunnableConfig) -> dict:
+    """Count a finished turn's degradations; returns the response metadata that lists them."""
+    remaining = remaining_ms(config)
+    if remaining is None:
+        return {}
+    for degradation in degradations:
+        metrics.increment("deadline_degradations_total", agent=agent, degradation=degradation)
+    if remaining < 0:
+        metrics.increment("deadline_missed_total", agent=agent)
+    return {"degradations": list(degradations)}
@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from functools import cache
+
+import numpy as np
+
+from core import metrics, settings
+from core.embeddings import Embedder, VectorIndex, get_embedder
+
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = re.compile(r"^[\W_]+|[\W_]+$")
+
+
+def normalize_message(message: str) -> str:
+    """Normalize an inner-voice input so trivial variations share a cache entry."""
+    message = _WHITESPACE.sub(" ", message.casefold()).strip()
+    return _EDGE_PUNCTUATION.sub("", message)
+
+
+class InnerVoiceCache:
+    """Memoizes inner-voice tool responses.
+
+    Entries are keyed by character, inner voice, model and the normalized message. The first
+    tier is an in-process LRU with a TTL. The optional second tier is a SQLite file that is
+    shared by all worker processes on the host; hits there are promoted into memory. Hit,
+    miss and eviction counters are recorded in the service metrics.
+    """
+
+    def __init__(
+        self, max_entries: int, ttl_seconds: float, sqlite_path: str | None = None
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_path = sqlite_path
+        # key -> (expires_at, response), expiry on the monotonic clock
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        if sqlite_path:
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS inner_voice_cache (
+                        key TEXT PRIMARY KEY,
+                        response TEXT NOT NULL,
+                        expires_at REAL NOT NULL,
+                        last_used REAL NOT NULL
+                    )
+                    """
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS inner_voice_cache_last_used "
+                    "ON inner_voice_cache (last_used)"
+                )
+
+    @staticmethod
+    def make_key(character: str, voice: str, model: str, message: str) -> str:
+        raw = "\x1f".join((character, voice, str(model), normalize_message(message)))
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    async def aget(self, key: str) -> str | None:
+        if (response := self._get_memory(key)) is not None:
+            metrics.increment("inner_voice_cache_hits_total", tier="memory")
+            return response
+        if self.sqlite_path:
+            response = await asyncio.to_thread(self._get_sqlite, key)
+            if response is not None:
+                metrics.increment("inner_voice_cache_hits_total", tier="sqlite")
+                self._put_memory(key, response)
+                return response
+        metrics.increment("inner_voice_cache_misses_total")
+        return None
+
+    async def aput(self, key: str, response: str) -> None:
+        self._put_memory(key, response)
+        if self.sqlite_path:
+            await asyncio.to_thread(self._put_sqlite, key, response)
+
+    def _get_memory(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            metrics.increment("inner_voice_cache_evictions_total", tier="memory", reason="ttl")
+            self._update_size()
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def _put_memory(self, key: str, response: str) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            metrics.increment("inner_voice_cache_evictions_total", tier="memory", reason="capacity")
+        self._update_size()
+
+    def _update_size(self) -> None:
+        metrics.set_gauge("inner_voice_cache_entries", len(self._entries), tier="memory")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.sqlite_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _get_sqlite(self, key: str) -> str | None:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT response FROM inner_voice_cache WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE inner_voice_cache SET last_used = ? WHERE key = ?", (now, key))
+        return row[0] if row else None
+
+    def _put_sqlite(self, key: str, response: str) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO inner_voice_cache VALUES (?, ?, ?, ?)",
+                (key, response, now + self.ttl_seconds, now),
+            )
+            expired = conn.execute(
+                "DELETE FROM inner_voice_cache WHERE expires_at <= ?", (now,)
+            ).rowcount
+            overflow = conn.execute(
+                """
+                DELETE FROM inner_voice_cache WHERE key IN (
+                    SELECT key FROM inner_voice_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            ).rowcount
+        if expired:
+            metrics.increment(
+                "inner_voice_cache_evictions_total", expired, tier="sqlite", reason="ttl"
+            )
+        if overflow:
+            metrics.increment(
+                "inner_voice_cache_evictions_total", overflow, tier="sqlite", reason="capacity"
+            )
+
+
+class SemanticInnerVoiceCache:
+    """Reuses inner-voice responses for messages that are similar, not only identical.
+
+    Messages are embedded with a pluggable embedder. Each (character, voice, model)
+    partition keeps its own bounded vector index; a lookup returns the stored response of
+    the most similar earlier message if the cosine similarity reaches the threshold.
+    """
+
+    def __init__(
+        self, threshold: float, max_entries: int, embedder: Embedder | None = None
+    ) -> None:
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.embedder = embedder or get_embedder()
+        self._partitions: dict[tuple[str, str, str], VectorIndex] = {}
+
+    def partition(self, character: str, voice: str, model: str) -> VectorIndex:
+        key = (character, voice, str(model))
+        if key not in self._partitions:
+            self._partitions[key] = VectorIndex(self.embedder.dim, self.max_entries)
+        return self._partitions[key]
+
+    def _embed(self, message: str) -> np.ndarray:
+        return self.embedder.embed([normalize_message(message)])[0]
+
+    def lookup(self, character: str, voice: str, model: str, message: str) -> str | None:
+        index = self.partition(character, voice, model)
+        matches = index.search(self._embed(message))
+        if matches and matches[0][1] >= self.threshold:
+            position, similarity = matches[0]
+            index.touch(position)
+            metrics.increment("inner_voice_cache_hits_total", tier="semantic")
+            metrics.observe("inner_voice_semantic_similarity", similarity)
+            return index.payloads[position]
+        metrics.increment("inner_voice_cache_misses_total", tier="semantic")
+        return None
+
+    def add(self, character: str, voice: str, model: str, message: str, response: str) -> None:
+        index = self.partition(character, voice, model)
+        if evicted := index.add(self._embed(message), response):
+            metrics.increment(
+                "inner_voice_cache_evictions_total", evicted, tier="semantic", reason="capacity"
+            )
+        metrics.set_gauge(
+            "inner_voice_cache_entries",
+            sum(len(index) for index in self._partitions.values()),
+            tier="semantic",
+        )
+
+
+@cache
+def get_inner_voice_cache() -> InnerVoiceCache | None:
+    """Return the process-wide inner-voice cache, or None unless enabled in the settings."""
+    if not settings.INNER_VOICE_CACHE_ENABLED:
+        return None
+    return InnerVoiceCache(
+        max_entries=settings.INNER_VOICE_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.INNER_VOICE_CACHE_TTL_SECONDS,
+        sqlite_path=settings.INNER_VOICE_CACHE_SQLITE_PATH,
+    )
+
+
+@cache
+def get_semantic_inner_voice_cache() -> SemanticInnerVoiceCache | None:
+    """Return the process-wide semantic inner-voice cache, or None unless enabled."""
+    if not settings.INNER_VOICE_SEMANTIC_CACHE_ENABLED:
+        return None
+    return SemanticInnerVoiceCache(
+        threshold=settings.INNER_VOICE_SEMANTIC_CACHE_THRESHOLD,
+        max_entries=settings.INNER_VOICE_SEMANTIC_CACHE_MAX_ENTRIES,
+    )
@@ -0,0 +1,71 @@
+from typing import TypedDict
+
+import numpy as np
+from langchain_core.runnables import RunnableConfig
+
+from agents.inner_voice_cache import normalize_message
+from core import metrics, settings
+from core.embeddings import get_embedder
+
+
+class InnerVoiceResult(TypedDict):
+    """The last result of an inner voice in a thread, kept in the graph state."""
+
+    response: str
+    # Embedding of the user message it was consulted for, float32 `ndarray.tobytes()`
+    fingerprint: bytes
+    # Number of later turns that reused it
+    turns: int
+
+
+def reuse_limit(config: RunnableConfig) -> int:
+    """How many later turns may reuse an inner-voice result; 0 disables reuse."""
+    configurable = config.get("configurable", {})
+    return configurable.get("inner_voice_reuse_turns", settings.INNER_VOICE_REUSE_MAX_TURNS)
+
+
+def fingerprint(message: str) -> bytes:
+    return get_embedder().embed([normalize_message(message)])[0].tobytes()
+
+
+def reusable_voices(
+    results: dict[str, InnerVoiceResult] | None, message: str, limit: int
+) -> dict[str, str]:
+    """Return the responses of the inner voices that need no new consultation for message.
+
+    A result is reused while the message stays within INNER_VOICE_REUSE_THRESHOLD cosine
+    similarity of the message it was consulted for, at most `limit` turns in a row.
+    """
+    if not results or limit <= 0:
+        return {}
+    query = np.frombuffer(fingerprint(message), dtype=np.float32)
+    reused = {}
+    for voice, result in results.items():
+        similarity = float(np.frombuffer(result["fingerprint"], dtype=np.float32) @ query)
+        if similarity < settings.INNER_VOICE_REUSE_THRESHOLD:
+            outcome = "changed"
+        elif result["turns"] >= limit:
+            outcome = "stale"
+        else:
+            outcome = "reused"
+            reused[voice] = result["response"]
+        metrics.increment("inner_voice_reuse_total", voice=voice, outcome=outcome)
+    return reused
+
+
+def update_results(
+    results: dict[str, InnerVoiceResult] | None,
+    fresh: dict[str, str],
+    reused: list[str],
+    message: str,
+) -> dict[str, InnerVoiceResult]:
+    """Record the inner voices consulted for message and age the reused ones."""
+    updated = dict(results or {})
+    if fresh:
+        current = fingerprint(message)
+        for voice, response in fresh.items():
+            updated[voice] = InnerVoiceResult(response=response, fingerprint=current, turns=0)
+    for voice in reused:
+        if voice in updated:
+            updated[voice] = {**updated[voice], "turns": updated[voice]["turns"] + 1}
+    return updated
@@ -0,0 +1,106 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import cache
+
+import numpy as np
+
+from agents.inner_voice_cache import normalize_message
+from core import metrics, settings
+from core.embeddings import Embedder, get_embedder
+
+
+@dataclass
+class Speculation:
+    """Inner-voice responses for the topic of a thread's last user message."""
+
+    model: str
+    embedding: np.ndarray
+    responses: dict[str, str]
+    # LLM calls spent on it; none for the responses a turn already had
+    calls: int
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class InnerVoiceSpeculation:
+    """Inner-voice responses consulted during the user's think time, one set per thread.
+
+    After a reply, the inner-voice responses of the turn are stored with `put`, with the last
+    user message as their topic. The next turn `claim`s them: if
+    the new message is similar enough to the topic, the responses are used by that turn's
+    consultations; otherwise they are discarded. At most max_threads speculations are kept.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        ttl_seconds: float,
+        max_threads: int,
+        embedder: Embedder | None = None,
+    ) -> None:
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_threads = max_threads
+        self.embedder = embedder or get_embedder()
+        self._pending: OrderedDict[str, Speculation] = OrderedDict()
+        self._claimed: OrderedDict[str, dict[str, str]] = OrderedDict()
+
+    def _embed(self, message: str) -> np.ndarray:
+        return self.embedder.embed([normalize_message(message)])[0]
+
+    def put(
+        self,
+        thread_id: str,
+        model: str,
+        topic: str,
+        responses: dict[str, str],
+        calls: int = 0,
+    ) -> None:
+        if (superseded := self._pending.pop(thread_id, None)) is not None:
+            metrics.increment("inner_voice_speculations_total", outcome="superseded")
+            metrics.increment("inner_voice_speculation_wasted_calls_total", superseded.calls)
+        self._pending[thread_id] = Speculation(str(model), self._embed(topic), responses, calls)
+        metrics.increment("inner_voice_speculation_calls_total", calls)
+        while len(self._pending) > self.max_threads:
+            _, evicted = self._pending.popitem(last=False)
+            metrics.increment("inner_voice_speculations_total", outcome="evicted")
+            metrics.increment("inner_voice_speculation_wasted_calls_total", evicted.calls)
+
+    def claim(self, thread_id: str, model: str, message: str) -> bool:
+        """Use the thread's speculation for this turn if message is on the same topic."""
+        self._claimed.pop(thread_id, None)
+        speculation = self._pending.pop(thread_id, None)
+        if speculation is None:
+            return False
+        similarity = float(speculation.embedding @ self._embed(message))
+        if time.monotonic() - speculation.created_at > self.ttl_seconds:
+            outcome = "expired"
+        elif speculation.model != str(model) or similarity < self.threshold:
+            outcome = "miss"
+        else:
+            outcome = "hit"
+        metrics.increment("inner_voice_speculations_total", outcome=outcome)
+        metrics.observe("inner_voice_speculation_similarity", similarity)
+        if outcome != "hit":
+            metrics.increment("inner_voice_speculation_wasted_calls_total", speculation.calls)
+            return False
+        self._claimed[thread_id] = speculation.responses
+        while len(self._claimed) > self.max_threads:
+            self._claimed.popitem(last=False)
+        return True
+
+    def use(self, thread_id: str, voice: str) -> str | None:
+        """Return the claimed response of an inner voice for the thread's current turn."""
+        return self._claimed.get(thread_id, {}).get(voice)
+
+
+@cache
+def get_inner_voice_speculation() -> InnerVoiceSpeculation | None:
+    """Return the process-wide speculation store, or None unless enabled in the settings."""
+    if not settings.INNER_VOICE_SPECULATION_ENABLED:
+        return None
+    return InnerVoiceSpeculation(
+        threshold=settings.INNER_VOICE_SPECULATION_THRESHOLD,
+        ttl_seconds=settings.INNER_VOICE_SPECULATION_TTL_SECONDS,
+        max_threads=settings.INNER_VOICE_SPECULATION_MAX_THREADS,
+    )
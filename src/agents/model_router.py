@@ -0,0 +1,121 @@
+import logging
+import re
+import time
+from collections.abc import Sequence
+from enum import StrEnum
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from pydantic import BaseModel
+
+from agents.turn_classifier import TurnRoute, classify_heuristic
+from core import get_model, metrics, settings
+from core.admission import ProviderBusyError
+from schema.models import AllModelEnum, AutoModelName
+
+logger = logging.getLogger(__name__)
+
+
+class Complexity(StrEnum):
+    """How demanding a message is to answer, the tiers of MODEL_ROUTES."""
+
+    SIMPLE = "simple"
+    MODERATE = "moderate"
+    COMPLEX = "complex"
+
+
+# Words asking for reasoning, comparison or long structured output
+COMPLEX_MARKERS = re.compile(
+    r"\b(warum|wieso|weshalb|erkläre?|erklär|analysiere|vergleiche?|begründe|bewerte|"
+    r"berechne|beweise|plane|schritt für schritt|zusammenfass\w*|"
+    # "fasse ... zusammen", but not "zusammen" alone as in "gehen wir zusammen essen?"
+    r"fasse?\b[^.?!]*?\bzusammen|why|explain|analy[sz]e|"
+    r"compare|evaluate|calculate|prove|derive|step by step|summari[sz]e|debug|implement)\b",
+    re.IGNORECASE,
+)
+# Messages up to this many words without markers are simple
+SIMPLE_MAX_WORDS = 12
+# Messages over this many words are complex
+COMPLEX_MIN_WORDS = 120
+
+CLASSIFIER_PROMPT = """Rate how demanding it is to answer the user's message well.
+simple: small talk, greetings, short facts, yes/no questions.
+moderate: ordinary questions and requests that need a few sentences.
+complex: multi-step reasoning, analysis, comparisons, code, math or long structured answers."""
+
+
+class ComplexityClassification(BaseModel):
+    complexity: Complexity
+
+
+def classify_complexity_heuristic(message: str) -> Complexity | None:
+    """Classify a message locally, or return None when it is not clearly simple or complex."""
+    if classify_heuristic(message) == TurnRoute.TRIVIAL:
+        return Complexity.SIMPLE
+    words = len(message.split())
+    markers = len(COMPLEX_MARKERS.findall(message))
+    if "```" in message or words > COMPLEX_MIN_WORDS or markers >= 2:
+        return Complexity.COMPLEX
+    if words <= SIMPLE_MAX_WORDS and not markers:
+        return Complexity.SIMPLE
+    return None
+
+
+async def aclassify_with_model(message: str) -> Complexity:
+    """Classify a message with MODEL_ROUTER_MODEL, falling back to moderate on errors."""
+    model = get_model(settings.MODEL_ROUTER_MODEL).with_structured_output(ComplexityClassification)
+    try:
+        result = await model.ainvoke(
+            [SystemMessage(content=CLASSIFIER_PROMPT), HumanMessage(content=message)]
+        )
+    except ProviderBusyError:
+        raise
+    except Exception as e:
+        logger.warning(f"Error in model router classifier: {e}")
+        return Complexity.MODERATE
+    return result.complexity
+
+
+async def aclassify_complexity(message: str) -> Complexity:
+    """Classify a message with the heuristic, escalating unclear ones to MODEL_ROUTER_MODEL.
+
+    Without MODEL_ROUTER_MODEL, unclear messages are moderate. The classification latency is
+    recorded per classifier and escalations are counted.
+    """
+    start = time.perf_counter()
+    complexity = classify_complexity_heuristic(message)
+    classifier = "heuristic"
+    if complexity is None and settings.MODEL_ROUTER_MODEL:
+        metrics.increment("model_router_escalations_total")
+        complexity = await aclassify_with_model(message)
+        classifier = "model"
+    metrics.observe(
+        "model_router_classifier_seconds", time.perf_counter() - start, classifier=classifier
+    )
+    return complexity or Complexity.MODERATE
+
+
+def route_model(complexity: Complexity) -> AllModelEnum:
+    """Return the model for a complexity tier, DEFAULT_MODEL for tiers without a usable route."""
+    model = settings.MODEL_ROUTES.get(complexity)
+    if model is None or model == AutoModelName.AUTO or model not in settings.AVAILABLE_MODELS:
+        return settings.DEFAULT_MODEL
+    return model
+
+
+async def aroute_model(message: str) -> tuple[Complexity, AllModelEnum]:
+    """Pick the model for a request with model "auto" from its message."""
+    complexity = await aclassify_complexity(message)
+    model = route_model(complexity)
+    metrics.increment("model_router_turns_total", complexity=complexity, model=model)
+    return complexity, model
+
+
+def record_routed_turn(complexity: str, seconds: float, messages: Sequence[BaseMessage]) -> None:
+    """Record the latency and token usage of a routed turn, from the messages it produced."""
+    tokens = sum(
+        (message.usage_metadata or {}).get("total_tokens", 0)
+        for message in messages
+        if isinstance(message, AIMessage)
+    )
+    metrics.observe("model_router_turn_seconds", seconds, complexity=complexity)
+    metrics.observe("model_router_turn_tokens", tokens, complexity=complexity)
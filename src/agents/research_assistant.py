@@ -4,19 +4,22 @@ from typing import Literal
 from langchain_community.tools import DuckDuckGoSearchResults, OpenWeatherMapQueryRun
 from langchain_community.utilities import OpenWeatherMapAPIWrapper
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.messages import AIMessage, SystemMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig, RunnableLambda, RunnableSerializable
 from langgraph.checkpoint.memory import MemorySaver
-from langgraph.graph import END, MessagesState, StateGraph
+from langgraph.graph import END, StateGraph
 from langgraph.managed import RemainingSteps
 from langgraph.prebuilt import ToolNode
 
+from agents.context_window import CountedMessagesState, build_context
+from agents.deadline import Degradation, cut_tool_loop, deadline_model, record_degradations
 from agents.llama_guard import LlamaGuard, LlamaGuardOutput, SafetyAssessment
+from agents.thread_memory import ThreadMemory, aupdate_memory, memory_enabled, recall
 from agents.tools import calculator
 from core import get_model, settings
 
 
-class AgentState(MessagesState, total=False):
+class AgentState(CountedMessagesState, total=False):
     """`total=False` is PEP589 specs.
 
     documentation: https://typing.readthedocs.io/en/latest/spec/typeddict.html#totality
@@ -24,6 +27,8 @@ class AgentState(MessagesState, total=False):
 
     safety: LlamaGuardOutput
     remaining_steps: RemainingSteps
+    thread_memory: ThreadMemory
+    degradations: list[Degradation]
 
 
 web_search = DuckDuckGoSearchResults(name="WebSearch")
@@ -52,12 +57,20 @@ instructions = f"""
     """
 
 
-def wrap_model(model: BaseChatModel) -> RunnableSerializable[AgentState, AIMessage]:
-    model = model.bind_tools(tools)
-    preprocessor = RunnableLambda(
-        lambda state: [SystemMessage(content=instructions)] + state["messages"],
-        name="StateModifier",
-    )
+def wrap_model(
+    model: BaseChatModel, use_tools: bool = True
+) -> RunnableSerializable[AgentState, AIMessage]:
+    if use_tools:
+        model = model.bind_tools(tools)
+    system_message = SystemMessage(content=instructions)
+
+    def prepare_messages(state: AgentState, config: RunnableConfig) -> list:
+        messages = state["messages"]
+        if memory_enabled(config):
+            messages = recall(messages, state.get("thread_memory"))
+        return build_context(system_message, messages, config, agent="research_assistant")
+
+    preprocessor = RunnableLambda(prepare_messages, name="StateModifier")
     return preprocessor | model
 
 
@@ -69,8 +82,20 @@ def format_safety_message(safety: LlamaGuardOutput) -> AIMessage:
 
 
 async def acall_model(state: AgentState, config: RunnableConfig) -> AgentState:
-    m = get_model(config["configurable"].get("model", settings.DEFAULT_MODEL))
-    model_runnable = wrap_model(m)
+    # Degradations apply to the current turn, which starts with the user's message
+    new_turn = isinstance(state["messages"][-1], HumanMessage)
+    degradations = [] if new_turn else list(state.get("degradations", []))
+    model_name, switched = deadline_model(
+        config["configurable"].get("model", settings.DEFAULT_MODEL), config
+    )
+    if switched and Degradation.FAST_MODEL not in degradations:
+        degradations.append(Degradation.FAST_MODEL)
+    # Without enough of the latency budget left, answer with the tool results so far
+    use_tools = not cut_tool_loop(config)
+    if not use_tools and Degradation.CUT_TOOL_LOOP not in degradations:
+        degradations.append(Degradation.CUT_TOOL_LOOP)
+    m = get_model(model_name)
+    model_runnable = wrap_model(m, use_tools)
     response = await model_runnable.ainvoke(state, config)
 
     # Run llama guard check here to avoid returning the message if it's unsafe
@@ -88,8 +113,20 @@ async def acall_model(state: AgentState, config: RunnableConfig) -> AgentState:
                 )
             ]
         }
+    if not response.tool_calls:
+        response.response_metadata.update(
+            record_degradations("research_assistant", degradations, config)
+        )
     # We return a list, because this will get added to the existing list
-    return {"messages": [response]}
+    return {"messages": [response], "degradations": degradations}
+
+
+async def index_memory(state: AgentState, config: RunnableConfig) -> AgentState:
+    # Index the turns completed since the last one and recall the relevant older ones
+    if memory_enabled(config):
+        if memory := await aupdate_memory(state["messages"], state.get("thread_memory"), config):
+            return {"thread_memory": memory}
+    return {}
 
 
 async def llama_guard_input(state: AgentState, config: RunnableConfig) -> AgentState:
@@ -109,7 +146,9 @@ agent.add_node("model", acall_model)
 agent.add_node("tools", ToolNode(tools))
 agent.add_node("guard_input", llama_guard_input)
 agent.add_node("block_unsafe_content", block_unsafe_content)
-agent.set_entry_point("guard_input")
+agent.add_node("index_memory", index_memory)
+agent.set_entry_point("index_memory")
+agent.add_edge("index_memory", "guard_input")
 
 
 # Check for unsafe input and block further processing if found
@@ -2,19 +2,21 @@ from typing import List, Dict, Any, Annotated, Literal
 from datetime import datetime
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
 from langchain_core.runnables import RunnableConfig, RunnableLambda, RunnableSerializable
-from langgraph.graph import END, StateGraph, MessagesState
+from langgraph.graph import END, StateGraph
 from langgraph.prebuilt import ToolNode
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph.message import AnyMessage, add_messages
 from langgraph.managed import RemainingSteps
 
+from agents.context_window import CountedMessagesState, build_context
 from core import get_model, settings
+from core.admission import ProviderBusyError
 
 # Global tasks list (to be managed by the agent)
 _TASKS = []
 
 # Define our state
-class TaskState(MessagesState, total=False):
+class TaskState(CountedMessagesState, total=False):
     """State for task management agent."""
     remaining_steps: RemainingSteps
 
@@ -72,8 +74,11 @@ Remember to:
 def wrap_model(model) -> RunnableSerializable[TaskState, AIMessage]:
     """Wrap the model with system prompt and tools."""
     model = model.bind_tools(tools)
+    system_message = SystemMessage(content=SYSTEM_PROMPT)
     preprocessor = RunnableLambda(
-        lambda state: [SystemMessage(content=SYSTEM_PROMPT)] + state["messages"],
+        lambda state, config: build_context(
+            system_message, state["messages"], config, agent="task_manager"
+        ),
         name="StateModifier",
     )
     return preprocessor | model
@@ -104,6 +109,8 @@ async def acall_model(state: TaskState, config: RunnableConfig) -> TaskState:
             response = await model_runnable.ainvoke(state, config)
         
         return {"messages": [response]}
+    except ProviderBusyError:
+        raise
     except Exception as e:
         # Handle any errors gracefully
         error_message = f"Error in model call: {str(e)}"
@@ -0,0 +1,154 @@
+import time
+from collections.abc import Sequence
+from typing import TypedDict
+
+import numpy as np
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+
+from agents.conversation_summary import split_turns
+from core import metrics, settings
+from core.embeddings import get_embedder
+from memory import get_thread_memory_store
+
+
+class ThreadMemory(TypedDict, total=False):
+    """Where a thread's memory stands, stored in the graph state.
+
+    The embeddings of the completed turns are in the `ThreadMemoryStore`, keyed by the id of
+    each turn's user message; the state only keeps the last indexed turn and the older
+    turns recalled for the current one, so it does not grow with the thread.
+    """
+
+    indexed_through: str
+    recalled: list[str]
+
+
+def memory_enabled(config: RunnableConfig) -> bool:
+    return bool(config.get("configurable", {}).get("thread_memory", settings.THREAD_MEMORY_ENABLED))
+
+
+def _turn_text(turn: Sequence[BaseMessage]) -> str:
+    """The user message and the final answers of a turn, without tool calls."""
+    return "\n".join(
+        message.content
+        for message in turn
+        if isinstance(message, HumanMessage | AIMessage)
+        and not getattr(message, "tool_calls", None)
+        and isinstance(message.content, str)
+    )
+
+
+def _conversation(turn: Sequence[BaseMessage]) -> list[BaseMessage]:
+    """The messages of a recalled turn: the user message and the final answers."""
+    return [
+        message
+        for message in turn
+        if isinstance(message, HumanMessage)
+        or isinstance(message, AIMessage)
+        and not message.tool_calls
+    ]
+
+
+def _split(
+    messages: Sequence[BaseMessage], recent_turns: int | None
+) -> tuple[list[list[BaseMessage]], list[list[BaseMessage]]]:
+    """Split the turns into the older ones, candidates for recall, and the recent ones."""
+    recent_turns = settings.THREAD_MEMORY_RECENT_TURNS if recent_turns is None else recent_turns
+    turns = split_turns(messages)
+    split = max(len(turns) - recent_turns, 0)
+    return turns[:split], turns[split:]
+
+
+async def aindex_turns(
+    messages: Sequence[BaseMessage], memory: ThreadMemory | None, thread_id: str
+) -> str | None:
+    """Store the completed turns after the last indexed one; returns the new last indexed turn.
+
+    The last turn is still in progress and is indexed once the next one starts. Returns
+    None if there was nothing to index.
+    """
+    indexed_through = (memory or {}).get("indexed_through")
+    # Only the messages from the last indexed turn on are split into turns. Without a known
+    # last turn, e.g. after compaction removed it, everything is offered to the store again,
+    # which ignores turns it already has.
+    start = next(
+        (
+            i
+            for i in range(len(messages) - 1, -1, -1)
+            if indexed_through and messages[i].id == indexed_through
+        ),
+        None,
+    )
+    turns = split_turns(messages[start or 0 :])[:-1]
+    if start is not None:
+        turns = turns[1:]
+    new_turns = [turn for turn in turns if isinstance(turn[0], HumanMessage)]
+    if not new_turns:
+        return None
+    vectors = get_embedder().embed([_turn_text(turn) for turn in new_turns])
+    await get_thread_memory_store().aadd(
+        thread_id, [(turn[0].id, vector.tobytes()) for turn, vector in zip(new_turns, vectors)]
+    )
+    return new_turns[-1][0].id
+
+
+async def arecall_turns(
+    messages: Sequence[BaseMessage],
+    thread_id: str,
+    recent_turns: int | None = None,
+    top_k: int | None = None,
+) -> list[str]:
+    """Return the ids of the top-k older turns most similar to the latest user message."""
+    top_k = settings.THREAD_MEMORY_TOP_K if top_k is None else top_k
+    older, _ = _split(messages, recent_turns)
+    query = next((m for m in reversed(messages) if isinstance(m, HumanMessage)), None)
+    if not older or not top_k or query is None or not isinstance(query.content, str):
+        return []
+
+    start = time.perf_counter()
+    embeddings = await get_thread_memory_store().aembeddings(thread_id)
+    candidates = [turn[0].id for turn in older if turn[0].id in embeddings]
+    recalled: list[str] = []
+    if candidates:
+        embedder = get_embedder()
+        vectors = np.frombuffer(b"".join(embeddings[c] for c in candidates), dtype=np.float32)
+        scores = vectors.reshape(len(candidates), embedder.dim) @ embedder.embed([query.content])[0]
+        k = min(top_k, len(candidates))
+        recalled = [candidates[i] for i in np.sort(np.argpartition(-scores, k - 1)[:k])]
+    metrics.observe("thread_memory_recall_seconds", time.perf_counter() - start)
+    return recalled
+
+
+async def aupdate_memory(
+    messages: Sequence[BaseMessage], memory: ThreadMemory | None, config: RunnableConfig
+) -> ThreadMemory | None:
+    """Index the turns completed since the last one and pick the older turns to recall.
+
+    Meant to run once at the start of each turn. Returns the new state of the thread's
+    memory, or None without a thread.
+    """
+    thread_id = config.get("configurable", {}).get("thread_id")
+    if not thread_id:
+        return None
+    updated = ThreadMemory(**(memory or {}))
+    if indexed_through := await aindex_turns(messages, memory, thread_id):
+        updated["indexed_through"] = indexed_through
+    updated["recalled"] = await arecall_turns(messages, thread_id)
+    return updated
+
+
+def recall(
+    messages: Sequence[BaseMessage],
+    memory: ThreadMemory | None,
+    recent_turns: int | None = None,
+) -> list[BaseMessage]:
+    """Return the older turns recalled for the current turn, plus the recent turns.
+
+    Recalled turns only contain the user message and the final answers and are returned in
+    conversation order, ahead of the recent turns.
+    """
+    older, recent = _split(messages, recent_turns)
+    recalled_ids = set((memory or {}).get("recalled", []))
+    recalled = [_conversation(turn) for turn in older if turn[0].id in recalled_ids]
+    return [message for turn in [*recalled, *recent] for message in turn]
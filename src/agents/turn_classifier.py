@@ -0,0 +1,163 @@
+import logging
+import time
+from enum import StrEnum
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+from pydantic import BaseModel, Field
+
+from agents.inner_voice_cache import normalize_message
+from core import get_model, metrics, settings
+from core.admission import ProviderBusyError
+
+logger = logging.getLogger(__name__)
+
+
+class TurnRoute(StrEnum):
+    """Whether a user message needs the character's inner voices."""
+
+    # Acknowledgements, thanks and greetings: answered directly by the persona
+    TRIVIAL = "trivial"
+    SUBSTANTIVE = "substantive"
+
+
+class TurnClassifier(StrEnum):
+    HEURISTIC = "heuristic"
+    MODEL = "model"
+    # Every message is substantive, as before the classifier existed
+    OFF = "off"
+
+
+# Whole messages (after normalization) that are small talk, unless they answer a question
+TRIVIAL_MESSAGES = frozenset(
+    {
+        "ok",
+        "okay",
+        "k",
+        "gut",
+        "super",
+        "cool",
+        "toll",
+        "prima",
+        "klar",
+        "alles klar",
+        "ja",
+        "nein",
+        "jo",
+        "nee",
+        "genau",
+        "stimmt",
+        "verstehe",
+        "aha",
+        "achso",
+        "danke",
+        "danke schön",
+        "danke dir",
+        "vielen dank",
+        "merci",
+        "bitte",
+        "gerne",
+        "hallo",
+        "hi",
+        "hey",
+        "moin",
+        "servus",
+        "guten morgen",
+        "guten tag",
+        "guten abend",
+        "gute nacht",
+        "tschüss",
+        "ciao",
+        "bis dann",
+        "bis später",
+        "yes",
+        "no",
+        "sure",
+        "thanks",
+        "thank you",
+        "thx",
+        "hello",
+        "bye",
+        "good night",
+        "lol",
+        "haha",
+    }
+)
+
+CLASSIFIER_PROMPT = """Classify the user's latest message to a roleplay character.
+A message is trivial if it is only small talk that needs no reflection, such as an
+acknowledgement, thanks, a greeting or a goodbye. Questions, opinions, requests and anything
+about the character's life, feelings or relationships are substantive. A reply to a question
+the character asked, even a single word such as "ja" or "nein", is substantive."""
+
+
+class TurnClassification(BaseModel):
+    trivial: bool = Field(description="Whether the message is only small talk")
+
+
+def _asks_question(previous_reply: str) -> bool:
+    return "?" in previous_reply
+
+
+def classify_heuristic(message: str, previous_reply: str = "") -> TurnRoute:
+    """Classify a message locally by matching it against known small-talk phrases.
+
+    After a reply of the character that asks a question, e.g. "ja" or "bitte" is the
+    answer to it, so nothing is small talk.
+    """
+    if _asks_question(previous_reply):
+        return TurnRoute.SUBSTANTIVE
+    normalized = normalize_message(message)
+    # Only punctuation or emoji, e.g. "👍"
+    if not normalized:
+        return TurnRoute.TRIVIAL
+    if "?" not in message and normalized in TRIVIAL_MESSAGES:
+        return TurnRoute.TRIVIAL
+    return TurnRoute.SUBSTANTIVE
+
+
+async def aclassify_with_model(
+    message: str, config: RunnableConfig, previous_reply: str = ""
+) -> TurnRoute:
+    """Classify a message with a small model, falling back to the heuristic on errors."""
+    model_name = config["configurable"].get(
+        "turn_classifier_model", settings.CHARACTER_TURN_CLASSIFIER_MODEL or settings.DEFAULT_MODEL
+    )
+    model = get_model(model_name).with_structured_output(TurnClassification)
+    messages = [SystemMessage(content=CLASSIFIER_PROMPT), HumanMessage(content=message)]
+    if previous_reply:
+        messages.insert(1, AIMessage(content=previous_reply))
+    try:
+        result = await model.with_config(tags=["skip_stream"]).ainvoke(messages, config)
+    except ProviderBusyError:
+        raise
+    except Exception as e:
+        logger.error(f"Error in turn classifier: {e}")
+        return classify_heuristic(message, previous_reply)
+    return TurnRoute.TRIVIAL if result.trivial else TurnRoute.SUBSTANTIVE
+
+
+async def aclassify_turn(
+    message: str, config: RunnableConfig, previous_reply: str = ""
+) -> TurnRoute:
+    """Route a user message with the classifier picked in the config or the settings.
+
+    `previous_reply` is the character's reply before the message, which the message may answer.
+
+    The classifier can be overridden per request with `turn_classifier` in the agent_config.
+    The classification latency is recorded per classifier.
+    """
+    classifier = TurnClassifier(
+        config["configurable"].get("turn_classifier", settings.CHARACTER_TURN_CLASSIFIER)
+    )
+    start = time.perf_counter()
+    if classifier == TurnClassifier.OFF:
+        route = TurnRoute.SUBSTANTIVE
+    elif classifier == TurnClassifier.MODEL:
+        route = await aclassify_with_model(message, config, previous_reply)
+    else:
+        route = classify_heuristic(message, previous_reply)
+    metrics.observe(
+        "character_turn_classifier_seconds", time.perf_counter() - start, classifier=classifier
+    )
+    return route
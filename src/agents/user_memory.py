@@ -0,0 +1,90 @@
+import logging
+from collections.abc import Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph.state import CompiledStateGraph
+from pydantic import BaseModel, Field
+
+from agents.conversation_summary import _transcript, split_turns
+from core import get_model, metrics, settings
+from memory import MemoryItem, get_long_term_store
+from memory.long_term import Namespace
+
+logger = logging.getLogger(__name__)
+
+FACTS_PROMPT = """You maintain long-term memory about the user of a roleplay character, shared
+by all their conversations with the character. From the latest exchange, extract durable facts
+the user told about themselves: name, family, work, home, plans, preferences, important events.
+Use short snake_case keys. When a fact changes, reuse its known key so it is replaced. Return no
+facts for small talk or for what the character said about itself."""
+
+
+class Fact(BaseModel):
+    key: str = Field(description="Short snake_case key, e.g. wohnort or name_der_tochter")
+    value: str = Field(description="The fact in one short sentence")
+
+
+class UserFacts(BaseModel):
+    """Durable facts about the user from the latest exchange."""
+
+    facts: list[Fact] = Field(default_factory=list)
+
+
+def memory_namespace(config: RunnableConfig) -> Namespace | None:
+    """The (user_id, character) namespace of a request, or None without store or user_id."""
+    configurable = config.get("configurable", {})
+    user_id = configurable.get("user_id")
+    if get_long_term_store() is None or not user_id:
+        return None
+    return (user_id, configurable.get("character", ""))
+
+
+async def arecall_user_facts(message: str, config: RunnableConfig) -> list[MemoryItem]:
+    """Return the stored facts about the user most relevant to the message."""
+    namespace = memory_namespace(config)
+    if namespace is None:
+        return []
+    return await get_long_term_store().asearch(namespace, message, settings.LONG_TERM_MEMORY_TOP_K)
+
+
+async def aextract_facts(
+    known: Sequence[MemoryItem], messages: Sequence[BaseMessage], config: RunnableConfig
+) -> list[Fact]:
+    """Extract facts about the user from messages with one structured-output call."""
+    model_name = (
+        settings.LONG_TERM_MEMORY_MODEL
+        or config.get("configurable", {}).get("model")
+        or settings.DEFAULT_MODEL
+    )
+    known_keys = ", ".join(item["key"] for item in known) or "(none)"
+    content = f"Known keys: {known_keys}\n\nLatest exchange:\n{_transcript(messages)}"
+    model = get_model(model_name).with_structured_output(UserFacts)
+    result = await model.ainvoke(
+        [SystemMessage(content=FACTS_PROMPT), HumanMessage(content=content)], config
+    )
+    return result.facts
+
+
+async def aremember_user_facts(agent: CompiledStateGraph, config: RunnableConfig) -> None:
+    """Store the facts the user told in the latest turn of a thread.
+
+    Meant to run after a response has been delivered, see the agent's `after_run` hook.
+    """
+    namespace = memory_namespace(config)
+    if namespace is None:
+        return
+    config = RunnableConfig(configurable=config["configurable"])
+    snapshot = await agent.aget_state(config)
+    if snapshot.next:
+        # Interrupted or still running
+        return
+    turns = split_turns(snapshot.values.get("messages", []))
+    if not turns or not isinstance(turns[-1][0], HumanMessage):
+        return
+    store = get_long_term_store()
+    facts = await aextract_facts(await store.alist(namespace), turns[-1], config)
+    for fact in facts:
+        await store.aput(namespace, fact.key, fact.value)
+    metrics.increment("long_term_memory_facts_written_total", len(facts))
+    logger.debug("Stored %d facts about the user", len(facts))
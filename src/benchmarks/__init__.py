@@ -0,0 +1 @@
+"""Latency and throughput benchmarks for the agent service. Run via `src/run_benchmark.py`."""
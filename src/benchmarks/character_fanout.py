@@ -0,0 +1,32 @@
+import statistics
+import time
+from unittest.mock import patch
+from uuid import uuid4
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from agents.character_agent import InnerVoiceMode, build_character_agent
+from benchmarks.simulated import SimulatedCharacterModel
+
+
+async def run(turns: int = 10, latency: float = 0.5) -> None:
+    """Compare per-reply latency of the sequential, fan-out and council inner-voice modes."""
+    print(f"Character reply latency over {turns} turns, {latency * 1000:.0f} ms per LLM call")
+    print(f"{'mode':<12}{'p50 (s)':>10}{'mean (s)':>10}{'LLM calls/reply':>18}")
+    for mode in InnerVoiceMode:
+        model = SimulatedCharacterModel(latency=latency)
+        graph = build_character_agent(checkpointer=MemorySaver(), inner_voice_mode=mode)
+        config = {"configurable": {**graph.character_config["configurable"]}}
+        config["configurable"]["thread_id"] = str(uuid4())
+        durations = []
+        with patch("agents.character_agent.get_model", return_value=model):
+            for turn in range(turns):
+                message = HumanMessage(content=f"Wie geht es dir heute? ({turn})")
+                start = time.perf_counter()
+                await graph.ainvoke({"messages": [message]}, config)
+                durations.append(time.perf_counter() - start)
+        print(
+            f"{mode.value:<12}{statistics.median(durations):>10.2f}"
+            f"{statistics.mean(durations):>10.2f}{model.calls / turns:>18.1f}"
+        )
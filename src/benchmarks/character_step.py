@@ -0,0 +1,32 @@
+import time
+from collections.abc import Callable
+
+from langchain_openai import ChatOpenAI
+
+from agents.character_agent import get_model_runnable, wrap_model
+from agents.character_prompts import get_character_prompts
+from core.llm import FakeToolModel
+
+
+def _microseconds_per_call(fn: Callable[[], object], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def run(iterations: int = 2000) -> None:
+    """Per-step cost of preparing the character model: rebuilding it vs the cached lookup."""
+    prompts = get_character_prompts("frank")
+    models = {
+        "FakeToolModel": FakeToolModel(responses=["Hallo."]),
+        # bind_tools on a real provider model also generates the tool schemas
+        "ChatOpenAI": ChatOpenAI(model="gpt-4o-mini", api_key="sk-benchmark"),
+    }
+    print(f"Per-step model preparation overhead, {iterations} iterations")
+    print(f"{'model':<16}{'wrap_model (us)':>18}{'cached (us)':>14}")
+    for label, model in models.items():
+        rebuild = _microseconds_per_call(lambda: wrap_model(model, prompts), iterations)
+        get_model_runnable(model, prompts)  # first use builds the entry
+        cached = _microseconds_per_call(lambda: get_model_runnable(model, prompts), iterations)
+        print(f"{label:<16}{rebuild:>18.1f}{cached:>14.2f}")
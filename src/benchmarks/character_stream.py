@@ -0,0 +1,64 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import httpx
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.tools import BaseTool, StructuredTool
+
+from agents import get_agent
+from benchmarks.simulated import SimulatedCharacterModel
+from service import app
+
+AGENT_ID = "frank-character"
+
+
+def _blocking_tools(tools: dict[str, BaseTool], model: SimulatedCharacterModel) -> dict:
+    """Recreate the previous inner-voice tools, which called the blocking `model.invoke`."""
+
+    def make(name: str, description: str) -> BaseTool:
+        def consult(message: str) -> str:
+            messages = [
+                SystemMessage(content="Du bist der Aspekt von Franks Bewusstsein."),
+                HumanMessage(content=f"Respond to this situation: {message}"),
+            ]
+            return model.invoke(messages).content
+
+        return StructuredTool.from_function(func=consult, name=name, description=description)
+
+    return {name: make(name, tool.description) for name, tool in tools.items()}
+
+
+async def _stream_once(client: httpx.AsyncClient, index: int) -> None:
+    body = {"message": f"Wie war dein Tag? ({index})", "stream_tokens": False}
+    async with client.stream("POST", f"/{AGENT_ID}/stream", json=body) as response:
+        response.raise_for_status()
+        async for _ in response.aiter_lines():
+            pass
+
+
+async def _measure(concurrency: int, model: SimulatedCharacterModel) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(_stream_once(client, i) for i in range(concurrency)))
+        return time.perf_counter() - start
+
+
+async def run(concurrency: int = 64, latency: float = 0.5) -> None:
+    """Throughput of N concurrent /frank-character/stream requests, blocking vs async tools."""
+    # The tools node answers reused voices itself and runs the others on its ToolNode
+    tool_node = get_agent(AGENT_ID).nodes["tools"].bound.afunc.tool_node
+    async_tools = tool_node.tools_by_name
+    print(f"{concurrency} concurrent /{AGENT_ID}/stream requests, {latency * 1000:.0f} ms per call")
+    print(f"{'inner-voice tools':<20}{'wall (s)':>10}{'req/s':>10}")
+    for label in ("blocking invoke", "async ainvoke"):
+        model = SimulatedCharacterModel(latency=latency)
+        if label == "blocking invoke":
+            tool_node.tools_by_name = _blocking_tools(async_tools, model)
+        try:
+            with patch("agents.character_agent.get_model", return_value=model):
+                elapsed = await _measure(concurrency, model)
+        finally:
+            tool_node.tools_by_name = async_tools
+        print(f"{label:<20}{elapsed:>10.2f}{concurrency / elapsed:>10.1f}")
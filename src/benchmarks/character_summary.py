@@ -0,0 +1,58 @@
+from unittest.mock import patch
+from uuid import uuid4
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from agents.character_agent import InnerVoiceMode, build_character_agent
+from agents.context_window import message_tokens
+from agents.conversation_summary import SUMMARY_PROMPT
+from benchmarks.simulated import SimulatedCharacterModel
+from core import settings
+
+MESSAGE = "Heute war ein langer Tag, ich war erst im Büro und danach noch beim Sport. " * 4
+
+
+class PromptTokenModel(SimulatedCharacterModel):
+    """Counts the prompt tokens of every call on the response path."""
+
+    prompt_tokens: int = 0
+
+    def _respond(self, messages: list[BaseMessage]) -> object:
+        system = messages[0].content if isinstance(messages[0], SystemMessage) else ""
+        if SUMMARY_PROMPT not in system:
+            self.prompt_tokens += sum(message_tokens(message) for message in messages)
+        return super()._respond(messages)
+
+
+async def run(turns: int = 40) -> None:
+    """Prompt tokens per turn over thread length, without and with the rolling summary."""
+    checkpoints = sorted({t for t in (5, 10, 20, 40, 80, turns) if t <= turns})
+    results: dict[bool, dict[int, int]] = {}
+    for enabled in (False, True):
+        model = PromptTokenModel()
+        graph = build_character_agent(
+            checkpointer=MemorySaver(), inner_voice_mode=InnerVoiceMode.FAN_OUT
+        )
+        config = {"configurable": {**graph.character_config["configurable"]}}
+        config["configurable"]["thread_id"] = str(uuid4())
+        results[enabled] = {}
+        with (
+            patch("agents.character_agent.get_model", return_value=model),
+            patch("agents.conversation_summary.get_model", return_value=model),
+            patch.object(settings, "CONVERSATION_SUMMARY_ENABLED", enabled),
+            patch.object(settings, "CONTEXT_TOKEN_BUDGET", 1_000_000),
+        ):
+            for turn in range(1, turns + 1):
+                model.prompt_tokens = 0
+                message = HumanMessage(content=f"{MESSAGE}({turn})")
+                await graph.ainvoke({"messages": [message]}, config)
+                if turn in checkpoints:
+                    results[enabled][turn] = model.prompt_tokens
+                # The service runs this in the background after the response
+                await graph.after_run(graph, config)
+
+    print(f"Prompt tokens per turn (all response-path LLM calls), {turns} turns, fan-out mode")
+    print(f"{'turn':>6}{'full history':>16}{'rolling summary':>18}")
+    for turn in checkpoints:
+        print(f"{turn:>6}{results[False][turn]:>16}{results[True][turn]:>18}")
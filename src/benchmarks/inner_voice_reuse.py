@@ -0,0 +1,40 @@
+import time
+from unittest.mock import patch
+from uuid import uuid4
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from agents.character_agent import InnerVoiceMode, build_character_agent
+from benchmarks.simulated import SimulatedCharacterModel
+from benchmarks.speculation import CONVERSATION
+from core import metrics, settings
+
+
+async def run(latency: float = 0.1, mode: str = InnerVoiceMode.FAN_OUT) -> None:
+    """Reply latency and LLM calls by how many turns may reuse an inner-voice result."""
+    print(f"Inner-voice reuse, {len(CONVERSATION)} turns, {mode} mode, {latency}s per call")
+    print(f"{'reuse turns':>12}{'mean reply (s)':>16}{'calls':>8}{'reused voices':>15}")
+    for limit in (0, 1, 2):
+        metrics.reset()
+        model = SimulatedCharacterModel(latency=latency)
+        graph = build_character_agent(
+            checkpointer=MemorySaver(), inner_voice_mode=InnerVoiceMode(mode)
+        )
+        config = {"configurable": {**graph.character_config["configurable"]}}
+        config["configurable"].update(thread_id=str(uuid4()), inner_voice_reuse_turns=limit)
+        replies = []
+        with (
+            patch("agents.character_agent.get_model", return_value=model),
+            patch.object(settings, "CONVERSATION_SUMMARY_ENABLED", False),
+        ):
+            for message in CONVERSATION:
+                start = time.perf_counter()
+                await graph.ainvoke({"messages": [HumanMessage(content=message)]}, config)
+                replies.append(time.perf_counter() - start)
+        reused = sum(
+            value
+            for key, value in metrics.snapshot()["counters"].items()
+            if key.startswith("inner_voice_reuse_total") and 'outcome="reused"' in key
+        )
+        print(f"{limit:>12}{sum(replies) / len(replies):>16.2f}{model.calls:>8}{int(reused):>15}")
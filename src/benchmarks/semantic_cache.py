@@ -0,0 +1,42 @@
+import time
+
+import numpy as np
+
+from agents.inner_voice_cache import SemanticInnerVoiceCache
+from core.embeddings import HashingEmbedder, normalize_rows
+
+QUERIES = [
+    "Wie geht es dir?",
+    "Hast du heute schon etwas gegessen?",
+    "Was machst du am Wochenende?",
+]
+
+
+def _fill(cache: SemanticInnerVoiceCache, entries: int, rng: np.random.Generator) -> None:
+    index = cache.partition("frank", "basic_self", "benchmark")
+    chunk = 100_000
+    for start in range(0, entries, chunk):
+        size = min(chunk, entries - start)
+        vectors = normalize_rows(rng.standard_normal((size, index.dim), dtype=np.float32))
+        index.extend(vectors, [f"response {start + i}" for i in range(size)])
+
+
+def run(sizes: list[int], dim: int = 256, lookups: int = 50) -> None:
+    """Lookup latency (embedding plus cosine search) of the semantic cache by entry count."""
+    rng = np.random.default_rng(0)
+    print(f"Semantic cache lookup latency, dim={dim}, {lookups} lookups per size")
+    print(f"{'entries':>10}{'memory (MB)':>14}{'p50 (ms)':>12}{'p95 (ms)':>12}")
+    for entries in sizes:
+        cache = SemanticInnerVoiceCache(
+            threshold=0.9, max_entries=entries, embedder=HashingEmbedder(dim)
+        )
+        _fill(cache, entries, rng)
+        timings = []
+        for i in range(lookups):
+            start = time.perf_counter()
+            cache.lookup("frank", "basic_self", "benchmark", QUERIES[i % len(QUERIES)])
+            timings.append((time.perf_counter() - start) * 1000)
+        memory = entries * dim * 4 / 1_000_000
+        p50, p95 = np.percentile(timings, [50, 95])
+        print(f"{entries:>10}{memory:>14.0f}{p50:>12.2f}{p95:>12.2f}")
+        del cache
@@ -0,0 +1,111 @@
+import asyncio
+import time
+from typing import Any
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from agents.character_prompts import FAN_OUT_CONSULTATION, SEQUENTIAL_CONSULTATION
+from agents.conversation_summary import SUMMARY_PROMPT
+from agents.user_memory import FACTS_PROMPT
+
+INNER_VOICES = ("basic_self", "emotional_self", "social_self")
+
+
+class SimulatedCharacterModel(BaseChatModel):
+    """Stand-in for a character LLM with a fixed per-call latency.
+
+    It answers inner-voice prompts with a short monologue and drives the character
+    prompt through the same tool-calling pattern a real model would follow: one inner
+    voice per turn for the sequential prompt, all three at once for the fan-out prompt,
+    and a single structured-output call for the inner council. Summary requests get a
+    fixed short summary.
+    The sync path blocks the calling thread, the async path yields to the event loop.
+    """
+
+    latency: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "simulated-character"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "SimulatedCharacterModel":
+        return self
+
+    def _respond(self, messages: list[BaseMessage]) -> AIMessage:
+        self.calls += 1
+        system = messages[0].content if isinstance(messages[0], SystemMessage) else ""
+        if "Innere Rat" in system:
+            # Structured output for the council mode, as a call of the schema's tool
+            monologue = "Als inneres Selbst denke ich kurz darüber nach."
+            return AIMessage(
+                content="",
+                tool_calls=[
+                    {
+                        "name": "InnerCouncil",
+                        "args": {voice: monologue for voice in INNER_VOICES},
+                        "id": f"call_{self.calls}_council",
+                    }
+                ],
+            )
+        if SUMMARY_PROMPT in system:
+            return AIMessage(content="Der Nutzer hat von seinem Alltag erzählt. " * 10)
+        if FACTS_PROMPT in system:
+            said = messages[-1].content.split("User: ")[-1].split("\n")[0]
+            return AIMessage(
+                content="",
+                tool_calls=[
+                    {
+                        "name": "UserFacts",
+                        "args": {"facts": [{"key": "zuletzt_erzaehlt", "value": said}]},
+                        "id": f"call_{self.calls}_facts",
+                    }
+                ],
+            )
+        if "Aspekt von" in system:
+            return AIMessage(content="Als inneres Selbst denke ich kurz darüber nach.")
+
+        turn_start = max(
+            (i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=0
+        )
+        situation = messages[turn_start].content
+        consulted = [m.name for m in messages[turn_start:] if isinstance(m, ToolMessage)]
+        if FAN_OUT_CONSULTATION in system:
+            pending = [] if consulted else list(INNER_VOICES)
+        elif SEQUENTIAL_CONSULTATION in system:
+            pending = [voice for voice in INNER_VOICES if voice not in consulted][:1]
+        else:
+            # The council prompt already carries the inner voices
+            pending = []
+        if not pending:
+            return AIMessage(content="Na ja, das beschäftigt mich schon eine Weile.")
+        return AIMessage(
+            content="",
+            tool_calls=[
+                {"name": voice, "args": {"message": situation}, "id": f"call_{self.calls}_{voice}"}
+                for voice in pending
+            ],
+        )
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
@@ -0,0 +1,72 @@
+import time
+from unittest.mock import patch
+from uuid import uuid4
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from agents.character_agent import InnerVoiceMode, build_character_agent
+from agents.inner_voice_speculation import InnerVoiceSpeculation
+from benchmarks.simulated import SimulatedCharacterModel
+from core import metrics, settings
+
+# Topics with follow-up messages; a conversation stays on a topic for a few turns
+CONVERSATION = [
+    "Mein Chef hat mich heute vor allen Kollegen kritisiert.",
+    "Soll ich mit meinem Chef über die Kritik reden?",
+    "Die Kollegen haben die Kritik vom Chef alle mitbekommen.",
+    "Meine Schwester heiratet nächsten Monat und ich soll eine Rede halten.",
+    "Wie fange ich die Rede für die Hochzeit meiner Schwester an?",
+    "Was hältst du eigentlich von Hunden?",
+    "Ich überlege, nach Hamburg umzuziehen.",
+    "In Hamburg wären die Mieten für eine Wohnung aber teurer.",
+]
+
+
+async def run(latency: float = 0.1, mode: str = InnerVoiceMode.FAN_OUT) -> None:
+    """Reply latency and spend with and without speculative inner-voice consultation."""
+    print(f"Speculative inner voices, {len(CONVERSATION)} turns, {mode} mode, {latency}s per call")
+    print(
+        f"{'speculation':>12}{'mean reply (s)':>16}{'reply on hit (s)':>18}"
+        f"{'calls':>8}{'hits':>6}{'wasted calls':>14}"
+    )
+    for enabled in (False, True):
+        metrics.reset()
+        model = SimulatedCharacterModel(latency=latency)
+        speculation = (
+            InnerVoiceSpeculation(
+                threshold=settings.INNER_VOICE_SPECULATION_THRESHOLD,
+                ttl_seconds=3600,
+                max_threads=16,
+            )
+            if enabled
+            else None
+        )
+        graph = build_character_agent(
+            checkpointer=MemorySaver(), inner_voice_mode=InnerVoiceMode(mode)
+        )
+        config = {"configurable": {**graph.character_config["configurable"]}}
+        config["configurable"]["thread_id"] = str(uuid4())
+        replies, hit_replies = [], []
+        with (
+            patch("agents.character_agent.get_model", return_value=model),
+            patch("agents.character_agent.get_inner_voice_speculation", return_value=speculation),
+            patch.object(settings, "CONVERSATION_SUMMARY_ENABLED", False),
+        ):
+            for message in CONVERSATION:
+                hits = metrics.counter("inner_voice_speculations_total", outcome="hit")
+                start = time.perf_counter()
+                await graph.ainvoke({"messages": [HumanMessage(content=message)]}, config)
+                replies.append(time.perf_counter() - start)
+                if metrics.counter("inner_voice_speculations_total", outcome="hit") > hits:
+                    hit_replies.append(replies[-1])
+                # The user's think time, in which the service runs the after_run hook
+                await graph.after_run(graph, config)
+        hits = metrics.counter("inner_voice_speculations_total", outcome="hit")
+        wasted = metrics.counter("inner_voice_speculation_wasted_calls_total")
+        label = "on" if enabled else "off"
+        on_hit = f"{sum(hit_replies) / len(hit_replies):.2f}" if hit_replies else "-"
+        print(
+            f"{label:>12}{sum(replies) / len(replies):>16.2f}{on_hit:>18}"
+            f"{model.calls:>8}{int(hits):>6}{int(wasted):>14}"
+        )
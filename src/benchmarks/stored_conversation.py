@@ -0,0 +1,205 @@
+import asyncio
+import hashlib
+import json
+import re
+import socket
+from collections.abc import Callable
+from dataclasses import dataclass
+from uuid import uuid4
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from core import metrics
+from core.responses_api import ChatOpenAIResponses
+
+SYSTEM_PROMPT = "Du bist Frank, ein nachdenklicher Mensch mit vielen Erinnerungen. " * 40
+MESSAGE = "Heute war ein langer Tag, ich war erst im Büro und danach noch beim Sport. " * 8
+REPLY = "Das klingt nach einem vollen Tag. Erzähl mir mehr davon, was war im Büro los?"
+
+
+@dataclass
+class StandInTiming:
+    """Latency model of the stand-in server, applied before the first token.
+
+    Uploading the request and processing prompt tokens take time; tokens of a conversation
+    prefix the server has seen before count as cached, as with provider prompt caching, so
+    both modes get the same cache discount and differ in what they upload.
+    """
+
+    # 2 MB/s
+    seconds_per_upload_byte: float = 0.0000005
+    seconds_per_token: float = 0.00005
+    seconds_per_cached_token: float = 0.000005
+
+
+def _tokens(item: dict) -> int:
+    return len(json.dumps(item, ensure_ascii=False)) // 4
+
+
+def _reply(items: list[dict]) -> list[dict]:
+    return [{"type": "message", "content": [{"type": "output_text", "text": REPLY}]}]
+
+
+def _as_input(output: list[dict]) -> list[dict]:
+    """Convert output items to the input items a client sends for them in a full history."""
+    items = []
+    for item in output:
+        if item["type"] == "message":
+            text = "".join(part["text"] for part in item["content"])
+            items.append({"role": "assistant", "content": text})
+        else:
+            arguments = json.dumps(json.loads(item["arguments"]), sort_keys=True)
+            items.append({**item, "arguments": arguments})
+    return items
+
+
+def create_stand_in_app(
+    timing: StandInTiming | None = None,
+    respond: Callable[[list[dict]], list[dict]] = _reply,
+) -> FastAPI:
+    """A local stand-in for the Responses API that stores conversations by response id.
+
+    `respond` returns the output items for a conversation's input items. The stored
+    conversations are in `app.state.responses`; removing one simulates an expired response.
+    """
+    timing = timing or StandInTiming(0, 0, 0)
+    app = FastAPI()
+    app.state.responses = {}
+    # Hashes of every stored conversation, for the prompt cache
+    cached_prefixes: set[str] = set()
+
+    def cached_tokens(items: list[dict]) -> int:
+        hasher, tokens, cached = hashlib.sha256(), 0, 0
+        for item in items:
+            hasher.update(json.dumps(item, sort_keys=True).encode())
+            tokens += _tokens(item)
+            if hasher.hexdigest() in cached_prefixes:
+                cached = tokens
+        return cached
+
+    def cache(items: list[dict]) -> None:
+        hasher = hashlib.sha256()
+        for item in items:
+            hasher.update(json.dumps(item, sort_keys=True).encode())
+        cached_prefixes.add(hasher.hexdigest())
+
+    @app.post("/v1/responses")
+    async def responses(request: Request):
+        body_bytes = await request.body()
+        body = json.loads(body_bytes)
+        items = list(body["input"])
+        if previous := body.get("previous_response_id"):
+            if previous not in app.state.responses:
+                error = {"message": f"Previous response {previous} not found"}
+                return JSONResponse({"error": error}, status_code=404)
+            items = app.state.responses[previous] + items
+        prompt = [{"role": "system", "content": body.get("instructions", "")}, *items]
+        prompt_tokens = sum(_tokens(item) for item in prompt)
+        cached = cached_tokens(prompt)
+        delay = (
+            len(body_bytes) * timing.seconds_per_upload_byte
+            + (prompt_tokens - cached) * timing.seconds_per_token
+            + cached * timing.seconds_per_cached_token
+        )
+        output = respond(items)
+        response_id = f"resp_{uuid4().hex}"
+        if body.get("store", True):
+            app.state.responses[response_id] = items + _as_input(output)
+        # Prompt caching does not depend on storing the response
+        cache(prompt + _as_input(output))
+        response = {
+            "id": response_id,
+            "model": body["model"],
+            "output": output,
+            "usage": {
+                "input_tokens": prompt_tokens,
+                "output_tokens": sum(_tokens(item) for item in output),
+                "total_tokens": prompt_tokens + sum(_tokens(item) for item in output),
+                "input_tokens_details": {"cached_tokens": cached},
+            },
+        }
+        if not body.get("stream"):
+            await asyncio.sleep(delay)
+            return response
+
+        async def events():
+            await asyncio.sleep(delay)
+            for item in output:
+                for part in item.get("content", []):
+                    for word in re.findall(r"\S+\s*", part["text"]):
+                        event = {"type": "response.output_text.delta", "delta": word}
+                        yield f"data: {json.dumps(event)}\n\n"
+            yield f"data: {json.dumps({'type': 'response.completed', 'response': response})}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _run_thread(model: ChatOpenAIResponses, turns: int) -> dict[int, tuple[float, float]]:
+    """Run a thread, returning the request bytes and time to first token of every turn."""
+    messages: list[BaseMessage] = [SystemMessage(content=SYSTEM_PROMPT)]
+    results = {}
+    for turn in range(1, turns + 1):
+        messages.append(HumanMessage(content=f"{MESSAGE}({turn})"))
+        metrics.reset()
+        messages.append(await model.ainvoke(messages))
+        summaries = metrics.snapshot()["summaries"]
+        request_bytes = sum(v["sum"] for k, v in summaries.items() if "request_bytes" in k)
+        first_token = sum(v["sum"] for k, v in summaries.items() if "first_token" in k)
+        results[turn] = (request_bytes, first_token)
+    return results
+
+
+async def run(turns: int = 40) -> None:
+    """Request bytes and time to first token over a thread, full history vs chained."""
+    port = _free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(
+            create_stand_in_app(StandInTiming()), port=port, log_level="warning", lifespan="off"
+        )
+    )
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    try:
+        results = {}
+        for chained in (False, True):
+            model = ChatOpenAIResponses(
+                model_name="gpt-4o-mini",
+                base_url=f"http://127.0.0.1:{port}/v1",
+                streaming=True,
+                use_previous_response_id=chained,
+            )
+            results[chained] = await _run_thread(model, turns)
+    finally:
+        server.should_exit = True
+        await serving
+
+    timing = StandInTiming()
+    print(
+        f"Responses API stand-in, {turns} turns, {1 / timing.seconds_per_upload_byte / 1e6:.0f} MB/s "
+        f"upload, {timing.seconds_per_token * 1e6:.0f}/{timing.seconds_per_cached_token * 1e6:.0f}"
+        " µs per uncached/cached prompt token"
+    )
+    print(
+        f"{'turn':>6}{'bytes full':>12}{'bytes chained':>15}{'TTFT full':>12}{'TTFT chained':>14}"
+    )
+    for turn in sorted({t for t in (1, 5, 10, 20, 40, 80, turns) if t <= turns}):
+        (full_bytes, full_ttft), (chained_bytes, chained_ttft) = (
+            results[False][turn],
+            results[True][turn],
+        )
+        print(
+            f"{turn:>6}{full_bytes:>12.0f}{chained_bytes:>15.0f}"
+            f"{full_ttft * 1000:>10.1f}ms{chained_ttft * 1000:>12.1f}ms"
+        )
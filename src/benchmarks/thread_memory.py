@@ -0,0 +1,61 @@
+import os
+import pickle
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from agents.thread_memory import ThreadMemory, aindex_turns, arecall_turns
+from memory import set_thread_memory_store
+from memory.sqlite import SqliteThreadMemoryStore
+
+TOPICS = ["Arbeit", "Familie", "Urlaub", "Sport", "Essen", "Musik", "Wetter", "Geld"]
+
+
+def _turn(index: int) -> list[BaseMessage]:
+    topic = TOPICS[index % len(TOPICS)]
+    return [
+        HumanMessage(content=f"Erzähl mir etwas über {topic}, Runde {index}.", id=f"h{index}"),
+        AIMessage(content=f"Zum Thema {topic} fällt mir Folgendes ein ({index}).", id=f"a{index}"),
+    ]
+
+
+async def _milliseconds(fn: Callable[[], Awaitable[object]], repeat: int = 20) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+async def run(sizes: list[int]) -> None:
+    """Cost of indexing one more turn and of recalling, by number of indexed turns.
+
+    The embeddings are in a SQLite thread memory store in a temporary directory; the graph
+    state only holds the ThreadMemory, whose size is reported too.
+    """
+    print("Thread memory cost per turn by thread length (local hashing embedder, SQLite store)")
+    print(f"{'turns':>8}{'state (bytes)':>15}{'insert (ms)':>13}{'recall (ms)':>13}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "thread_memory.db")
+        async with SqliteThreadMemoryStore.from_conn_string(path) as store:
+            await store.setup()
+            set_thread_memory_store(store)
+            try:
+                for size in sizes:
+                    await _run_size(size)
+            finally:
+                set_thread_memory_store(None)
+
+
+async def _run_size(size: int) -> None:
+    thread_id = f"thread-{size}"
+    messages = [message for index in range(size + 1) for message in _turn(index)]
+    # Everything but the current turn is indexed
+    memory = ThreadMemory(indexed_through=await aindex_turns(messages, None, thread_id))
+    next_turn = [*messages, *_turn(size + 1)]
+    insert = await _milliseconds(lambda: aindex_turns(next_turn, memory, thread_id))
+    query = await _milliseconds(lambda: arecall_turns(messages, thread_id, recent_turns=4, top_k=3))
+    memory["recalled"] = await arecall_turns(messages, thread_id, recent_turns=4, top_k=3)
+    state = len(pickle.dumps(memory))
+    print(f"{size:>8}{state:>15}{insert:>13.2f}{query:>13.2f}")
@@ -6,6 +6,7 @@ from typing import Any
 import httpx
 
 from schema import (
+    BatchInvokeResult,
     ChatHistory,
     ChatHistoryInput,
     ChatMessage,
@@ -89,6 +90,7 @@ class AgentClient:
         model: str | None = None,
         thread_id: str | None = None,
         agent_config: dict[str, Any] | None = None,
+        user_id: str | None = None,
     ) -> ChatMessage:
         """
         Invoke the agent asynchronously. Only the final message is returned.
@@ -98,6 +100,7 @@ class AgentClient:
             model (str, optional): LLM model to use for the agent
             thread_id (str, optional): Thread ID for continuing a conversation
             agent_config (dict[str, Any], optional): Additional configuration to pass through to the agent
+            user_id (str, optional): User ID for long-term memory across threads
 
         Returns:
             AnyMessage: The response from the agent
@@ -111,6 +114,8 @@ class AgentClient:
             request.model = model
         if agent_config:
             request.agent_config = agent_config
+        if user_id:
+            request.user_id = user_id
         async with httpx.AsyncClient() as client:
             try:
                 response = await client.post(
@@ -131,6 +136,7 @@ class AgentClient:
         model: str | None = None,
         thread_id: str | None = None,
         agent_config: dict[str, Any] | None = None,
+        user_id: str | None = None,
     ) -> ChatMessage:
         """
         Invoke the agent synchronously. Only the final message is returned.
@@ -140,6 +146,7 @@ class AgentClient:
             model (str, optional): LLM model to use for the agent
             thread_id (str, optional): Thread ID for continuing a conversation
             agent_config (dict[str, Any], optional): Additional configuration to pass through to the agent
+            user_id (str, optional): User ID for long-term memory across threads
 
         Returns:
             ChatMessage: The response from the agent
@@ -153,6 +160,8 @@ class AgentClient:
             request.model = model
         if agent_config:
             request.agent_config = agent_config
+        if user_id:
+            request.user_id = user_id
         try:
             response = httpx.post(
                 f"{self.base_url}/{self.agent}/invoke",
@@ -197,6 +206,7 @@ class AgentClient:
         thread_id: str | None = None,
         agent_config: dict[str, Any] | None = None,
         stream_tokens: bool = True,
+        user_id: str | None = None,
     ) -> Generator[ChatMessage | str, None, None]:
         """
         Stream the agent's response synchronously.
@@ -212,6 +222,7 @@ class AgentClient:
             agent_config (dict[str, Any], optional): Additional configuration to pass through to the agent
             stream_tokens (bool, optional): Stream tokens as they are generated
                 Default: True
+            user_id (str, optional): User ID for long-term memory across threads
 
         Returns:
             Generator[ChatMessage | str, None, None]: The response from the agent
@@ -225,6 +236,8 @@ class AgentClient:
             request.model = model
         if agent_config:
             request.agent_config = agent_config
+        if user_id:
+            request.user_id = user_id
         try:
             with httpx.stream(
                 "POST",
@@ -250,6 +263,7 @@ class AgentClient:
         thread_id: str | None = None,
         agent_config: dict[str, Any] | None = None,
         stream_tokens: bool = True,
+        user_id: str | None = None,
     ) -> AsyncGenerator[ChatMessage | str, None]:
         """
         Stream the agent's response asynchronously.
@@ -265,6 +279,7 @@ class AgentClient:
             agent_config (dict[str, Any], optional): Additional configuration to pass through to the agent
             stream_tokens (bool, optional): Stream tokens as they are generated
                 Default: True
+            user_id (str, optional): User ID for long-term memory across threads
 
         Returns:
             AsyncGenerator[ChatMessage | str, None]: The response from the agent
@@ -278,6 +293,8 @@ class AgentClient:
             request.model = model
         if agent_config:
             request.agent_config = agent_config
+        if user_id:
+            request.user_id = user_id
         async with httpx.AsyncClient() as client:
             try:
                 async with client.stream(
@@ -297,6 +314,43 @@ class AgentClient:
             except httpx.HTTPError as e:
                 raise AgentClientError(f"Error: {e}")
 
+    async def ainvoke_batch(
+        self, inputs: list[UserInput], max_concurrency: int | None = None
+    ) -> AsyncGenerator[BatchInvokeResult, None]:
+        """
+        Invoke the agent on many independent inputs, yielding each result as it finishes.
+
+        Results arrive in completion order; `index` is the position of their input. A failed
+        input is yielded with its `status_code` and `error` instead of raising.
+
+        Args:
+            inputs (list[UserInput]): The inputs to run
+            max_concurrency (int, optional): Maximum number of inputs to run at the same time,
+                capped by the service
+
+        Returns:
+            AsyncGenerator[BatchInvokeResult, None]: The result of every input
+        """
+        if not self.agent:
+            raise AgentClientError("No agent selected. Use update_agent() to select an agent.")
+        params = {"max_concurrency": max_concurrency} if max_concurrency else {}
+        async with httpx.AsyncClient() as client:
+            try:
+                async with client.stream(
+                    "POST",
+                    f"{self.base_url}/{self.agent}/invoke/batch",
+                    json=[user_input.model_dump() for user_input in inputs],
+                    params=params,
+                    headers=self._headers,
+                    timeout=self.timeout,
+                ) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if line.strip():
+                            yield BatchInvokeResult.model_validate_json(line)
+            except httpx.HTTPError as e:
+                raise AgentClientError(f"Error: {e}")
+
     async def acreate_feedback(
         self, run_id: str, key: str, score: float, kwargs: dict[str, Any] = {}
     ) -> None:
@@ -324,18 +378,25 @@ class AgentClient:
     def get_history(
         self,
         thread_id: str,
+        limit: int | None = None,
+        before: str | None = None,
+        after: str | None = None,
     ) -> ChatHistory:
         """
         Get chat history.
 
         Args:
             thread_id (str, optional): Thread ID for identifying a conversation
+            limit (int, optional): Maximum number of messages to return
+            before (str, optional): Return only messages before the message with this id
+            after (str, optional): Return only messages after the message with this id
         """
-        request = ChatHistoryInput(thread_id=thread_id)
+        request = ChatHistoryInput(thread_id=thread_id, limit=limit, before=before, after=after)
+        path = f"/{self.agent}/history" if self.agent else "/history"
         try:
             response = httpx.post(
-                f"{self.base_url}/history",
-                json=request.model_dump(),
+                f"{self.base_url}{path}",
+                json=request.model_dump(exclude_none=True),
                 headers=self._headers,
                 timeout=self.timeout,
             )
@@ -1,4 +1,5 @@
-from core.llm import get_model
+from core.llm import build_system_message, get_model, get_prompt_cache_usage
+from core.metrics import metrics
 from core.settings import settings
 
-__all__ = ["settings", "get_model"]
+__all__ = ["settings", "get_model", "build_system_message", "get_prompt_cache_usage", "metrics"]
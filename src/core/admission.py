@@ -0,0 +1,185 @@
+import asyncio
+import math
+import time
+from collections.abc import AsyncIterator, Callable
+from contextvars import ContextVar
+from functools import cache
+from typing import Any, TypeVar
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from core.metrics import metrics
+from core.settings import settings
+from schema.models import get_provider
+
+ModelT = TypeVar("ModelT", bound=BaseChatModel)
+
+
+class ProviderBusyError(Exception):
+    """An LLM call was not admitted because its provider's wait queue is full or the wait timed out."""
+
+    def __init__(self, key: str, retry_after: int) -> None:
+        super().__init__(f"Too many concurrent requests for {key}, retry in {retry_after}s")
+        self.key = key
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """Limits the in-flight calls to one provider or model, with a bounded FIFO wait queue."""
+
+    def __init__(self, key: str, limit: int, max_queue: int, timeout_seconds: float) -> None:
+        self.key = key
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout_seconds = timeout_seconds
+        self._semaphore = asyncio.Semaphore(limit)
+        self._waiting = 0
+        self._in_flight = 0
+        # Moving average of how long a call holds its slot, for Retry-After
+        self._hold_seconds = 1.0
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free for a request that arrives now."""
+        return max(1, math.ceil(self._hold_seconds * (self._waiting + 1) / self.limit))
+
+    def _set_gauges(self) -> None:
+        metrics.set_gauge("admission_queue_depth", self._waiting, key=self.key)
+        metrics.set_gauge("admission_in_flight", self._in_flight, key=self.key)
+
+    def _reject(self, reason: str) -> ProviderBusyError:
+        metrics.increment("admission_rejected_total", key=self.key, reason=reason)
+        return ProviderBusyError(self.key, self.retry_after())
+
+    async def acquire(self) -> Callable[[], None]:
+        """Wait for a slot and return the function that releases it (safe to call twice)."""
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            raise self._reject("queue_full")
+        self._waiting += 1
+        self._set_gauges()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout_seconds)
+        except TimeoutError:
+            raise self._reject("timeout") from None
+        finally:
+            self._waiting -= 1
+            metrics.observe("admission_wait_seconds", time.perf_counter() - start, key=self.key)
+        self._in_flight += 1
+        self._set_gauges()
+        acquired = time.perf_counter()
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if released:
+                return
+            released = True
+            self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * (time.perf_counter() - acquired)
+            self._in_flight -= 1
+            self._semaphore.release()
+            self._set_gauges()
+
+        return release
+
+
+class AdmissionController:
+    """Admission control for LLM calls, keyed by the provider and model that is called.
+
+    `limits` maps "provider:model" or "provider" (see `schema.models.Provider`) to the
+    number of calls in flight at once; a model's own limit takes precedence over its
+    provider's. Models without a limit are admitted right away.
+    """
+
+    def __init__(self, limits: dict[str, int], max_queue: int, timeout_seconds: float) -> None:
+        self.limits = limits
+        self.max_queue = max_queue
+        self.timeout_seconds = timeout_seconds
+        self._limiters: dict[str, ConcurrencyLimiter] = {}
+
+    def limiter(self, model: str) -> ConcurrencyLimiter | None:
+        provider = get_provider(model)
+        if provider is None:
+            return None
+        for key in (f"{provider}:{model}", str(provider)):
+            if key in self.limits:
+                if key not in self._limiters:
+                    self._limiters[key] = ConcurrencyLimiter(
+                        key, self.limits[key], self.max_queue, self.timeout_seconds
+                    )
+                return self._limiters[key]
+        return None
+
+    async def acquire(self, model: str) -> Callable[[], None]:
+        """Wait for a slot for a call to model; raises ProviderBusyError when busy."""
+        limiter = self.limiter(model)
+        if limiter is None:
+            return lambda: None
+        return await limiter.acquire()
+
+
+@cache
+def get_admission_controller() -> AdmissionController:
+    return AdmissionController(
+        limits=settings.PROVIDER_CONCURRENCY_LIMITS,
+        max_queue=settings.PROVIDER_QUEUE_SIZE,
+        timeout_seconds=settings.PROVIDER_QUEUE_TIMEOUT_SECONDS,
+    )
+
+
+# Set while a call holds its slot, so that the streaming call a model's _agenerate makes
+# internally does not wait for a second slot
+_holding_slot: ContextVar[bool] = ContextVar("holding_admission_slot", default=False)
+
+
+class _AdmittedGenerate:
+    """Mixin for chat models whose calls hold an admission slot, see `admit_calls`."""
+
+    _admission_key: str
+
+    async def _agenerate(self, *args: Any, **kwargs: Any) -> ChatResult:
+        if _holding_slot.get():
+            return await super()._agenerate(*args, **kwargs)
+        release = await get_admission_controller().acquire(self._admission_key)
+        token = _holding_slot.set(True)
+        try:
+            return await super()._agenerate(*args, **kwargs)
+        finally:
+            _holding_slot.reset(token)
+            release()
+
+
+class _AdmittedStream(_AdmittedGenerate):
+    async def _astream(self, *args: Any, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        if _holding_slot.get():
+            async for chunk in super()._astream(*args, **kwargs):
+                yield chunk
+            return
+        release = await get_admission_controller().acquire(self._admission_key)
+        try:
+            async for chunk in super()._astream(*args, **kwargs):
+                yield chunk
+        finally:
+            release()
+
+
+@cache
+def _admitted_class(cls: type[BaseChatModel]) -> type[BaseChatModel]:
+    # Models that do not stream keep LangChain's fallback from astream to ainvoke
+    streams = cls._astream is not BaseChatModel._astream or cls._stream is not BaseChatModel._stream
+    mixin = _AdmittedStream if streams else _AdmittedGenerate
+    return type(cls.__name__, (mixin, cls), {"__module__": cls.__module__})
+
+
+def admit_calls(model: ModelT, key: str) -> ModelT:
+    """Make each async call of a chat model hold an admission slot for `key` while it runs.
+
+    The slot is taken before the provider is called and given back in a `finally`, so a call
+    that fails or is cancelled, e.g. when the client disconnects, frees it too. Every call
+    counts against the limit of the model it is made to: the agent's response, inner voices,
+    classifiers and the work after a run alike. ProviderBusyError is raised from the call
+    when it is not admitted. The model keeps its type, as a subclass.
+    """
+    object.__setattr__(model, "__class__", _admitted_class(type(model)))
+    object.__setattr__(model, "_admission_key", key)
+    return model
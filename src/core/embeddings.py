@@ -0,0 +1,141 @@
+import hashlib
+import re
+import time
+from collections.abc import Sequence
+from functools import cache, lru_cache
+from typing import Any, Protocol
+
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+
+
+class Embedder(Protocol):
+    """Turns texts into L2-normalized float32 vectors of a fixed dimension."""
+
+    dim: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Return an array of shape (len(texts), dim)."""
+        ...
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+@lru_cache(maxsize=65536)
+def _hashed_feature(feature: str, dim: int) -> tuple[int, float]:
+    value = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+    return value % dim, 1.0 if value >> 63 else -1.0
+
+
+class HashingEmbedder:
+    """Deterministic local embedder based on feature hashing.
+
+    Words and character trigrams are hashed into signed buckets, so it needs no model or
+    network access and gives the same vectors in every process. It captures lexical
+    overlap, not meaning; plug in a model-based embedder where paraphrase recall matters.
+    """
+
+    def __init__(self, dim: int = 256) -> None:
+        self.dim = dim
+
+    def _features(self, text: str) -> list[str]:
+        words = _WORD.findall(text.casefold())
+        trigrams = [
+            f"#{padded[i : i + 3]}"
+            for w in words
+            for padded in [f"<{w}>"]
+            for i in range(len(padded) - 2)
+        ]
+        return words + trigrams
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                bucket, sign = _hashed_feature(feature, self.dim)
+                vectors[row, bucket] += sign
+        return normalize_rows(vectors)
+
+
+class VectorIndex:
+    """Bounded set of unit vectors with payloads, searched by cosine similarity.
+
+    Vectors live in one contiguous float32 matrix, so a search is a single matrix-vector
+    product. When full, the least recently used entry is evicted.
+    """
+
+    def __init__(self, dim: int, max_entries: int) -> None:
+        self.dim = dim
+        self.max_entries = max_entries
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._last_used = np.empty(0, dtype=np.float64)
+        self.payloads: list[Any] = []
+
+    def __len__(self) -> int:
+        return len(self.payloads)
+
+    def search(self, query: np.ndarray, k: int = 1) -> list[tuple[int, float]]:
+        """Return up to k (index, similarity) pairs, most similar first."""
+        size = len(self)
+        if not size:
+            return []
+        scores = self._vectors[:size] @ query
+        if k == 1:
+            top = np.argmax(scores)[np.newaxis]
+        else:
+            k = min(k, size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def touch(self, index: int) -> None:
+        self._last_used[index] = time.monotonic()
+
+    def add(self, vector: np.ndarray, payload: Any) -> int:
+        """Store a vector and return the number of entries evicted to make room."""
+        return self.extend(vector[np.newaxis, :], [payload])
+
+    def extend(self, vectors: np.ndarray, payloads: Sequence[Any]) -> int:
+        evicted = 0
+        for start in range(0, len(payloads), self.max_entries):
+            chunk = vectors[start : start + self.max_entries]
+            overflow = len(self) + len(chunk) - self.max_entries
+            if overflow > 0:
+                self._evict(overflow)
+                evicted += overflow
+            self._reserve(len(self) + len(chunk))
+            size = len(self)
+            self._vectors[size : size + len(chunk)] = chunk
+            self._last_used[size : size + len(chunk)] = time.monotonic()
+            self.payloads.extend(payloads[start : start + self.max_entries])
+        return evicted
+
+    def _reserve(self, size: int) -> None:
+        capacity = len(self._vectors)
+        if size <= capacity:
+            return
+        capacity = min(max(size, 2 * capacity, 16), self.max_entries)
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[: len(self)] = self._vectors[: len(self)]
+        last_used = np.empty(capacity, dtype=np.float64)
+        last_used[: len(self)] = self._last_used[: len(self)]
+        self._vectors, self._last_used = vectors, last_used
+
+    def _evict(self, count: int) -> None:
+        size = len(self)
+        victims = np.argpartition(self._last_used[:size], count - 1)[:count]
+        keep = np.setdiff1d(np.arange(size), victims, assume_unique=True)
+        kept = len(keep)
+        self._vectors[:kept] = self._vectors[keep]
+        self._last_used[:kept] = self._last_used[keep]
+        self.payloads = [self.payloads[i] for i in keep]
+
+
+@cache
+def get_embedder() -> Embedder:
+    """Return the default embedder, a local HashingEmbedder."""
+    return HashingEmbedder()
@@ -4,11 +4,16 @@ from typing import TypeAlias
 from langchain_anthropic import ChatAnthropic
 from langchain_aws import ChatBedrock
 from langchain_community.chat_models import FakeListChatModel
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, SystemMessage
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_groq import ChatGroq
 from langchain_ollama import ChatOllama
 from langchain_openai import AzureChatOpenAI, ChatOpenAI
+from pydantic import TypeAdapter
 
+from core.admission import admit_calls
+from core.responses_api import OPENAI_BASE_URL, ChatOpenAIResponses
 from core.settings import settings
 from schema.models import (
     AllModelEnum,
@@ -46,8 +51,16 @@ _MODEL_TABLE = {
     FakeModelName.FAKE: "fake",
 }
 
+_MODEL_NAME_ADAPTER: TypeAdapter[AllModelEnum] = TypeAdapter(AllModelEnum)
+
 ModelT: TypeAlias = (
-    ChatOpenAI | ChatAnthropic | ChatGoogleGenerativeAI | ChatGroq | ChatBedrock | ChatOllama
+    ChatOpenAI
+    | ChatOpenAIResponses
+    | ChatAnthropic
+    | ChatGoogleGenerativeAI
+    | ChatGroq
+    | ChatBedrock
+    | ChatOllama
 )
 
 
@@ -55,20 +68,45 @@ class FakeToolModel(FakeListChatModel):
     def __init__(self, responses: list[str]):
         super().__init__(responses=responses)
 
-    def bind_tools(self, tools):
+    def bind_tools(self, tools, **kwargs):
         return self
 
 
 @cache
-def get_model(model_name: AllModelEnum, /) -> ModelT:
+def get_model(model_name: AllModelEnum, /, max_tokens: int | None = None) -> ModelT:
+    """Return the chat model for a model name, optionally capped at max_tokens output tokens.
+
+    Each call of the model waits for admission under the provider's concurrency limit,
+    see `core.admission`.
+    """
+    return admit_calls(_create_model(model_name, max_tokens), model_name)
+
+
+def _create_model(model_name: AllModelEnum, max_tokens: int | None) -> ModelT:
     # NOTE: models with streaming=True will send tokens as they are generated
     # if the /stream endpoint is called with stream_tokens=True (the default)
     api_model_name = _MODEL_TABLE.get(model_name)
     if not api_model_name:
         raise ValueError(f"Unsupported model: {model_name}")
+    # Accept plain strings too, e.g. model names from a request's agent_config
+    model_name = _MODEL_NAME_ADAPTER.validate_python(model_name)
+    # Output cap under the parameter name most providers use; Google and Ollama differ
+    limit = {"max_tokens": max_tokens} if max_tokens else {}
 
     if model_name in OpenAIModelName:
-        return ChatOpenAI(model=api_model_name, temperature=0.5, streaming=True)
+        if settings.OPENAI_RESPONSES_API:
+            return ChatOpenAIResponses(
+                model_name=api_model_name,
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL or OPENAI_BASE_URL,
+                temperature=0.5,
+                streaming=True,
+                max_output_tokens=max_tokens,
+            )
+        # stream_usage reports token counts, including cached prompt tokens, when streaming
+        return ChatOpenAI(
+            model=api_model_name, temperature=0.5, streaming=True, stream_usage=True, **limit
+        )
     if model_name in AzureOpenAIModelName:
         if not settings.AZURE_OPENAI_API_KEY or not settings.AZURE_OPENAI_ENDPOINT:
             raise ValueError("Azure OpenAI API key and endpoint must be configured")
@@ -81,6 +119,7 @@ def get_model(model_name: AllModelEnum, /) -> ModelT:
             streaming=True,
             timeout=60,
             max_retries=3,
+            **limit,
         )
     if model_name in DeepseekModelName:
         return ChatOpenAI(
@@ -89,24 +128,80 @@ def get_model(model_name: AllModelEnum, /) -> ModelT:
             streaming=True,
             openai_api_base="https://api.deepseek.com",
             openai_api_key=settings.DEEPSEEK_API_KEY,
+            **limit,
         )
     if model_name in AnthropicModelName:
-        return ChatAnthropic(model=api_model_name, temperature=0.5, streaming=True)
+        return ChatAnthropic(model=api_model_name, temperature=0.5, streaming=True, **limit)
     if model_name in GoogleModelName:
-        return ChatGoogleGenerativeAI(model=api_model_name, temperature=0.5, streaming=True)
+        return ChatGoogleGenerativeAI(
+            model=api_model_name, temperature=0.5, streaming=True, max_output_tokens=max_tokens
+        )
     if model_name in GroqModelName:
         if model_name == GroqModelName.LLAMA_GUARD_3_8B:
-            return ChatGroq(model=api_model_name, temperature=0.0)
-        return ChatGroq(model=api_model_name, temperature=0.5)
+            return ChatGroq(model=api_model_name, temperature=0.0, **limit)
+        return ChatGroq(model=api_model_name, temperature=0.5, **limit)
     if model_name in AWSModelName:
-        return ChatBedrock(model_id=api_model_name, temperature=0.5)
+        return ChatBedrock(model_id=api_model_name, temperature=0.5, **limit)
     if model_name in OllamaModelName:
         if settings.OLLAMA_BASE_URL:
             chat_ollama = ChatOllama(
-                model=settings.OLLAMA_MODEL, temperature=0.5, base_url=settings.OLLAMA_BASE_URL
+                model=settings.OLLAMA_MODEL,
+                temperature=0.5,
+                base_url=settings.OLLAMA_BASE_URL,
+                num_predict=max_tokens,
             )
         else:
-            chat_ollama = ChatOllama(model=settings.OLLAMA_MODEL, temperature=0.5)
+            chat_ollama = ChatOllama(
+                model=settings.OLLAMA_MODEL, temperature=0.5, num_predict=max_tokens
+            )
         return chat_ollama
     if model_name in FakeModelName:
         return FakeToolModel(responses=["This is a test response from the fake model."])
+
+
+def build_system_message(
+    content: str, model: BaseChatModel, cacheable_prefix: str = ""
+) -> SystemMessage:
+    """Build a system message whose stable prefix can be cached by the provider.
+
+    Anthropic only caches prompt content marked with `cache_control`, so the prefix is sent
+    as its own text block ending in a cache breakpoint. OpenAI-compatible providers cache
+    identical prompt prefixes automatically; for them the content is sent unchanged and only
+    needs to start with the stable part.
+    """
+    if not cacheable_prefix or not content.startswith(cacheable_prefix):
+        return SystemMessage(content=content)
+    if isinstance(model, ChatAnthropic):
+        blocks = [
+            {"type": "text", "text": cacheable_prefix, "cache_control": {"type": "ephemeral"}}
+        ]
+        if rest := content[len(cacheable_prefix) :]:
+            blocks.append({"type": "text", "text": rest})
+        return SystemMessage(content=blocks)
+    return SystemMessage(content=content)
+
+
+def get_prompt_cache_usage(message: AIMessage) -> dict[str, int]:
+    """Return the input and cache-read token counts reported for a model response.
+
+    Uses the normalized `usage_metadata` when available and falls back to the raw provider
+    usage in `response_metadata` (OpenAI `prompt_tokens_details.cached_tokens`, Anthropic
+    `cache_read_input_tokens`).
+    """
+    usage = message.usage_metadata or {}
+    input_tokens = usage.get("input_tokens", 0)
+    cached_tokens = (usage.get("input_token_details") or {}).get("cache_read") or 0
+    if not usage:
+        metadata = message.response_metadata or {}
+        if token_usage := metadata.get("token_usage"):
+            input_tokens = token_usage.get("prompt_tokens", 0)
+            details = token_usage.get("prompt_tokens_details") or {}
+            cached_tokens = details.get("cached_tokens") or 0
+        elif anthropic_usage := metadata.get("usage"):
+            cached_tokens = anthropic_usage.get("cache_read_input_tokens") or 0
+            input_tokens = (
+                anthropic_usage.get("input_tokens", 0)
+                + cached_tokens
+                + (anthropic_usage.get("cache_creation_input_tokens") or 0)
+            )
+    return {"input_tokens": input_tokens, "cached_tokens": cached_tokens}
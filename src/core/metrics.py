@@ -0,0 +1,65 @@
+from collections import defaultdict
+from dataclasses import dataclass
+
+
+@dataclass
+class Summary:
+    """Running count, sum and maximum of an observed value."""
+
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def as_dict(self) -> dict[str, float]:
+        mean = self.total / self.count if self.count else 0.0
+        return {"count": self.count, "sum": self.total, "mean": mean, "max": self.max}
+
+
+def _metric_key(name: str, labels: dict[str, str]) -> str:
+    if not labels:
+        return name
+    label_str = ",".join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    return f"{name}{{{label_str}}}"
+
+
+class MetricsRegistry:
+    """In-process counters, gauges and summaries, served by the `/metrics` endpoint.
+
+    Metric names follow the Prometheus convention, with labels rendered into the key,
+    e.g. `inner_voice_cache_hits_total{tier="memory"}`.
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self._counters: dict[str, float] = defaultdict(float)
+        self._gauges: dict[str, float] = {}
+        self._summaries: dict[str, Summary] = defaultdict(Summary)
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        self._counters[_metric_key(name, labels)] += value
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        self._gauges[_metric_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        self._summaries[_metric_key(name, labels)].observe(value)
+
+    def counter(self, name: str, **labels: str) -> float:
+        return self._counters.get(_metric_key(name, labels), 0)
+
+    def snapshot(self) -> dict[str, dict]:
+        return {
+            "counters": dict(self._counters),
+            "gauges": dict(self._gauges),
+            "summaries": {key: summary.as_dict() for key, summary in self._summaries.items()},
+        }
+
+
+metrics = MetricsRegistry()
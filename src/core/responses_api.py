@@ -0,0 +1,391 @@
+import asyncio
+import hashlib
+import json
+import time
+import weakref
+from collections.abc import AsyncIterator, Iterator, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import LanguageModelInput
+from langchain_core.language_models.chat_models import BaseChatModel, agenerate_from_stream
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr, SecretStr
+
+from core.metrics import metrics
+
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+
+
+def _broken_chain(response: httpx.Response) -> bool:
+    """Whether a chained request failed because its previous_response_id is unusable.
+
+    E.g. the stored response expired or was deleted; the request is then repeated with the
+    full history. Other client errors, such as an invalid tool schema, are not retried.
+    """
+    if response.status_code == 404:
+        return True
+    if response.status_code != 400:
+        return False
+    try:
+        error = response.json().get("error") or {}
+    except ValueError:
+        return False
+    return error.get("param") == "previous_response_id" or "previous_response_id" in str(
+        error.get("message", "")
+    )
+
+
+def _check_stop(stop: list[str] | None) -> None:
+    if stop:
+        raise ValueError("The Responses API does not support stop sequences")
+
+
+def _text(content: str | list) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block if isinstance(block, str) else block.get("text", "")
+        for block in content
+        if isinstance(block, str) or block.get("type") == "text"
+    )
+
+
+def message_items(message: BaseMessage) -> list[dict[str, Any]]:
+    """Convert a message to Responses API input items."""
+    if isinstance(message, AIMessage):
+        items: list[dict[str, Any]] = []
+        if text := _text(message.content):
+            items.append({"role": "assistant", "content": text})
+        for call in message.tool_calls:
+            items.append(
+                {
+                    "type": "function_call",
+                    "call_id": call["id"],
+                    "name": call["name"],
+                    "arguments": json.dumps(call["args"], sort_keys=True),
+                }
+            )
+        return items
+    if isinstance(message, ToolMessage):
+        return [
+            {
+                "type": "function_call_output",
+                "call_id": message.tool_call_id,
+                "output": _text(message.content),
+            }
+        ]
+    role = "system" if isinstance(message, SystemMessage) else "user"
+    return [{"role": role, "content": _text(message.content)}]
+
+
+def _update_hash(hasher: "hashlib._Hash", message: BaseMessage) -> None:
+    for item in message_items(message):
+        hasher.update(json.dumps(item, sort_keys=True).encode())
+
+
+@dataclass
+class _Request:
+    """A prepared call: the full conversation and, if usable, where the stored chain ends."""
+
+    instructions: str | None
+    conversation: list[BaseMessage]
+    # The last response of the conversation still stored by the provider, and the index of
+    # the first message after it
+    previous_response_id: str | None
+    start: int
+    # Hash of the whole conversation, extended with the response to fingerprint the chain
+    hasher: "hashlib._Hash"
+
+    def attempts(self) -> Iterator[tuple[str, list[BaseMessage]]]:
+        """Yield the mode and the messages to send, first chained and then in full."""
+        if self.previous_response_id is not None:
+            yield "chained", self.conversation[self.start :]
+        yield "full", self.conversation
+
+
+def prepare_request(messages: Sequence[BaseMessage], chain: bool) -> _Request:
+    """Split off the instructions and find the latest response whose chain is intact.
+
+    Leading system messages become the `instructions`, which the provider does not keep
+    across responses, so they are sent with every call and may change between turns. Each
+    response records a hash of the conversation it completes in its `response_metadata`,
+    which is checkpointed with the thread; a response continues the chain only while the
+    messages up to it are unchanged, e.g. not compacted or edited by the agent.
+    """
+    messages = list(messages)
+    leading = 0
+    while leading < len(messages) and isinstance(messages[leading], SystemMessage):
+        leading += 1
+    instructions = "\n\n".join(_text(message.content) for message in messages[:leading])
+    conversation = messages[leading:]
+    hasher = hashlib.sha256()
+    previous_response_id, start = None, 0
+    for i, message in enumerate(conversation):
+        _update_hash(hasher, message)
+        if not chain or not isinstance(message, AIMessage):
+            continue
+        metadata = message.response_metadata
+        if metadata.get("response_id") and metadata.get("conversation_hash") == hasher.hexdigest():
+            previous_response_id, start = metadata["response_id"], i + 1
+    if start == len(conversation):
+        # Nothing new to send after the response
+        previous_response_id, start = None, 0
+    return _Request(instructions or None, conversation, previous_response_id, start, hasher)
+
+
+def _tool_choice(tool_choice: Any) -> Any:
+    if tool_choice in ("any", "required", True):
+        return "required"
+    if tool_choice in ("auto", "none"):
+        return tool_choice
+    if isinstance(tool_choice, str):
+        return {"type": "function", "name": tool_choice}
+    if isinstance(tool_choice, dict) and "function" in tool_choice:
+        return {"type": "function", "name": tool_choice["function"]["name"]}
+    return tool_choice
+
+
+def _parse_response(data: dict[str, Any], hasher: "hashlib._Hash") -> AIMessage:
+    """Build the AIMessage of a Responses API response, fingerprinting the chain it ends."""
+    text, tool_calls = "", []
+    for item in data.get("output", []):
+        if item.get("type") == "message":
+            text += "".join(
+                part.get("text", "")
+                for part in item.get("content", [])
+                if part.get("type") == "output_text"
+            )
+        elif item.get("type") == "function_call":
+            tool_calls.append(
+                {
+                    "id": item["call_id"],
+                    "name": item["name"],
+                    "args": json.loads(item.get("arguments") or "{}"),
+                }
+            )
+    usage = data.get("usage") or {}
+    message = AIMessage(content=text, tool_calls=tool_calls)
+    if usage:
+        cached = (usage.get("input_tokens_details") or {}).get("cached_tokens") or 0
+        message.usage_metadata = {
+            "input_tokens": usage.get("input_tokens", 0),
+            "output_tokens": usage.get("output_tokens", 0),
+            "total_tokens": usage.get("total_tokens", 0),
+            "input_token_details": {"cache_read": cached},
+        }
+    chain = hasher.copy()
+    _update_hash(chain, message)
+    message.response_metadata = {
+        "response_id": data["id"],
+        "conversation_hash": chain.hexdigest(),
+        "model_name": data.get("model", ""),
+    }
+    return message
+
+
+class ChatOpenAIResponses(BaseChatModel):
+    """OpenAI chat model on the Responses API with stored conversation state.
+
+    Responses are stored by the provider. When the conversation continues from a response
+    that is still intact, only the messages after it are sent, with `previous_response_id`;
+    otherwise, or when the provider no longer has the response, the full history is sent.
+    """
+
+    model_name: str
+    api_key: SecretStr | None = None
+    base_url: str = OPENAI_BASE_URL
+    temperature: float | None = None
+    max_output_tokens: int | None = None
+    streaming: bool = False
+    timeout: float = 60.0
+    # Send only the new messages after a stored response; False always sends the full history
+    use_previous_response_id: bool = True
+    http_async_client: httpx.AsyncClient | None = None
+
+    _async_clients: weakref.WeakKeyDictionary = PrivateAttr(
+        default_factory=weakref.WeakKeyDictionary
+    )
+
+    @property
+    def _llm_type(self) -> str:
+        return "openai-responses"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {"model_name": self.model_name, "temperature": self.temperature}
+
+    def bind_tools(
+        self, tools: Sequence[Any], *, tool_choice: Any = None, **kwargs: Any
+    ) -> Runnable[LanguageModelInput, BaseMessage]:
+        # Passed by with_structured_output for tracing, not part of the request
+        kwargs.pop("structured_output_format", None)
+        functions = [convert_to_openai_tool(tool)["function"] for tool in tools]
+        kwargs["tools"] = [{"type": "function", **function} for function in functions]
+        if tool_choice is not None:
+            kwargs["tool_choice"] = _tool_choice(tool_choice)
+        return self.bind(**kwargs)
+
+    def _headers(self) -> dict[str, str]:
+        if self.api_key is None:
+            return {}
+        return {"Authorization": f"Bearer {self.api_key.get_secret_value()}"}
+
+    def _payload(
+        self, request: _Request, mode: str, messages: list[BaseMessage], stream: bool, **kwargs
+    ) -> dict[str, Any]:
+        payload: dict[str, Any] = {
+            "model": self.model_name,
+            "input": [item for message in messages for item in message_items(message)],
+            "store": self.use_previous_response_id,
+            "stream": stream,
+        }
+        if request.instructions:
+            payload["instructions"] = request.instructions
+        if mode == "chained":
+            payload["previous_response_id"] = request.previous_response_id
+        if self.temperature is not None:
+            payload["temperature"] = self.temperature
+        if self.max_output_tokens:
+            payload["max_output_tokens"] = self.max_output_tokens
+        for key in ("tools", "tool_choice"):
+            if key in kwargs:
+                payload[key] = kwargs[key]
+        return payload
+
+    def _async_client(self) -> httpx.AsyncClient:
+        if self.http_async_client is not None:
+            return self.http_async_client
+        # Connections belong to the event loop they were opened on
+        loop = asyncio.get_running_loop()
+        if (client := self._async_clients.get(loop)) is None:
+            client = httpx.AsyncClient(timeout=self.timeout)
+            self._async_clients[loop] = client
+        return client
+
+    async def _asend(
+        self, request: _Request, stream: bool, **kwargs: Any
+    ) -> tuple[httpx.Response, str, float]:
+        """Send the request chained if possible, falling back to the full history."""
+        client = self._async_client()
+        for mode, messages in request.attempts():
+            http_request = client.build_request(
+                "POST",
+                f"{self.base_url}/responses",
+                json=self._payload(request, mode, messages, stream, **kwargs),
+                headers=self._headers(),
+            )
+            start = time.perf_counter()
+            response = await client.send(http_request, stream=stream)
+            if response.is_error:
+                await response.aread()
+                await response.aclose()
+                if mode == "chained" and _broken_chain(response):
+                    metrics.increment("responses_api_chain_breaks_total")
+                    continue
+                response.raise_for_status()
+            metrics.increment("responses_api_requests_total", mode=mode)
+            metrics.observe("responses_api_request_bytes", len(http_request.content), mode=mode)
+            return response, mode, start
+        raise AssertionError("unreachable")
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        _check_stop(stop)
+        if self.streaming:
+            return await agenerate_from_stream(self._astream(messages, stop, run_manager, **kwargs))
+        request = prepare_request(messages, self.use_previous_response_id)
+        response, _, _ = await self._asend(request, stream=False, **kwargs)
+        message = _parse_response(response.json(), request.hasher)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        _check_stop(stop)
+        request = prepare_request(messages, self.use_previous_response_id)
+        response, mode, start = await self._asend(request, stream=True, **kwargs)
+        first_token = True
+        try:
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                event = json.loads(line[len("data:") :])
+                if event["type"] == "response.output_text.delta":
+                    if first_token:
+                        first_token = False
+                        metrics.observe(
+                            "responses_api_first_token_seconds",
+                            time.perf_counter() - start,
+                            mode=mode,
+                        )
+                    chunk = ChatGenerationChunk(message=AIMessageChunk(content=event["delta"]))
+                    if run_manager:
+                        await run_manager.on_llm_new_token(event["delta"], chunk=chunk)
+                    yield chunk
+                elif event["type"] == "response.completed":
+                    message = _parse_response(event["response"], request.hasher)
+                    # The text was streamed already; the last chunk carries the rest
+                    chunk = AIMessageChunk(
+                        content="",
+                        tool_call_chunks=[
+                            {
+                                "id": call["id"],
+                                "name": call["name"],
+                                "args": json.dumps(call["args"]),
+                                "index": index,
+                            }
+                            for index, call in enumerate(message.tool_calls)
+                        ],
+                        usage_metadata=message.usage_metadata,
+                        response_metadata=message.response_metadata,
+                    )
+                    yield ChatGenerationChunk(message=chunk)
+                elif event["type"] in ("response.failed", "error"):
+                    raise ValueError(f"Responses API error: {event}")
+        finally:
+            await response.aclose()
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        _check_stop(stop)
+        request = prepare_request(messages, self.use_previous_response_id)
+        with httpx.Client(timeout=self.timeout) as client:
+            for mode, to_send in request.attempts():
+                payload = self._payload(request, mode, to_send, stream=False, **kwargs)
+                response = client.post(
+                    f"{self.base_url}/responses", json=payload, headers=self._headers()
+                )
+                if mode == "chained" and _broken_chain(response):
+                    metrics.increment("responses_api_chain_breaks_total")
+                    continue
+                response.raise_for_status()
+                metrics.increment("responses_api_requests_total", mode=mode)
+                message = _parse_response(response.json(), request.hasher)
+                return ChatResult(generations=[ChatGeneration(message=message)])
+        raise AssertionError("unreachable")
@@ -1,6 +1,6 @@
 from enum import StrEnum
 from json import loads
-from typing import Annotated, Any
+from typing import Annotated, Any, Literal
 
 from dotenv import find_dotenv
 from pydantic import (
@@ -16,6 +16,7 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 from schema.models import (
     AllModelEnum,
     AnthropicModelName,
+    AutoModelName,
     AWSModelName,
     AzureOpenAIModelName,
     DeepseekModelName,
@@ -63,6 +64,11 @@ class Settings(BaseSettings):
     OLLAMA_BASE_URL: str | None = None
     USE_FAKE_MODEL: bool = False
 
+    # OpenAI models on the Responses API with provider-stored conversation state: a call that
+    # continues a stored response sends only the new messages, with previous_response_id
+    OPENAI_RESPONSES_API: bool = False
+    OPENAI_BASE_URL: str | None = None
+
     # If DEFAULT_MODEL is None, it will be set in model_post_init
     DEFAULT_MODEL: AllModelEnum | None = None  # type: ignore[assignment]
     AVAILABLE_MODELS: set[AllModelEnum] = set()  # type: ignore[assignment]
@@ -96,6 +102,175 @@ class Settings(BaseSettings):
     )
     POSTGRES_MAX_IDLE: int = Field(default=5, description="Maximum number of idle connections")
 
+    # Prompt token budget for the agents' conversation history. Older messages beyond it
+    # are left out of the model input (they stay in the thread).
+    CONTEXT_TOKEN_BUDGET: int = Field(
+        default=16_000, description="Default prompt token budget, including the system prompt"
+    )
+    CONTEXT_TOKEN_BUDGETS: dict[str, int] = Field(
+        default_factory=dict, description="Map of model names to prompt token budgets"
+    )
+
+    # Rolling summary of long character conversations, updated after a response has been
+    # delivered. The model sees the summary plus the most recent turns. Off by default, as it
+    # adds a summarization call to the turns that fold older ones in.
+    CONVERSATION_SUMMARY_ENABLED: bool = False
+    CONVERSATION_SUMMARY_KEEP_TURNS: int = Field(
+        default=6, description="Number of recent turns that are always sent unsummarized"
+    )
+    CONVERSATION_SUMMARY_BATCH_TURNS: int = Field(
+        default=4, description="Number of older turns that are folded into the summary at once"
+    )
+    CONVERSATION_SUMMARY_MODEL: AllModelEnum | None = None  # type: ignore[assignment]
+
+    # Per-thread embedding index of past turns (character and research agents). When enabled,
+    # the model sees the most relevant older turns plus the recent ones.
+    THREAD_MEMORY_ENABLED: bool = False
+    THREAD_MEMORY_TOP_K: int = Field(default=3, description="Number of older turns to recall")
+    THREAD_MEMORY_RECENT_TURNS: int = Field(
+        default=4, description="Number of recent turns that are always sent"
+    )
+
+    # Inputs of a /invoke/batch request that run at the same time
+    BATCH_INVOKE_MAX_CONCURRENCY: int = 8
+
+    # Admission control: LLM calls in flight per "provider" or "provider:model", e.g.
+    # {"openai": 32, "openai:gpt-4o": 8}. Further calls wait in a bounded queue; when it is
+    # full or the wait times out, the service answers 429 with Retry-After.
+    PROVIDER_CONCURRENCY_LIMITS: dict[str, int] = Field(
+        default_factory=dict, description="Map of providers or provider:model to call limits"
+    )
+    PROVIDER_QUEUE_SIZE: int = Field(
+        default=100, description="Maximum number of calls waiting per provider or model"
+    )
+    PROVIDER_QUEUE_TIMEOUT_SECONDS: float = Field(
+        default=30, description="Maximum time a call waits for admission"
+    )
+
+    # One run at a time per thread_id. A request for a thread that is already running waits
+    # for it, is rejected with 409, or attaches to the running run's output; requests can
+    # pick the policy with thread_run_policy in agent_config. With "database" the runs are
+    # also serialized across service processes, with leases in the checkpoint database.
+    # The agent's work after a run, e.g. its summary, does not keep the thread busy.
+    THREAD_RUN_POLICY: Literal["wait", "reject", "attach"] = "wait"
+    THREAD_RUN_WAIT_TIMEOUT_SECONDS: float = Field(
+        default=120, description="Maximum time a request waits for its thread, then 409"
+    )
+    THREAD_RUN_LOCK: Literal["process", "database"] = "process"
+    THREAD_RUN_LEASE_SECONDS: float = Field(
+        default=30, description="Expiry of a database lease that is no longer renewed"
+    )
+
+    # Threads with a pending interrupt are remembered in memory, so requests on known threads
+    # skip loading the state. Another process may interrupt a thread this one knows, so the
+    # index is off by default: enable it only when a single service process runs. It stays
+    # off with THREAD_RUN_LOCK=database.
+    INTERRUPT_INDEX_SIZE: int = Field(
+        default=0, description="Maximum number of threads in the pending interrupt index"
+    )
+
+    # Latency budgets: requests with deadline_ms (agent_config or X-Deadline-Ms header) skip
+    # work when less than these many milliseconds are left
+    DEADLINE_INNER_VOICES_MS: int = Field(
+        default=3000, description="Minimum budget left for consulting the inner voices"
+    )
+    DEADLINE_TOOL_LOOP_MS: int = Field(
+        default=2000, description="Minimum budget left for another tool round"
+    )
+    DEADLINE_FAST_MODEL: AllModelEnum | None = Field(  # type: ignore[assignment]
+        default=None, description="Faster model to switch to when the budget runs short"
+    )
+    DEADLINE_FAST_MODEL_MS: int = Field(
+        default=1500, description="Budget left below which DEADLINE_FAST_MODEL is used"
+    )
+
+    # Requests with model "auto" get the model of their message's complexity tier
+    # (simple, moderate or complex); tiers without a route use DEFAULT_MODEL. "auto" is only
+    # offered when at least one route is configured.
+    MODEL_ROUTES: dict[str, AllModelEnum] = Field(  # type: ignore[assignment]
+        default_factory=dict, description="Map of complexity tiers to models"
+    )
+    MODEL_ROUTER_MODEL: AllModelEnum | None = Field(  # type: ignore[assignment]
+        default=None,
+        description="Small model that classifies messages the heuristic is unsure about; "
+        "without it they are routed as moderate",
+    )
+
+    # Long-term memory about a user across threads (character agent), stored in the
+    # checkpoint database and namespaced by user_id and character. Requests need a user_id.
+    LONG_TERM_MEMORY_ENABLED: bool = False
+    LONG_TERM_MEMORY_MAX_ITEMS: int = Field(
+        default=200, description="Maximum number of facts per user and character"
+    )
+    LONG_TERM_MEMORY_TOP_K: int = Field(
+        default=5, description="Number of facts injected into the prompt per turn"
+    )
+    LONG_TERM_MEMORY_MODEL: AllModelEnum | None = Field(  # type: ignore[assignment]
+        default=None, description="Model that extracts facts, defaults to the request's model"
+    )
+
+    # Model for the character agent's inner voices. Their short monologues can run on a
+    # faster, cheaper model than the final answer. Defaults to the request's model.
+    INNER_VOICE_MODEL: AllModelEnum | None = None  # type: ignore[assignment]
+    INNER_VOICE_MAX_TOKENS: int | None = Field(
+        default=None, description="Maximum number of output tokens per inner-voice response"
+    )
+
+    # What happens to the character agent's inner-voice tool calls from earlier turns:
+    # kept (off), removed (drop) or shortened (collapse). Originals stay in the checkpoints.
+    INNER_VOICE_COMPACTION: Literal["off", "drop", "collapse"] = "off"
+
+    # Inner-voice response cache for the character agent (opt-in)
+    INNER_VOICE_CACHE_ENABLED: bool = False
+    INNER_VOICE_CACHE_MAX_ENTRIES: int = Field(
+        default=1024, description="Maximum number of cached responses per tier"
+    )
+    INNER_VOICE_CACHE_TTL_SECONDS: float = Field(
+        default=3600, description="How long a cached inner-voice response stays valid"
+    )
+    INNER_VOICE_CACHE_SQLITE_PATH: str | None = Field(
+        default=None, description="Optional SQLite file shared by all worker processes"
+    )
+    INNER_VOICE_SEMANTIC_CACHE_ENABLED: bool = False
+    INNER_VOICE_SEMANTIC_CACHE_THRESHOLD: float = Field(
+        default=0.9, description="Minimum cosine similarity for reusing a cached response"
+    )
+    INNER_VOICE_SEMANTIC_CACHE_MAX_ENTRIES: int = Field(
+        default=10_000, description="Maximum number of entries per character and inner voice"
+    )
+    # Reuse an inner voice's last result in later turns on the same topic, for at most
+    # INNER_VOICE_REUSE_MAX_TURNS turns in a row (0 disables reuse)
+    INNER_VOICE_REUSE_MAX_TURNS: int = Field(
+        default=0, description="How many later turns may reuse an inner-voice result"
+    )
+    INNER_VOICE_REUSE_THRESHOLD: float = Field(
+        default=0.3,
+        description="Minimum cosine similarity between the consulted and the new message "
+        "(calibrated for the local hashing embedder)",
+    )
+
+    # Keep the inner voices of the last turn for the user's next message (opt-in), and reuse
+    # the responses if the next message is similar enough
+    INNER_VOICE_SPECULATION_ENABLED: bool = False
+    INNER_VOICE_SPECULATION_THRESHOLD: float = Field(
+        default=0.3,
+        description="Minimum cosine similarity between the topic and the next message "
+        "(calibrated for the local hashing embedder)",
+    )
+    INNER_VOICE_SPECULATION_TTL_SECONDS: float = Field(
+        default=600, description="How long speculative responses stay usable"
+    )
+    INNER_VOICE_SPECULATION_MAX_THREADS: int = Field(
+        default=1024, description="Maximum number of threads with pending speculative responses"
+    )
+    CHARACTER_TURN_CLASSIFIER: Literal["heuristic", "model", "off"] = Field(
+        default="heuristic",
+        description="How the character agent detects small talk that skips the inner voices",
+    )
+    CHARACTER_TURN_CLASSIFIER_MODEL: AllModelEnum | None = Field(  # type: ignore[assignment]
+        default=None, description="Model for the model classifier, defaults to DEFAULT_MODEL"
+    )
+
     # Azure OpenAI Settings
     AZURE_OPENAI_API_KEY: SecretStr | None = None
     AZURE_OPENAI_ENDPOINT: str | None = None
@@ -183,6 +358,9 @@ class Settings(BaseSettings):
                 case _:
                     raise ValueError(f"Unknown provider: {provider}")
 
+        if self.MODEL_ROUTES:
+            self.AVAILABLE_MODELS.add(AutoModelName.AUTO)
+
     @computed_field
     @property
     def BASE_URL(self) -> str:
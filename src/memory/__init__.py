@@ -1,8 +1,32 @@
+from contextlib import AbstractAsyncContextManager
+
 from langgraph.checkpoint.base import BaseCheckpointSaver
 
 from core.settings import DatabaseType, settings
-from memory.postgres import get_postgres_saver
-from memory.sqlite import get_sqlite_saver
+from memory.long_term import (
+    LongTermStore,
+    MemoryItem,
+    get_long_term_store,
+    set_long_term_store,
+)
+from memory.postgres import (
+    get_postgres_saver,
+    get_postgres_store,
+    get_postgres_thread_leases,
+    get_postgres_thread_memory_store,
+)
+from memory.sqlite import (
+    get_sqlite_saver,
+    get_sqlite_store,
+    get_sqlite_thread_leases,
+    get_sqlite_thread_memory_store,
+)
+from memory.thread_leases import ThreadLeases
+from memory.thread_memory import (
+    ThreadMemoryStore,
+    get_thread_memory_store,
+    set_thread_memory_store,
+)
 
 
 def initialize_database() -> BaseCheckpointSaver:
@@ -16,4 +40,50 @@ def initialize_database() -> BaseCheckpointSaver:
         return get_sqlite_saver()
 
 
-__all__ = ["initialize_database"]
+def initialize_store() -> AbstractAsyncContextManager[LongTermStore]:
+    """
+    Initialize the long-term memory store in the same database as the checkpoints.
+    Returns an async context manager for a LongTermStore instance.
+    """
+    if settings.DATABASE_TYPE == DatabaseType.POSTGRES:
+        return get_postgres_store()
+    else:  # Default to SQLite
+        return get_sqlite_store()
+
+
+def initialize_thread_leases() -> AbstractAsyncContextManager[ThreadLeases]:
+    """
+    Initialize the cross-process thread leases in the same database as the checkpoints.
+    Returns an async context manager for a ThreadLeases instance.
+    """
+    if settings.DATABASE_TYPE == DatabaseType.POSTGRES:
+        return get_postgres_thread_leases()
+    else:  # Default to SQLite
+        return get_sqlite_thread_leases()
+
+
+def initialize_thread_memory_store() -> AbstractAsyncContextManager[ThreadMemoryStore]:
+    """
+    Initialize the thread memory store in the same database as the checkpoints.
+    Returns an async context manager for a ThreadMemoryStore instance.
+    """
+    if settings.DATABASE_TYPE == DatabaseType.POSTGRES:
+        return get_postgres_thread_memory_store()
+    else:  # Default to SQLite
+        return get_sqlite_thread_memory_store()
+
+
+__all__ = [
+    "LongTermStore",
+    "MemoryItem",
+    "ThreadLeases",
+    "ThreadMemoryStore",
+    "get_long_term_store",
+    "get_thread_memory_store",
+    "initialize_database",
+    "initialize_store",
+    "initialize_thread_leases",
+    "initialize_thread_memory_store",
+    "set_long_term_store",
+    "set_thread_memory_store",
+]
@@ -0,0 +1,93 @@
+import time
+from abc import ABC, abstractmethod
+from typing import TypedDict
+
+import numpy as np
+
+from core import metrics
+from core.embeddings import get_embedder
+
+# (user_id, character)
+Namespace = tuple[str, str]
+
+
+class MemoryItem(TypedDict):
+    key: str
+    value: str
+
+
+class LongTermStore(ABC):
+    """Key/value memory about a user that outlives a thread, namespaced by user and character.
+
+    Every value is stored with its embedding, so a namespace can be searched by similarity
+    as well as read by key. A namespace holds at most max_items entries; writing beyond that
+    evicts the least recently used ones. Backends keep (namespace, key) as the primary key
+    and index (namespace, last_used) for the eviction.
+    """
+
+    def __init__(self, max_items: int) -> None:
+        self.max_items = max_items
+
+    @abstractmethod
+    async def setup(self) -> None:
+        """Create the table and indexes if they do not exist."""
+
+    @abstractmethod
+    async def aget(self, namespace: Namespace, key: str) -> str | None:
+        """Return the value stored under key, or None."""
+
+    @abstractmethod
+    async def alist(self, namespace: Namespace) -> list[MemoryItem]:
+        """Return all entries of a namespace, most recently used first."""
+
+    @abstractmethod
+    async def adelete(self, namespace: Namespace, key: str) -> None:
+        """Remove the entry stored under key, if any."""
+
+    @abstractmethod
+    async def _aupsert(
+        self, namespace: Namespace, key: str, value: str, embedding: bytes, now: float
+    ) -> int:
+        """Insert or replace an entry and evict beyond max_items. Returns the number evicted."""
+
+    @abstractmethod
+    async def _aembeddings(self, namespace: Namespace) -> list[tuple[str, str, bytes]]:
+        """Return (key, value, embedding) for all entries of a namespace."""
+
+    @abstractmethod
+    async def _atouch(self, namespace: Namespace, keys: list[str], now: float) -> None:
+        """Mark entries as used."""
+
+    async def aput(self, namespace: Namespace, key: str, value: str) -> None:
+        embedding = get_embedder().embed([f"{key}: {value}"])[0].tobytes()
+        evicted = await self._aupsert(namespace, key, value, embedding, time.time())
+        if evicted:
+            metrics.increment("long_term_memory_evictions_total", evicted)
+
+    async def asearch(self, namespace: Namespace, query: str, limit: int) -> list[MemoryItem]:
+        """Return up to limit entries most similar to query, best first."""
+        start = time.perf_counter()
+        rows = await self._aembeddings(namespace)
+        if not rows or limit <= 0:
+            return []
+        embedder = get_embedder()
+        vectors = np.frombuffer(b"".join(row[2] for row in rows), dtype=np.float32)
+        scores = vectors.reshape(len(rows), embedder.dim) @ embedder.embed([query])[0]
+        best = np.argsort(-scores)[:limit]
+        found = [MemoryItem(key=rows[i][0], value=rows[i][1]) for i in best]
+        await self._atouch(namespace, [item["key"] for item in found], time.time())
+        metrics.observe("long_term_memory_search_seconds", time.perf_counter() - start)
+        return found
+
+
+_store: LongTermStore | None = None
+
+
+def set_long_term_store(store: LongTermStore | None) -> None:
+    """Register the store opened by the service, or None when it is closed."""
+    global _store
+    _store = store
+
+
+def get_long_term_store() -> LongTermStore | None:
+    return _store
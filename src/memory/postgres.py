@@ -1,9 +1,16 @@
 import logging
+import time
+from collections.abc import AsyncIterator
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
 
 from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from psycopg_pool import AsyncConnectionPool
 
 from core.settings import settings
+from memory.long_term import LongTermStore, MemoryItem, Namespace
+from memory.thread_leases import ThreadLeases
+from memory.thread_memory import ThreadMemoryStore
 
 logger = logging.getLogger(__name__)
 
@@ -43,3 +50,250 @@ def get_postgres_saver() -> BaseCheckpointSaver:
     """Initialize and return a PostgreSQL saver instance."""
     validate_postgres_config()
     return AsyncPostgresSaver.from_conn_string(get_postgres_connection_string())
+
+
+class PostgresLongTermStore(LongTermStore):
+    """Long-term memory in a PostgreSQL table next to the checkpoints."""
+
+    def __init__(self, pool: AsyncConnectionPool, max_items: int) -> None:
+        super().__init__(max_items)
+        self.pool = pool
+
+    @classmethod
+    @asynccontextmanager
+    async def from_conn_string(
+        cls, conn_string: str, max_items: int
+    ) -> AsyncIterator["PostgresLongTermStore"]:
+        async with AsyncConnectionPool(
+            conn_string,
+            min_size=settings.POSTGRES_MIN_SIZE,
+            max_size=settings.POSTGRES_POOL_SIZE,
+            max_idle=settings.POSTGRES_MAX_IDLE,
+            kwargs={"autocommit": True},
+            open=False,
+        ) as pool:
+            yield cls(pool, max_items)
+
+    async def setup(self) -> None:
+        async with self.pool.connection() as conn:
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS long_term_memory (
+                    user_id TEXT NOT NULL,
+                    character TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    embedding BYTEA NOT NULL,
+                    last_used DOUBLE PRECISION NOT NULL,
+                    PRIMARY KEY (user_id, character, key)
+                )
+                """
+            )
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS long_term_memory_last_used "
+                "ON long_term_memory (user_id, character, last_used)"
+            )
+
+    async def aget(self, namespace: Namespace, key: str) -> str | None:
+        async with self.pool.connection() as conn:
+            cursor = await conn.execute(
+                "SELECT value FROM long_term_memory "
+                "WHERE user_id = %s AND character = %s AND key = %s",
+                (*namespace, key),
+            )
+            row = await cursor.fetchone()
+        return row[0] if row else None
+
+    async def alist(self, namespace: Namespace) -> list[MemoryItem]:
+        async with self.pool.connection() as conn:
+            cursor = await conn.execute(
+                "SELECT key, value FROM long_term_memory WHERE user_id = %s AND character = %s "
+                "ORDER BY last_used DESC",
+                namespace,
+            )
+            return [MemoryItem(key=key, value=value) for key, value in await cursor.fetchall()]
+
+    async def adelete(self, namespace: Namespace, key: str) -> None:
+        async with self.pool.connection() as conn:
+            await conn.execute(
+                "DELETE FROM long_term_memory WHERE user_id = %s AND character = %s AND key = %s",
+                (*namespace, key),
+            )
+
+    async def _aupsert(
+        self, namespace: Namespace, key: str, value: str, embedding: bytes, now: float
+    ) -> int:
+        async with self.pool.connection() as conn, conn.transaction():
+            await conn.execute(
+                "INSERT INTO long_term_memory "
+                "(user_id, character, key, value, embedding, last_used) "
+                "VALUES (%s, %s, %s, %s, %s, %s) "
+                "ON CONFLICT (user_id, character, key) DO UPDATE SET "
+                "value = EXCLUDED.value, embedding = EXCLUDED.embedding, "
+                "last_used = EXCLUDED.last_used",
+                (*namespace, key, value, embedding, now),
+            )
+            cursor = await conn.execute(
+                "DELETE FROM long_term_memory WHERE user_id = %s AND character = %s AND key IN ("
+                "SELECT key FROM long_term_memory WHERE user_id = %s AND character = %s "
+                "ORDER BY last_used DESC OFFSET %s)",
+                (*namespace, *namespace, self.max_items),
+            )
+            return cursor.rowcount
+
+    async def _aembeddings(self, namespace: Namespace) -> list[tuple[str, str, bytes]]:
+        async with self.pool.connection() as conn:
+            cursor = await conn.execute(
+                "SELECT key, value, embedding FROM long_term_memory "
+                "WHERE user_id = %s AND character = %s",
+                namespace,
+            )
+            return [
+                (key, value, bytes(embedding)) for key, value, embedding in await cursor.fetchall()
+            ]
+
+    async def _atouch(self, namespace: Namespace, keys: list[str], now: float) -> None:
+        async with self.pool.connection() as conn:
+            await conn.execute(
+                "UPDATE long_term_memory SET last_used = %s "
+                "WHERE user_id = %s AND character = %s AND key = ANY(%s)",
+                (now, *namespace, keys),
+            )
+
+
+def get_postgres_store() -> AbstractAsyncContextManager[PostgresLongTermStore]:
+    """Initialize and return a PostgreSQL long-term memory store."""
+    validate_postgres_config()
+    return PostgresLongTermStore.from_conn_string(
+        get_postgres_connection_string(), settings.LONG_TERM_MEMORY_MAX_ITEMS
+    )
+
+
+class PostgresThreadLeases(ThreadLeases):
+    """Thread leases in a PostgreSQL table next to the checkpoints."""
+
+    def __init__(self, pool: AsyncConnectionPool, ttl_seconds: float) -> None:
+        super().__init__(ttl_seconds)
+        self.pool = pool
+
+    @classmethod
+    @asynccontextmanager
+    async def from_conn_string(
+        cls, conn_string: str, ttl_seconds: float
+    ) -> AsyncIterator["PostgresThreadLeases"]:
+        async with AsyncConnectionPool(
+            conn_string,
+            min_size=settings.POSTGRES_MIN_SIZE,
+            max_size=settings.POSTGRES_POOL_SIZE,
+            max_idle=settings.POSTGRES_MAX_IDLE,
+            kwargs={"autocommit": True},
+            open=False,
+        ) as pool:
+            yield cls(pool, ttl_seconds)
+
+    async def setup(self) -> None:
+        async with self.pool.connection() as conn:
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS thread_leases (
+                    thread_id TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at DOUBLE PRECISION NOT NULL
+                )
+                """
+            )
+
+    async def _aclaim(self, thread_id: str, owner: str, now: float, expires_at: float) -> bool:
+        async with self.pool.connection() as conn:
+            cursor = await conn.execute(
+                "INSERT INTO thread_leases (thread_id, owner, expires_at) VALUES (%s, %s, %s) "
+                "ON CONFLICT (thread_id) DO UPDATE SET "
+                "owner = EXCLUDED.owner, expires_at = EXCLUDED.expires_at "
+                "WHERE thread_leases.expires_at < %s",
+                (thread_id, owner, expires_at, now),
+            )
+            return cursor.rowcount == 1
+
+    async def arenew(self, thread_id: str, owner: str) -> None:
+        async with self.pool.connection() as conn:
+            await conn.execute(
+                "UPDATE thread_leases SET expires_at = %s WHERE thread_id = %s AND owner = %s",
+                (time.time() + self.ttl_seconds, thread_id, owner),
+            )
+
+    async def arelease(self, thread_id: str, owner: str) -> None:
+        async with self.pool.connection() as conn:
+            await conn.execute(
+                "DELETE FROM thread_leases WHERE thread_id = %s AND owner = %s",
+                (thread_id, owner),
+            )
+
+    async def aheld(self, thread_id: str) -> bool:
+        async with self.pool.connection() as conn:
+            cursor = await conn.execute(
+                "SELECT 1 FROM thread_leases WHERE thread_id = %s AND expires_at >= %s",
+                (thread_id, time.time()),
+            )
+            return await cursor.fetchone() is not None
+
+
+def get_postgres_thread_leases() -> AbstractAsyncContextManager[PostgresThreadLeases]:
+    """Initialize and return PostgreSQL thread leases."""
+    validate_postgres_config()
+    return PostgresThreadLeases.from_conn_string(
+        get_postgres_connection_string(), settings.THREAD_RUN_LEASE_SECONDS
+    )
+
+
+class PostgresThreadMemoryStore(ThreadMemoryStore):
+    """Thread memory in a PostgreSQL table next to the checkpoints."""
+
+    def __init__(self, pool: AsyncConnectionPool) -> None:
+        self.pool = pool
+
+    @classmethod
+    @asynccontextmanager
+    async def from_conn_string(cls, conn_string: str) -> AsyncIterator["PostgresThreadMemoryStore"]:
+        async with AsyncConnectionPool(
+            conn_string,
+            min_size=settings.POSTGRES_MIN_SIZE,
+            max_size=settings.POSTGRES_POOL_SIZE,
+            max_idle=settings.POSTGRES_MAX_IDLE,
+            kwargs={"autocommit": True},
+            open=False,
+        ) as pool:
+            yield cls(pool)
+
+    async def setup(self) -> None:
+        async with self.pool.connection() as conn:
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS thread_memory (
+                    thread_id TEXT NOT NULL,
+                    turn_id TEXT NOT NULL,
+                    embedding BYTEA NOT NULL,
+                    PRIMARY KEY (thread_id, turn_id)
+                )
+                """
+            )
+
+    async def aadd(self, thread_id: str, rows: list[tuple[str, bytes]]) -> None:
+        async with self.pool.connection() as conn, conn.cursor() as cursor:
+            await cursor.executemany(
+                "INSERT INTO thread_memory (thread_id, turn_id, embedding) VALUES (%s, %s, %s) "
+                "ON CONFLICT (thread_id, turn_id) DO NOTHING",
+                [(thread_id, turn_id, embedding) for turn_id, embedding in rows],
+            )
+
+    async def aembeddings(self, thread_id: str) -> dict[str, bytes]:
+        async with self.pool.connection() as conn:
+            cursor = await conn.execute(
+                "SELECT turn_id, embedding FROM thread_memory WHERE thread_id = %s", (thread_id,)
+            )
+            return {turn_id: bytes(embedding) for turn_id, embedding in await cursor.fetchall()}
+
+
+def get_postgres_thread_memory_store() -> AbstractAsyncContextManager[PostgresThreadMemoryStore]:
+    """Initialize and return a PostgreSQL thread memory store."""
+    validate_postgres_config()
+    return PostgresThreadMemoryStore.from_conn_string(get_postgres_connection_string())
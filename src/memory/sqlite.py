@@ -1,9 +1,224 @@
+import time
+from collections.abc import AsyncIterator
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+
+import aiosqlite
 from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 
 from core.settings import settings
+from memory.long_term import LongTermStore, MemoryItem, Namespace
+from memory.thread_leases import ThreadLeases
+from memory.thread_memory import ThreadMemoryStore
 
 
 def get_sqlite_saver() -> BaseCheckpointSaver:
     """Initialize and return a SQLite saver instance."""
     return AsyncSqliteSaver.from_conn_string(settings.SQLITE_DB_PATH)
+
+
+class SqliteLongTermStore(LongTermStore):
+    """Long-term memory in a SQLite table next to the checkpoints."""
+
+    def __init__(self, conn: aiosqlite.Connection, max_items: int) -> None:
+        super().__init__(max_items)
+        self.conn = conn
+
+    @classmethod
+    @asynccontextmanager
+    async def from_conn_string(
+        cls, path: str, max_items: int
+    ) -> AsyncIterator["SqliteLongTermStore"]:
+        async with aiosqlite.connect(path) as conn:
+            yield cls(conn, max_items)
+
+    async def setup(self) -> None:
+        await self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS long_term_memory (
+                user_id TEXT NOT NULL,
+                character TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (user_id, character, key)
+            );
+            CREATE INDEX IF NOT EXISTS long_term_memory_last_used
+                ON long_term_memory (user_id, character, last_used);
+            """
+        )
+        await self.conn.commit()
+
+    async def aget(self, namespace: Namespace, key: str) -> str | None:
+        async with self.conn.execute(
+            "SELECT value FROM long_term_memory WHERE user_id = ? AND character = ? AND key = ?",
+            (*namespace, key),
+        ) as cursor:
+            row = await cursor.fetchone()
+        return row[0] if row else None
+
+    async def alist(self, namespace: Namespace) -> list[MemoryItem]:
+        async with self.conn.execute(
+            "SELECT key, value FROM long_term_memory WHERE user_id = ? AND character = ? "
+            "ORDER BY last_used DESC",
+            namespace,
+        ) as cursor:
+            return [MemoryItem(key=key, value=value) async for key, value in cursor]
+
+    async def adelete(self, namespace: Namespace, key: str) -> None:
+        await self.conn.execute(
+            "DELETE FROM long_term_memory WHERE user_id = ? AND character = ? AND key = ?",
+            (*namespace, key),
+        )
+        await self.conn.commit()
+
+    async def _aupsert(
+        self, namespace: Namespace, key: str, value: str, embedding: bytes, now: float
+    ) -> int:
+        await self.conn.execute(
+            "INSERT OR REPLACE INTO long_term_memory "
+            "(user_id, character, key, value, embedding, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+            (*namespace, key, value, embedding, now),
+        )
+        cursor = await self.conn.execute(
+            "DELETE FROM long_term_memory WHERE user_id = ? AND character = ? AND key IN ("
+            "SELECT key FROM long_term_memory WHERE user_id = ? AND character = ? "
+            "ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (*namespace, *namespace, self.max_items),
+        )
+        await self.conn.commit()
+        return cursor.rowcount
+
+    async def _aembeddings(self, namespace: Namespace) -> list[tuple[str, str, bytes]]:
+        async with self.conn.execute(
+            "SELECT key, value, embedding FROM long_term_memory "
+            "WHERE user_id = ? AND character = ?",
+            namespace,
+        ) as cursor:
+            return list(await cursor.fetchall())
+
+    async def _atouch(self, namespace: Namespace, keys: list[str], now: float) -> None:
+        await self.conn.executemany(
+            "UPDATE long_term_memory SET last_used = ? "
+            "WHERE user_id = ? AND character = ? AND key = ?",
+            [(now, *namespace, key) for key in keys],
+        )
+        await self.conn.commit()
+
+
+def get_sqlite_store() -> AbstractAsyncContextManager[SqliteLongTermStore]:
+    """Initialize and return a SQLite long-term memory store."""
+    return SqliteLongTermStore.from_conn_string(
+        settings.SQLITE_DB_PATH, settings.LONG_TERM_MEMORY_MAX_ITEMS
+    )
+
+
+class SqliteThreadLeases(ThreadLeases):
+    """Thread leases in a SQLite table next to the checkpoints."""
+
+    def __init__(self, conn: aiosqlite.Connection, ttl_seconds: float) -> None:
+        super().__init__(ttl_seconds)
+        self.conn = conn
+
+    @classmethod
+    @asynccontextmanager
+    async def from_conn_string(
+        cls, path: str, ttl_seconds: float
+    ) -> AsyncIterator["SqliteThreadLeases"]:
+        async with aiosqlite.connect(path) as conn:
+            yield cls(conn, ttl_seconds)
+
+    async def setup(self) -> None:
+        await self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS thread_leases (
+                thread_id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        await self.conn.commit()
+
+    async def _aclaim(self, thread_id: str, owner: str, now: float, expires_at: float) -> bool:
+        cursor = await self.conn.execute(
+            "INSERT INTO thread_leases (thread_id, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (thread_id) DO UPDATE SET "
+            "owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE thread_leases.expires_at < ?",
+            (thread_id, owner, expires_at, now),
+        )
+        await self.conn.commit()
+        return cursor.rowcount == 1
+
+    async def arenew(self, thread_id: str, owner: str) -> None:
+        await self.conn.execute(
+            "UPDATE thread_leases SET expires_at = ? WHERE thread_id = ? AND owner = ?",
+            (time.time() + self.ttl_seconds, thread_id, owner),
+        )
+        await self.conn.commit()
+
+    async def arelease(self, thread_id: str, owner: str) -> None:
+        await self.conn.execute(
+            "DELETE FROM thread_leases WHERE thread_id = ? AND owner = ?", (thread_id, owner)
+        )
+        await self.conn.commit()
+
+    async def aheld(self, thread_id: str) -> bool:
+        async with self.conn.execute(
+            "SELECT 1 FROM thread_leases WHERE thread_id = ? AND expires_at >= ?",
+            (thread_id, time.time()),
+        ) as cursor:
+            return await cursor.fetchone() is not None
+
+
+def get_sqlite_thread_leases() -> AbstractAsyncContextManager[SqliteThreadLeases]:
+    """Initialize and return SQLite thread leases."""
+    return SqliteThreadLeases.from_conn_string(
+        settings.SQLITE_DB_PATH, settings.THREAD_RUN_LEASE_SECONDS
+    )
+
+
+class SqliteThreadMemoryStore(ThreadMemoryStore):
+    """Thread memory in a SQLite table next to the checkpoints."""
+
+    def __init__(self, conn: aiosqlite.Connection) -> None:
+        self.conn = conn
+
+    @classmethod
+    @asynccontextmanager
+    async def from_conn_string(cls, path: str) -> AsyncIterator["SqliteThreadMemoryStore"]:
+        async with aiosqlite.connect(path) as conn:
+            yield cls(conn)
+
+    async def setup(self) -> None:
+        await self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS thread_memory (
+                thread_id TEXT NOT NULL,
+                turn_id TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                PRIMARY KEY (thread_id, turn_id)
+            )
+            """
+        )
+        await self.conn.commit()
+
+    async def aadd(self, thread_id: str, rows: list[tuple[str, bytes]]) -> None:
+        await self.conn.executemany(
+            "INSERT OR IGNORE INTO thread_memory (thread_id, turn_id, embedding) VALUES (?, ?, ?)",
+            [(thread_id, turn_id, embedding) for turn_id, embedding in rows],
+        )
+        await self.conn.commit()
+
+    async def aembeddings(self, thread_id: str) -> dict[str, bytes]:
+        async with self.conn.execute(
+            "SELECT turn_id, embedding FROM thread_memory WHERE thread_id = ?", (thread_id,)
+        ) as cursor:
+            return dict(await cursor.fetchall())
+
+
+def get_sqlite_thread_memory_store() -> AbstractAsyncContextManager[SqliteThreadMemoryStore]:
+    """Initialize and return a SQLite thread memory store."""
+    return SqliteThreadMemoryStore.from_conn_string(settings.SQLITE_DB_PATH)
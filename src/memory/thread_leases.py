@@ -0,0 +1,39 @@
+import time
+from abc import ABC, abstractmethod
+
+
+class ThreadLeases(ABC):
+    """Leases on threads in the checkpoint database, so one process at a time runs a thread.
+
+    The process running a thread holds its lease and renews it while the run lasts. A lease
+    that is not renewed expires after ttl_seconds, which frees the threads of a crashed
+    process. Backends keep thread_id as the primary key.
+    """
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl_seconds = ttl_seconds
+
+    @abstractmethod
+    async def setup(self) -> None:
+        """Create the table if it does not exist."""
+
+    @abstractmethod
+    async def _aclaim(self, thread_id: str, owner: str, now: float, expires_at: float) -> bool:
+        """Insert the lease, or take it over if it expired before now; True if claimed."""
+
+    @abstractmethod
+    async def arenew(self, thread_id: str, owner: str) -> None:
+        """Extend a lease held by owner."""
+
+    @abstractmethod
+    async def arelease(self, thread_id: str, owner: str) -> None:
+        """Drop a lease held by owner."""
+
+    @abstractmethod
+    async def aheld(self, thread_id: str) -> bool:
+        """Whether any process holds an unexpired lease on the thread."""
+
+    async def atry_acquire(self, thread_id: str, owner: str) -> bool:
+        """Take the thread's lease unless another owner holds it."""
+        now = time.time()
+        return await self._aclaim(thread_id, owner, now, now + self.ttl_seconds)
@@ -0,0 +1,55 @@
+from abc import ABC, abstractmethod
+
+
+class ThreadMemoryStore(ABC):
+    """Embeddings of the completed turns of each thread, for recalling older turns.
+
+    Rows are appended once per turn, so indexing a turn costs the same however long the
+    thread is, and the embeddings stay out of the checkpoints. Backends keep
+    (thread_id, turn_id) as the primary key; adding a turn again is a no-op.
+    """
+
+    @abstractmethod
+    async def setup(self) -> None:
+        """Create the table if it does not exist."""
+
+    @abstractmethod
+    async def aadd(self, thread_id: str, rows: list[tuple[str, bytes]]) -> None:
+        """Store (turn_id, embedding) rows, ignoring turns that are already stored."""
+
+    @abstractmethod
+    async def aembeddings(self, thread_id: str) -> dict[str, bytes]:
+        """Return the embedding of every stored turn of a thread by turn_id."""
+
+
+class InMemoryThreadMemoryStore(ThreadMemoryStore):
+    """Thread memory of this process, for agents that run without the service's database."""
+
+    def __init__(self) -> None:
+        self._threads: dict[str, dict[str, bytes]] = {}
+
+    async def setup(self) -> None:
+        return None
+
+    async def aadd(self, thread_id: str, rows: list[tuple[str, bytes]]) -> None:
+        turns = self._threads.setdefault(thread_id, {})
+        for turn_id, embedding in rows:
+            turns.setdefault(turn_id, embedding)
+
+    async def aembeddings(self, thread_id: str) -> dict[str, bytes]:
+        return dict(self._threads.get(thread_id, {}))
+
+
+_store: ThreadMemoryStore | None = None
+_in_memory_store = InMemoryThreadMemoryStore()
+
+
+def set_thread_memory_store(store: ThreadMemoryStore | None) -> None:
+    """Register the store opened by the service, or None when it is closed."""
+    global _store
+    _store = store
+
+
+def get_thread_memory_store() -> ThreadMemoryStore:
+    """Return the service's store, or a store in this process's memory if none is open."""
+    return _store or _in_memory_store
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Run latency and throughput benchmarks against simulated models.
+No API keys are used; every LLM call is replaced by a stand-in with a fixed latency.
+"""
+
+import argparse
+import asyncio
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from benchmarks import (  # noqa: E402
+    character_fanout,
+    character_step,
+    character_stream,
+    character_summary,
+    inner_voice_reuse,
+    semantic_cache,
+    speculation,
+    stored_conversation,
+    thread_memory,
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run agent service benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    fanout = subparsers.add_parser(
+        "character-fanout", help="Sequential vs fan-out inner-voice consultation latency"
+    )
+    fanout.add_argument("--turns", type=int, default=10)
+    fanout.add_argument("--latency", type=float, default=0.5, help="Seconds per LLM call")
+
+    stream = subparsers.add_parser(
+        "character-stream", help="Throughput of concurrent /frank-character/stream requests"
+    )
+    stream.add_argument("--concurrency", type=int, default=64)
+    stream.add_argument("--latency", type=float, default=0.5, help="Seconds per LLM call")
+
+    step = subparsers.add_parser(
+        "character-step", help="Per-step overhead of preparing the character model"
+    )
+    step.add_argument("--iterations", type=int, default=2000)
+
+    summary = subparsers.add_parser(
+        "character-summary", help="Prompt tokens per turn with and without the rolling summary"
+    )
+    summary.add_argument("--turns", type=int, default=40)
+
+    semantic = subparsers.add_parser(
+        "semantic-cache", help="Lookup latency of the semantic inner-voice cache"
+    )
+    semantic.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    semantic.add_argument("--dim", type=int, default=256, help="Embedding dimension")
+
+    speculate = subparsers.add_parser(
+        "character-speculation",
+        help="Reply latency and spend of speculative inner-voice consultation",
+    )
+    speculate.add_argument("--latency", type=float, default=0.1, help="Seconds per LLM call")
+    speculate.add_argument(
+        "--mode", choices=["sequential", "fan_out", "council"], default="fan_out"
+    )
+
+    reuse = subparsers.add_parser(
+        "character-reuse", help="Reply latency and calls when inner-voice results are reused"
+    )
+    reuse.add_argument("--latency", type=float, default=0.1, help="Seconds per LLM call")
+    reuse.add_argument("--mode", choices=["sequential", "fan_out", "council"], default="fan_out")
+
+    memory = subparsers.add_parser(
+        "thread-memory", help="Index insert and recall cost of the per-thread memory"
+    )
+    memory.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000])
+
+    stored = subparsers.add_parser(
+        "stored-conversation",
+        help="Request bytes and time to first token with previous_response_id chaining",
+    )
+    stored.add_argument("--turns", type=int, default=40)
+
+    args = parser.parse_args()
+    if args.benchmark == "character-fanout":
+        asyncio.run(character_fanout.run(turns=args.turns, latency=args.latency))
+    elif args.benchmark == "character-stream":
+        asyncio.run(character_stream.run(concurrency=args.concurrency, latency=args.latency))
+    elif args.benchmark == "character-step":
+        character_step.run(iterations=args.iterations)
+    elif args.benchmark == "semantic-cache":
+        semantic_cache.run(sizes=args.sizes, dim=args.dim)
+    elif args.benchmark == "character-summary":
+        asyncio.run(character_summary.run(turns=args.turns))
+    elif args.benchmark == "thread-memory":
+        asyncio.run(thread_memory.run(sizes=args.sizes))
+    elif args.benchmark == "character-speculation":
+        asyncio.run(speculation.run(latency=args.latency, mode=args.mode))
+    elif args.benchmark == "character-reuse":
+        asyncio.run(inner_voice_reuse.run(latency=args.latency, mode=args.mode))
+    elif args.benchmark == "stored-conversation":
+        asyncio.run(stored_conversation.run(turns=args.turns))
@@ -1,12 +1,14 @@
 from schema.models import AllModelEnum
 from schema.schema import (
     AgentInfo,
+    BatchInvokeResult,
     ChatHistory,
     ChatHistoryInput,
     ChatMessage,
     Feedback,
     FeedbackResponse,
     ServiceMetadata,
+    ServiceMetrics,
     StreamInput,
     UserInput,
 )
@@ -14,9 +16,11 @@ from schema.schema import (
 __all__ = [
     "AgentInfo",
     "AllModelEnum",
+    "BatchInvokeResult",
     "UserInput",
     "ChatMessage",
     "ServiceMetadata",
+    "ServiceMetrics",
     "StreamInput",
     "Feedback",
     "FeedbackResponse",
@@ -77,6 +77,12 @@ class FakeModelName(StrEnum):
     FAKE = "fake"
 
 
+class AutoModelName(StrEnum):
+    """Picks one of the MODEL_ROUTES models per message, by how complex the message is."""
+
+    AUTO = "auto"
+
+
 AllModelEnum: TypeAlias = (
     OpenAIModelName
     | AzureOpenAIModelName
@@ -87,4 +93,25 @@ AllModelEnum: TypeAlias = (
     | AWSModelName
     | OllamaModelName
     | FakeModelName
+    | AutoModelName
 )
+
+PROVIDER_MODELS: dict[Provider, type[StrEnum]] = {
+    Provider.OPENAI: OpenAIModelName,
+    Provider.AZURE_OPENAI: AzureOpenAIModelName,
+    Provider.DEEPSEEK: DeepseekModelName,
+    Provider.ANTHROPIC: AnthropicModelName,
+    Provider.GOOGLE: GoogleModelName,
+    Provider.GROQ: GroqModelName,
+    Provider.AWS: AWSModelName,
+    Provider.OLLAMA: OllamaModelName,
+    Provider.FAKE: FakeModelName,
+}
+
+
+def get_provider(model: str) -> Provider | None:
+    """Return the provider serving a model name, or None for "auto"."""
+    for provider, names in PROVIDER_MODELS.items():
+        if model in list(names):
+            return provider
+    return None
@@ -55,6 +55,11 @@ class UserInput(BaseModel):
         default=None,
         examples=["847c6285-8fc9-4560-a83f-4e6285809254"],
     )
+    user_id: str | None = Field(
+        description="User ID for long-term memory shared by all threads of the user.",
+        default=None,
+        examples=["user-123"],
+    )
     agent_config: dict[str, Any] = Field(
         description="Additional configuration to pass through to the agent",
         default={},
@@ -131,6 +136,29 @@ class ChatMessage(BaseModel):
         print(self.pretty_repr())  # noqa: T201
 
 
+class BatchInvokeResult(BaseModel):
+    """Result of one input of a batch invoke, streamed as a line of NDJSON."""
+
+    index: int = Field(
+        description="Position of the input in the batch.",
+        examples=[0],
+    )
+    status_code: int = Field(
+        description="HTTP status the input would have returned from /invoke.",
+        default=200,
+        examples=[200, 422, 500],
+    )
+    output: ChatMessage | None = Field(
+        description="The agent's response, if the input succeeded.",
+        default=None,
+    )
+    error: str | None = Field(
+        description="Why the input failed.",
+        default=None,
+        examples=["Unexpected error"],
+    )
+
+
 class Feedback(BaseModel):
     """Feedback for a run, to record to LangSmith."""
 
@@ -164,7 +192,55 @@ class ChatHistoryInput(BaseModel):
         description="Thread ID to persist and continue a multi-turn conversation.",
         examples=["847c6285-8fc9-4560-a83f-4e6285809254"],
     )
+    limit: int | None = Field(
+        description="Maximum number of messages to return: the first ones after `after`, "
+        "otherwise the latest ones before `before`.",
+        default=None,
+        ge=1,
+        examples=[50],
+    )
+    before: str | None = Field(
+        description="Return only messages before the message with this id, "
+        "e.g. the `first_id` of a previous window.",
+        default=None,
+    )
+    after: str | None = Field(
+        description="Return only messages after the message with this id, "
+        "e.g. the `last_id` of a previous window.",
+        default=None,
+    )
 
 
 class ChatHistory(BaseModel):
     messages: list[ChatMessage]
+    first_id: str | None = Field(
+        description="Id of the first message, the `before` cursor of the previous window.",
+        default=None,
+    )
+    last_id: str | None = Field(
+        description="Id of the last message, the `after` cursor of the next window.",
+        default=None,
+    )
+    total: int | None = Field(
+        description="Number of messages in the thread.",
+        default=None,
+    )
+
+
+class ServiceMetrics(BaseModel):
+    """Snapshot of the service's in-process metrics."""
+
+    counters: dict[str, float] = Field(
+        description="Monotonic counters.",
+        examples=[{'inner_voice_cache_hits_total{tier="memory"}': 42}],
+    )
+    gauges: dict[str, float] = Field(
+        description="Current values.",
+        examples=[{'inner_voice_cache_entries{tier="memory"}': 128}],
+    )
+    summaries: dict[str, dict[str, float]] = Field(
+        description="Count, sum, mean and max of observed values.",
+        examples=[
+            {"inner_voice_latency_seconds": {"count": 3, "sum": 2.4, "mean": 0.8, "max": 1.1}}
+        ],
+    )
@@ -0,0 +1,50 @@
+from collections import OrderedDict
+from functools import cache
+
+from core import metrics, settings
+
+
+class InterruptIndex:
+    """Which threads of each agent have a pending interrupt, as of the last run this process
+    saw end.
+
+    Knowing this lets a request on an existing thread decide between a new message and
+    resuming an interrupt without loading the thread's state. Threads the index does not
+    know, e.g. after a restart or while a run is in progress, return None and the caller
+    reads the state. Threads are kept per agent, as another agent's graph may not have the
+    same interrupts on a thread_id. At most `max_threads` threads are kept, least recently
+    used first out.
+    """
+
+    def __init__(self, max_threads: int) -> None:
+        self.max_threads = max_threads
+        self._pending: OrderedDict[tuple[str, str], bool] = OrderedDict()
+
+    def get(self, agent_id: str, thread_id: str) -> bool | None:
+        key = (agent_id, thread_id)
+        pending = self._pending.get(key)
+        if pending is not None:
+            self._pending.move_to_end(key)
+        metrics.increment("interrupt_index_lookups_total", hit=str(pending is not None))
+        return pending
+
+    def set(self, agent_id: str, thread_id: str, pending: bool) -> None:
+        if self.max_threads <= 0:
+            return
+        key = (agent_id, thread_id)
+        self._pending[key] = pending
+        self._pending.move_to_end(key)
+        while len(self._pending) > self.max_threads:
+            self._pending.popitem(last=False)
+
+    def discard(self, agent_id: str, thread_id: str) -> None:
+        self._pending.pop((agent_id, thread_id), None)
+
+
+@cache
+def get_interrupt_index() -> InterruptIndex:
+    # Runs on other processes would make the index stale, so it is only enabled with
+    # INTERRUPT_INDEX_SIZE for a single service process
+    if settings.THREAD_RUN_LOCK == "database":
+        return InterruptIndex(max_threads=0)
+    return InterruptIndex(max_threads=settings.INTERRUPT_INDEX_SIZE)
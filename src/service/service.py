@@ -1,34 +1,66 @@
+import asyncio
 import json
 import logging
+import time
 import warnings
-from collections.abc import AsyncGenerator
-from contextlib import asynccontextmanager
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass
 from typing import Annotated, Any
 from uuid import UUID, uuid4
 
-from fastapi import APIRouter, Depends, FastAPI, HTTPException, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Query, status
+from fastapi.responses import Response, StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from langchain_core._api import LangChainBetaWarning
-from langchain_core.messages import AIMessage, AIMessageChunk, AnyMessage, HumanMessage, ToolMessage
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    AnyMessage,
+    HumanMessage,
+    RemoveMessage,
+    ToolMessage,
+)
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.types import Command, Interrupt
 from langsmith import Client as LangsmithClient
+from starlette.background import BackgroundTask
 
 from agents import DEFAULT_AGENT, get_agent, get_all_agent_info
-from core import settings
-from memory import initialize_database
+from agents.model_router import aroute_model, record_routed_turn
+from agents.turn_classifier import TurnClassifier
+from core import metrics, settings
+from core.admission import ProviderBusyError
+from memory import (
+    initialize_database,
+    initialize_store,
+    initialize_thread_leases,
+    initialize_thread_memory_store,
+    set_long_term_store,
+    set_thread_memory_store,
+)
 from schema import (
+    BatchInvokeResult,
     ChatHistory,
     ChatHistoryInput,
     ChatMessage,
     Feedback,
     FeedbackResponse,
     ServiceMetadata,
+    ServiceMetrics,
     StreamInput,
     UserInput,
 )
+from schema.models import AutoModelName
+from service.interrupt_index import get_interrupt_index
+from service.thread_runs import (
+    ThreadBusyError,
+    ThreadRun,
+    ThreadRunPolicy,
+    ThreadSlot,
+    get_thread_runs,
+)
 from service.utils import (
     convert_message_content_to_string,
     langchain_to_chat_message,
@@ -56,14 +88,30 @@ def verify_bearer(
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """
     Configurable lifespan that initializes the appropriate database checkpointer based on settings.
+    The long-term memory store, if enabled, and the thread memory live in the same database.
     """
     try:
-        async with initialize_database() as saver:
+        async with initialize_database() as saver, AsyncExitStack() as stack:
             await saver.setup()
             agents = get_all_agent_info()
             for a in agents:
                 agent = get_agent(a.key)
                 agent.checkpointer = saver
+            if settings.LONG_TERM_MEMORY_ENABLED:
+                store = await stack.enter_async_context(initialize_store())
+                await store.setup()
+                set_long_term_store(store)
+                stack.callback(set_long_term_store, None)
+            thread_memory = await stack.enter_async_context(initialize_thread_memory_store())
+            await thread_memory.setup()
+            set_thread_memory_store(thread_memory)
+            stack.callback(set_thread_memory_store, None)
+            if settings.THREAD_RUN_LOCK == "database":
+                leases = await stack.enter_async_context(initialize_thread_leases())
+                await leases.setup()
+                thread_runs = get_thread_runs()
+                thread_runs.leases = leases
+                stack.callback(setattr, thread_runs, "leases", None)
             yield
     except Exception as e:
         logger.error(f"Error during database initialization: {e}")
@@ -87,7 +135,10 @@ async def info() -> ServiceMetadata:
 
 
 async def _handle_input(
-    user_input: UserInput, agent: CompiledStateGraph
+    user_input: UserInput,
+    agent_id: str,
+    agent: CompiledStateGraph,
+    deadline_ms: int | None = None,
 ) -> tuple[dict[str, Any], UUID]:
     """
     Parse user input and handle any required interrupt resumption.
@@ -98,6 +149,12 @@ async def _handle_input(
 
     # Start with the base configurable (thread_id and model)
     configurable = {"thread_id": thread_id, "model": user_input.model}
+    if user_input.user_id:
+        configurable["user_id"] = user_input.user_id
+    # "auto" is resolved once per request to the model of the message's complexity tier
+    if user_input.model == AutoModelName.AUTO:
+        complexity, configurable["model"] = await aroute_model(user_input.message)
+        configurable["model_route"] = complexity
     
     # Add character-specific config if available
     if hasattr(agent, "character_config") and agent.character_config:
@@ -106,27 +163,56 @@ async def _handle_input(
             if key not in configurable:  # Don't override thread_id or model
                 configurable[key] = value
 
-    # Add user-provided agent config
+    # Add user-provided agent config. It may override agent defaults such as the character
+    # agent's inner_voice_mode, but not the thread, model, character, user or the absolute
+    # deadline, which is only set from the validated deadline_ms below.
     if user_input.agent_config:
-        if overlap := configurable.keys() & user_input.agent_config.keys():
+        reserved = {"thread_id", "model", "model_route", "character", "user_id", "deadline"}
+        if overlap := reserved & user_input.agent_config.keys():
             raise HTTPException(
                 status_code=422,
                 detail=f"agent_config contains reserved keys: {overlap}",
             )
         configurable.update(user_input.agent_config)
+        if "turn_classifier" in configurable:
+            try:
+                TurnClassifier(configurable["turn_classifier"])
+            except ValueError:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"turn_classifier must be one of {[c.value for c in TurnClassifier]}",
+                )
+
+    # The latency budget, from agent_config or the X-Deadline-Ms header, becomes an absolute
+    # deadline the agents compare against
+    deadline_ms = configurable.get("deadline_ms", deadline_ms)
+    if deadline_ms is not None:
+        if (
+            isinstance(deadline_ms, bool)
+            or not isinstance(deadline_ms, int | float)
+            or deadline_ms < 0
+        ):
+            raise HTTPException(
+                status_code=422,
+                detail="deadline_ms must be a non-negative number of milliseconds",
+            )
+        configurable["deadline"] = time.time() + deadline_ms / 1000
 
     config = RunnableConfig(
         configurable=configurable,
         run_id=run_id,
     )
 
-    # Check for interrupts that need to be resumed
-    state = await agent.aget_state(config=config)
-    interrupted_tasks = [
-        task for task in state.tasks if hasattr(task, "interrupts") and task.interrupts
-    ]
+    # Check for interrupts that need to be resumed. A new thread has none, and for threads in
+    # the interrupt index the state is not loaded.
+    if not user_input.thread_id:
+        interrupted = False
+    elif (interrupted := get_interrupt_index().get(agent_id, thread_id)) is None:
+        state = await agent.aget_state(config=config)
+        interrupted = any(getattr(task, "interrupts", None) for task in state.tasks)
+        get_interrupt_index().set(agent_id, thread_id, interrupted)
 
-    if interrupted_tasks:
+    if interrupted:
         # assume user input is response to resume agent execution from interrupt
         input = Command(resume=user_input.message)
     else:
@@ -140,55 +226,272 @@ async def _handle_input(
     return kwargs, run_id
 
 
+@dataclass
+class _Run:
+    """A started run: its invocation kwargs, run_id and the release of its thread.
+
+    An `attached` run is another request's run on the same thread, whose output this
+    request returns; its kwargs only hold the config of the thread. A `completed` run ended
+    with a response, so the agent's `after_run` hook is due when it is released.
+    """
+
+    kwargs: dict[str, Any]
+    run_id: UUID
+    release: Callable[[], Awaitable[None]]
+    # perf_counter() when the request was received
+    start: float
+    thread_run: ThreadRun | None = None
+    attached: bool = False
+    completed: bool = False
+
+
+async def _enter_thread(user_input: UserInput) -> ThreadSlot | None:
+    """Serialize runs on the input's thread; 409 when the thread is busy under its policy."""
+    if not user_input.thread_id:
+        return None
+    agent_config = user_input.agent_config or {}
+    try:
+        policy = ThreadRunPolicy(agent_config.get("thread_run_policy", settings.THREAD_RUN_POLICY))
+    except ValueError:
+        raise HTTPException(
+            status_code=422,
+            detail=f"thread_run_policy must be one of {[p.value for p in ThreadRunPolicy]}",
+        )
+    try:
+        return await get_thread_runs().enter(user_input.thread_id, policy)
+    except ThreadBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+def _provider_busy(e: ProviderBusyError) -> HTTPException:
+    """429 with Retry-After for an LLM call that its provider did not admit."""
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+async def _start_run(
+    user_input: UserInput,
+    agent_id: str,
+    agent: CompiledStateGraph,
+    deadline_ms: int | None = None,
+) -> _Run:
+    start = time.perf_counter()
+    slot = await _enter_thread(user_input)
+    if slot is not None and slot.attached:
+        config = RunnableConfig(configurable={"thread_id": user_input.thread_id})
+        return _Run({"config": config}, uuid4(), slot.release, start, slot.run, attached=True)
+    try:
+        kwargs, run_id = await _handle_input(user_input, agent_id, agent, deadline_ms)
+    except BaseException as e:
+        if slot is not None:
+            await slot.release()
+        if isinstance(e, ProviderBusyError):
+            # The model router's classifier call was not admitted
+            raise _provider_busy(e)
+        raise
+
+    # The run changes the thread's interrupts; the index knows them again when it ends
+    get_interrupt_index().discard(agent_id, kwargs["config"]["configurable"]["thread_id"])
+
+    released = False
+
+    async def release() -> None:
+        # Called by the response's generator and again once the response is done
+        nonlocal released
+        if released:
+            return
+        released = True
+        if slot is not None:
+            await slot.release()
+        if run.completed and callable(getattr(agent, "after_run", None)):
+            _schedule_after_run(agent, kwargs["config"])
+
+    if slot is None:
+        run = _Run(kwargs, run_id, release, start)
+    else:
+        slot.run.run_id = str(run_id)
+        run = _Run(kwargs, run_id, release, start, slot.run)
+    return run
+
+
+async def _thread_output(agent: CompiledStateGraph, run: _Run) -> ChatMessage:
+    """The final response of the thread's latest run: its last message or interrupt."""
+    state = await agent.aget_state(config=run.kwargs["config"])
+    interrupts = [i for task in state.tasks for i in getattr(task, "interrupts", ())]
+    if interrupts:
+        output = langchain_to_chat_message(AIMessage(content=interrupts[0].value))
+    else:
+        output = langchain_to_chat_message(state.values["messages"][-1])
+    output.run_id = run.thread_run.run_id
+    return output
+
+
+def _turn_messages(messages: list[AnyMessage]) -> list[AnyMessage]:
+    """Return the messages after the last human message, i.e. those of the latest turn."""
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            return messages[i + 1 :]
+    return messages
+
+
+# Background work started after a response, e.g. the character agents' conversation
+# summary. The references keep the tasks from being garbage collected while they run.
+_background_tasks: set[asyncio.Task] = set()
+
+
+async def _after_run(agent: CompiledStateGraph, config: RunnableConfig) -> None:
+    try:
+        await agent.after_run(agent, config)
+    except Exception as e:
+        logger.error(f"after_run failed: {e}")
+
+
+def _schedule_after_run(agent: CompiledStateGraph, config: RunnableConfig) -> None:
+    """Run the agent's `after_run` hook without delaying the response or the next run.
+
+    The thread is free again when the hook starts, so the hook drops its state writes once
+    the thread has moved on, see `asummarize_conversation`.
+    """
+    task = asyncio.create_task(_after_run(agent, config))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
 @router.post("/{agent_id}/invoke")
 @router.post("/invoke")
-async def invoke(user_input: UserInput, agent_id: str = DEFAULT_AGENT) -> ChatMessage:
+async def invoke(
+    user_input: UserInput,
+    agent_id: str = DEFAULT_AGENT,
+    deadline_ms: Annotated[int | None, Header(alias="X-Deadline-Ms")] = None,
+) -> ChatMessage:
     """
     Invoke an agent with user input to retrieve a final response.
 
     If agent_id is not provided, the default agent will be used.
     Use thread_id to persist and continue a multi-turn conversation. run_id kwarg
     is also attached to messages for recording feedback.
+    A latency budget can be set with `deadline_ms` in agent_config or the X-Deadline-Ms
+    header; the response metadata then lists the degradations applied to meet it.
+    With model "auto", the model is picked per message from MODEL_ROUTES.
+    Answers 429 with Retry-After when an LLM call of the run is not admitted because its
+    provider has too many calls in flight.
+    Runs on a thread are serialized: with thread_run_policy (agent_config or
+    THREAD_RUN_POLICY) "wait" the request waits, "reject" answers 409 and "attach" returns
+    the response of the run in progress.
     """
+    return await _invoke(user_input, agent_id, deadline_ms)
+
+
+async def _invoke(
+    user_input: UserInput, agent_id: str, deadline_ms: int | None = None
+) -> ChatMessage:
+    """Run an agent on one input to its final response, for /invoke and /invoke/batch."""
     # NOTE: Currently this only returns the last message or interrupt.
     # In the case of an agent outputting multiple AIMessages (such as the background step
     # in interrupt-agent, or a tool step in research-assistant), it's omitted. Arguably,
     # you'd want to include it. You could update the API to return a list of ChatMessages
     # in that case.
     agent: CompiledStateGraph = get_agent(agent_id)
-    kwargs, run_id = await _handle_input(user_input, agent)
+    run = await _start_run(user_input, agent_id, agent, deadline_ms)
+    if run.attached:
+        await run.thread_run.wait()
+        return await _thread_output(agent, run)
+    kwargs, run_id, start = run.kwargs, run.run_id, run.start
+    thread_id = kwargs["config"]["configurable"]["thread_id"]
     try:
         response_events = await agent.ainvoke(**kwargs, stream_mode=["updates", "values"])
         response_type, response = response_events[-1]
         if response_type == "values":
             # Normal response, the agent completed successfully
             output = langchain_to_chat_message(response["messages"][-1])
+            if route := kwargs["config"]["configurable"].get("model_route"):
+                record_routed_turn(
+                    route, time.perf_counter() - start, _turn_messages(response["messages"])
+                )
+            get_interrupt_index().set(agent_id, thread_id, False)
+            run.completed = True
         elif response_type == "updates" and "__interrupt__" in response:
             # The last thing to occur was an interrupt
             # Return the value of the first interrupt as an AIMessage
             output = langchain_to_chat_message(
                 AIMessage(content=response["__interrupt__"][0].value)
             )
+            get_interrupt_index().set(agent_id, thread_id, True)
         else:
             raise ValueError(f"Unexpected response type: {response_type}")
 
         output.run_id = str(run_id)
         return output
+    except ProviderBusyError as e:
+        raise _provider_busy(e)
     except Exception as e:
         logger.error(f"An exception occurred: {e}")
         raise HTTPException(status_code=500, detail="Unexpected error")
+    finally:
+        await run.release()
 
 
 async def message_generator(
-    user_input: StreamInput, agent_id: str = DEFAULT_AGENT
+    user_input: StreamInput,
+    agent_id: str = DEFAULT_AGENT,
+    deadline_ms: int | None = None,
+    run: _Run | None = None,
 ) -> AsyncGenerator[str, None]:
     """
     Generate a stream of messages from the agent.
 
-    This is the workhorse method for the /stream endpoint.
+    This is the workhorse method for the /stream endpoint, which starts the `run` before
+    the response so that invalid or unadmitted requests get their HTTP status. The events of
+    a run on a thread are published for requests that attach to it.
     """
     agent: CompiledStateGraph = get_agent(agent_id)
-    kwargs, run_id = await _handle_input(user_input, agent)
+    if run is None:
+        run = await _start_run(user_input, agent_id, agent, deadline_ms)
+    if run.attached:
+        async for event in _follow_run(agent, run):
+            yield event
+        return
+    try:
+        async for event in _stream_run(user_input, agent_id, agent, run):
+            if run.thread_run is not None:
+                run.thread_run.publish(event)
+            yield event
+    except ProviderBusyError as e:
+        # The response has started, so the client gets an error event instead of a 429
+        error = f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
+        for event in (error, _SSE_DONE):
+            if run.thread_run is not None:
+                run.thread_run.publish(event)
+            yield event
+    finally:
+        await run.release()
+
+
+async def _follow_run(agent: CompiledStateGraph, run: _Run) -> AsyncGenerator[str, None]:
+    """Stream the events of another request's run on the thread, from its start."""
+    last_event = None
+    async for last_event in run.thread_run.follow():
+        yield last_event
+    if last_event != _SSE_DONE:
+        # The run was an /invoke, on another process, or failed: send its final response
+        output = await _thread_output(agent, run)
+        yield f"data: {json.dumps({'type': 'message', 'content': output.model_dump()})}\n\n"
+        yield _SSE_DONE
+
+
+_SSE_DONE = "data: [DONE]\n\n"
+
+
+async def _stream_run(
+    user_input: StreamInput, agent_id: str, agent: CompiledStateGraph, run: _Run
+) -> AsyncGenerator[str, None]:
+    kwargs, run_id, start = run.kwargs, run.run_id, run.start
+    # Messages the graph produced this turn, for the model router's token usage
+    turn_messages: list[AnyMessage] = []
+    interrupted = False
 
     # Process streamed events from the graph and yield messages over the SSE stream.
     async for stream_event in agent.astream(
@@ -204,11 +507,18 @@ async def message_generator(
                 # In a more sophisticated implementation, we could add
                 # some structured ChatMessage type to return the interrupt value.
                 if node == "__interrupt__":
+                    interrupted = True
                     interrupt: Interrupt
                     for interrupt in updates:
                         new_messages.append(AIMessage(content=interrupt.value))
                     continue
-                update_messages = updates.get("messages", [])
+                # Deletions and compacted copies rewrite earlier history; they are not output
+                update_messages = [
+                    msg
+                    for msg in updates.get("messages", [])
+                    if not isinstance(msg, RemoveMessage)
+                    and not msg.response_metadata.get("compacted")
+                ]
                 # special cases for using langgraph-supervisor library
                 if node == "supervisor":
                     # Get only the last AIMessage since supervisor includes all previous messages
@@ -225,6 +535,7 @@ async def message_generator(
                     )
                     update_messages = [msg]
                 new_messages.extend(update_messages)
+                turn_messages.extend(update_messages)
 
         if stream_mode == "custom":
             new_messages = [event]
@@ -258,7 +569,58 @@ async def message_generator(
                 # that the model is asking for a tool to be invoked.
                 # So we only print non-empty content.
                 yield f"data: {json.dumps({'type': 'token', 'content': convert_message_content_to_string(content)})}\n\n"
-    yield "data: [DONE]\n\n"
+    yield _SSE_DONE
+    get_interrupt_index().set(agent_id, kwargs["config"]["configurable"]["thread_id"], interrupted)
+    if route := kwargs["config"]["configurable"].get("model_route"):
+        record_routed_turn(route, time.perf_counter() - start, turn_messages)
+    run.completed = True
+
+
+async def _invoke_batch_item(
+    index: int, user_input: UserInput, agent_id: str, deadline_ms: int | None
+) -> BatchInvokeResult:
+    try:
+        output = await _invoke(user_input, agent_id, deadline_ms)
+    except HTTPException as e:
+        return BatchInvokeResult(index=index, status_code=e.status_code, error=str(e.detail))
+    except Exception as e:
+        logger.error(f"An exception occurred in batch item {index}: {e}")
+        return BatchInvokeResult(index=index, status_code=500, error="Unexpected error")
+    return BatchInvokeResult(index=index, output=output)
+
+
+async def batch_generator(
+    user_inputs: list[UserInput],
+    agent_id: str = DEFAULT_AGENT,
+    max_concurrency: int | None = None,
+    deadline_ms: int | None = None,
+) -> AsyncGenerator[str, None]:
+    """
+    Invoke an agent on every input of a batch, yielding each result as NDJSON when it is done.
+
+    At most `max_concurrency` inputs, and never more than BATCH_INVOKE_MAX_CONCURRENCY, run
+    at the same time. The remaining inputs are cancelled if the client disconnects.
+    """
+    concurrency = min(
+        max_concurrency or settings.BATCH_INVOKE_MAX_CONCURRENCY,
+        settings.BATCH_INVOKE_MAX_CONCURRENCY,
+    )
+    pending = iter(enumerate(user_inputs))
+    results: asyncio.Queue[BatchInvokeResult] = asyncio.Queue()
+
+    async def worker() -> None:
+        for index, user_input in pending:
+            results.put_nowait(await _invoke_batch_item(index, user_input, agent_id, deadline_ms))
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(user_inputs)))]
+    try:
+        for _ in user_inputs:
+            result = await results.get()
+            metrics.increment("batch_invoke_items_total", status=str(result.status_code))
+            yield result.model_dump_json() + "\n"
+    finally:
+        for task in workers:
+            task.cancel()
 
 
 def _sse_response_example() -> dict[int, Any]:
@@ -281,7 +643,11 @@ def _sse_response_example() -> dict[int, Any]:
     responses=_sse_response_example(),
 )
 @router.post("/stream", response_class=StreamingResponse, responses=_sse_response_example())
-async def stream(user_input: StreamInput, agent_id: str = DEFAULT_AGENT) -> StreamingResponse:
+async def stream(
+    user_input: StreamInput,
+    agent_id: str = DEFAULT_AGENT,
+    deadline_ms: Annotated[int | None, Header(alias="X-Deadline-Ms")] = None,
+) -> StreamingResponse:
     """
     Stream an agent's response to a user input, including intermediate messages and tokens.
 
@@ -290,10 +656,61 @@ async def stream(user_input: StreamInput, agent_id: str = DEFAULT_AGENT) -> Stre
     is also attached to all messages for recording feedback.
 
     Set `stream_tokens=false` to return intermediate messages but not token-by-token.
+    A latency budget can be set with `deadline_ms` in agent_config or the X-Deadline-Ms header.
+    An LLM call that its provider does not admit (see PROVIDER_CONCURRENCY_LIMITS) ends the
+    stream with an error event.
+    A request that attaches to a thread's run in progress streams that run's events.
     """
+    run = await _start_run(user_input, agent_id, get_agent(agent_id), deadline_ms)
+    # The generator does not run if the client disconnects before the body is sent
     return StreamingResponse(
-        message_generator(user_input, agent_id),
+        message_generator(user_input, agent_id, deadline_ms, run),
         media_type="text/event-stream",
+        background=BackgroundTask(run.release),
+    )
+
+
+def _ndjson_response_example() -> dict[int, Any]:
+    return {
+        status.HTTP_200_OK: {
+            "description": "One BatchInvokeResult per line, in completion order",
+            "content": {
+                "application/x-ndjson": {
+                    "example": '{"index": 1, "status_code": 200, "output": {...}, "error": null}\n'
+                    '{"index": 0, "status_code": 500, "output": null, "error": "Unexpected error"}\n',
+                    "schema": {"type": "string"},
+                }
+            },
+        }
+    }
+
+
+@router.post(
+    "/{agent_id}/invoke/batch",
+    response_class=StreamingResponse,
+    responses=_ndjson_response_example(),
+)
+@router.post(
+    "/invoke/batch", response_class=StreamingResponse, responses=_ndjson_response_example()
+)
+async def invoke_batch(
+    user_inputs: list[UserInput],
+    agent_id: str = DEFAULT_AGENT,
+    max_concurrency: Annotated[int | None, Query(ge=1)] = None,
+    deadline_ms: Annotated[int | None, Header(alias="X-Deadline-Ms")] = None,
+) -> StreamingResponse:
+    """
+    Invoke an agent on many independent inputs, e.g. for offline jobs.
+
+    The inputs run concurrently, at most `max_concurrency` at a time (capped by the
+    service's BATCH_INVOKE_MAX_CONCURRENCY). Each result is streamed back as a line of
+    NDJSON as soon as its input finishes, with the input's `index`. A failing input returns
+    its error and status code in its line without failing the batch.
+    The X-Deadline-Ms header sets the latency budget of every input.
+    """
+    return StreamingResponse(
+        batch_generator(user_inputs, agent_id, max_concurrency, deadline_ms),
+        media_type="application/x-ndjson",
     )
 
 
@@ -317,29 +734,131 @@ async def feedback(feedback: Feedback) -> FeedbackResponse:
     return FeedbackResponse()
 
 
-@router.post("/history")
-def history(input: ChatHistoryInput) -> ChatHistory:
-    """
-    Get chat history.
+def _history_window(messages: list[AnyMessage], input: ChatHistoryInput) -> tuple[int, int]:
+    """Return the start and end positions of the messages selected by the cursors and limit.
+
+    The cursors are message ids; 410 when a cursor's message is no longer in the thread, e.g.
+    after compaction dropped it.
     """
-    # TODO: Hard-coding DEFAULT_AGENT here is wonky
-    agent: CompiledStateGraph = get_agent(DEFAULT_AGENT)
-    try:
-        state_snapshot = agent.get_state(
-            config=RunnableConfig(
-                configurable={
-                    "thread_id": input.thread_id,
-                }
+    positions = {message.id: i for i, message in enumerate(messages)}
+
+    def position(message_id: str) -> int:
+        if message_id not in positions:
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail=f"Message {message_id} is no longer in the thread",
             )
+        return positions[message_id]
+
+    start = 0 if input.after is None else position(input.after) + 1
+    end = len(messages) if input.before is None else position(input.before)
+    end = max(start, end)
+    if input.limit is not None:
+        if input.after is not None and input.before is None:
+            end = min(end, start + input.limit)
+        else:
+            start = max(start, end - input.limit)
+    return start, end
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an If-None-Match header, "*" or a list of possibly weak ETags, matches etag."""
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
+
+
+async def _history(
+    input: ChatHistoryInput, agent_id: str, response: Response, if_none_match: str | None = None
+) -> ChatHistory | Response:
+    agent: CompiledStateGraph = get_agent(agent_id)
+    try:
+        # The messages are read from the latest checkpoint, without building the state
+        # snapshot and its pending tasks
+        checkpoint = await agent.checkpointer.aget_tuple(
+            RunnableConfig(configurable={"thread_id": input.thread_id})
+        )
+        if checkpoint is None:
+            metrics.increment("history_requests_total", status="200")
+            return ChatHistory(messages=[], total=0)
+        # The latest checkpoint identifies the thread's content
+        checkpoint_id = checkpoint.config.get("configurable", {}).get("checkpoint_id")
+        etag = f'"{checkpoint_id}"' if checkpoint_id else None
+        if etag and _etag_matches(if_none_match, etag):
+            metrics.increment("history_requests_total", status="304")
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        if etag:
+            response.headers["ETag"] = etag
+
+        # Only the requested window is converted
+        messages: list[AnyMessage] = checkpoint.checkpoint["channel_values"].get("messages", [])
+        start, end = _history_window(messages, input)
+        chat_messages: list[ChatMessage] = [
+            langchain_to_chat_message(m) for m in messages[start:end]
+        ]
+        metrics.increment("history_requests_total", status="200")
+        return ChatHistory(
+            messages=chat_messages,
+            first_id=messages[start].id if start < end else None,
+            last_id=messages[end - 1].id if start < end else None,
+            total=len(messages),
         )
-        messages: list[AnyMessage] = state_snapshot.values["messages"]
-        chat_messages: list[ChatMessage] = [langchain_to_chat_message(m) for m in messages]
-        return ChatHistory(messages=chat_messages)
+    except HTTPException:
+        metrics.increment("history_requests_total", status="410")
+        raise
     except Exception as e:
         logger.error(f"An exception occurred: {e}")
         raise HTTPException(status_code=500, detail="Unexpected error")
 
 
+@router.post("/{agent_id}/history")
+@router.post("/history")
+async def history(
+    input: ChatHistoryInput, response: Response, agent_id: str = DEFAULT_AGENT
+) -> ChatHistory:
+    """
+    Get chat history.
+
+    If agent_id is not provided, the default agent will be used. `limit` and the
+    `before`/`after` cursors, ids of messages in the thread, select a window of the
+    messages; the response's `first_id` and `last_id` are the cursors for the windows
+    before and after it. A cursor whose message is no longer in the thread answers 410.
+    """
+    return await _history(input, agent_id, response)
+
+
+@router.get("/{agent_id}/history")
+@router.get("/history")
+async def get_history(
+    thread_id: str,
+    response: Response,
+    agent_id: str = DEFAULT_AGENT,
+    limit: Annotated[int | None, Query(ge=1)] = None,
+    before: str | None = None,
+    after: str | None = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> ChatHistory:
+    """
+    Get chat history, as POST /history with the input as query parameters.
+
+    The ETag is the thread's latest checkpoint; with a matching If-None-Match the answer is
+    304 Not Modified without converting the messages.
+    """
+    input = ChatHistoryInput(thread_id=thread_id, limit=limit, before=before, after=after)
+    return await _history(input, agent_id, response, if_none_match)
+
+
+@router.get("/metrics")
+async def get_metrics() -> ServiceMetrics:
+    """
+    Get a snapshot of the in-process metrics, such as cache hit, miss and eviction counts.
+    """
+    return ServiceMetrics(**metrics.snapshot())
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass
+from enum import StrEnum
+from functools import cache
+from uuid import uuid4
+
+from core import metrics, settings
+from memory import ThreadLeases
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadRunPolicy(StrEnum):
+    """What a request does when its thread is already running."""
+
+    # Run after the current run
+    WAIT = "wait"
+    # Fail with 409 Conflict
+    REJECT = "reject"
+    # Return the output of the current run instead of starting another one
+    ATTACH = "attach"
+
+
+class ThreadBusyError(Exception):
+    def __init__(self, thread_id: str) -> None:
+        super().__init__(f"Thread {thread_id} is already running")
+        self.thread_id = thread_id
+
+
+class ThreadRun:
+    """A run in progress on a thread, whose output attached requests follow."""
+
+    def __init__(self) -> None:
+        # Output published by the run so far, e.g. the SSE events of a /stream run
+        self.events: list[str] = []
+        self.finished = False
+        # Set by the owner once the run has started, for the output of attached requests
+        self.run_id: str | None = None
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self, event: str) -> None:
+        self.events.append(event)
+        self._notify()
+
+    def finish(self) -> None:
+        self.finished = True
+        self._notify()
+
+    async def follow(self) -> AsyncIterator[str]:
+        """Yield the run's output from its start until it finishes."""
+        sent = 0
+        while True:
+            while sent < len(self.events):
+                yield self.events[sent]
+                sent += 1
+            if self.finished:
+                return
+            await self._changed.wait()
+
+    async def wait(self) -> None:
+        while not self.finished:
+            await self._changed.wait()
+
+
+async def _noop() -> None:
+    return None
+
+
+@dataclass
+class ThreadSlot:
+    """The outcome of entering a thread: the caller's own run, or a run to attach to."""
+
+    run: ThreadRun
+    attached: bool
+    release: Callable[[], Awaitable[None]] = _noop
+
+
+class ThreadRuns:
+    """Serializes the runs of each thread within the process and, with leases, across processes.
+
+    Each thread has an asyncio lock held for the duration of a run. With `leases`, the
+    process also holds the thread's lease in the checkpoint database and renews it while the
+    run lasts; a run on another process is waited for by polling.
+    """
+
+    def __init__(
+        self,
+        wait_timeout_seconds: float,
+        leases: ThreadLeases | None = None,
+        poll_seconds: float = 0.2,
+    ) -> None:
+        self.wait_timeout_seconds = wait_timeout_seconds
+        self.leases = leases
+        self.poll_seconds = poll_seconds
+        self.owner = uuid4().hex
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._users: Counter[str] = Counter()
+        self._active: dict[str, ThreadRun] = {}
+        self._watchers: set[asyncio.Task] = set()
+
+    def _conflict(self, thread_id: str, policy: ThreadRunPolicy) -> None:
+        metrics.increment("thread_run_conflicts_total", policy=policy)
+        if policy == ThreadRunPolicy.REJECT:
+            raise ThreadBusyError(thread_id)
+
+    def _leave(self, thread_id: str) -> None:
+        self._users[thread_id] -= 1
+        if self._users[thread_id] <= 0:
+            del self._users[thread_id]
+            self._locks.pop(thread_id, None)
+
+    async def enter(self, thread_id: str, policy: ThreadRunPolicy) -> ThreadSlot:
+        """Start a run on a thread according to policy; raises ThreadBusyError for 409."""
+        deadline = time.monotonic() + self.wait_timeout_seconds
+        if (active := self._active.get(thread_id)) is not None:
+            self._conflict(thread_id, policy)
+            if policy == ThreadRunPolicy.ATTACH:
+                return ThreadSlot(active, attached=True)
+
+        lock = self._locks.setdefault(thread_id, asyncio.Lock())
+        self._users[thread_id] += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(lock.acquire(), self.wait_timeout_seconds)
+        except TimeoutError:
+            self._leave(thread_id)
+            raise ThreadBusyError(thread_id) from None
+        run = ThreadRun()
+        self._active[thread_id] = run
+
+        def unlock() -> None:
+            self._active.pop(thread_id, None)
+            lock.release()
+            self._leave(thread_id)
+
+        try:
+            remote = await self._acquire_lease(thread_id, policy, deadline)
+        except BaseException:
+            unlock()
+            raise
+        metrics.observe("thread_run_wait_seconds", time.perf_counter() - start)
+        if remote is not None:
+            unlock()
+            run.finish()
+            return ThreadSlot(remote, attached=True)
+
+        heartbeat = asyncio.create_task(self._renew(thread_id)) if self.leases else None
+
+        async def release() -> None:
+            run.finish()
+            unlock()
+            if heartbeat is not None:
+                heartbeat.cancel()
+                try:
+                    await self.leases.arelease(thread_id, self.owner)
+                except Exception as e:
+                    # The lease expires on its own
+                    logger.error(f"Failed to release the lease of thread {thread_id}: {e}")
+
+        return ThreadSlot(run, attached=False, release=release)
+
+    async def _acquire_lease(
+        self, thread_id: str, policy: ThreadRunPolicy, deadline: float
+    ) -> ThreadRun | None:
+        """Take the thread's lease; returns a run to attach to if another process holds it."""
+        if self.leases is None or await self.leases.atry_acquire(thread_id, self.owner):
+            return None
+        self._conflict(thread_id, policy)
+        if policy == ThreadRunPolicy.ATTACH:
+            remote = ThreadRun()
+            watcher = asyncio.create_task(self._finish_when_released(thread_id, remote))
+            self._watchers.add(watcher)
+            watcher.add_done_callback(self._watchers.discard)
+            return remote
+        while not await self.leases.atry_acquire(thread_id, self.owner):
+            if time.monotonic() >= deadline:
+                raise ThreadBusyError(thread_id)
+            await asyncio.sleep(self.poll_seconds)
+        return None
+
+    async def _finish_when_released(self, thread_id: str, remote: ThreadRun) -> None:
+        try:
+            while await self.leases.aheld(thread_id):
+                await asyncio.sleep(self.poll_seconds)
+        finally:
+            remote.finish()
+
+    async def _renew(self, thread_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.leases.ttl_seconds / 3)
+            try:
+                await self.leases.arenew(thread_id, self.owner)
+            except Exception as e:
+                logger.error(f"Failed to renew the lease of thread {thread_id}: {e}")
+
+
+@cache
+def get_thread_runs() -> ThreadRuns:
+    """Return the process-wide thread run registry; the service adds the leases on startup."""
+    return ThreadRuns(wait_timeout_seconds=settings.THREAD_RUN_WAIT_TIMEOUT_SECONDS)
@@ -0,0 +1,326 @@
+import dataclasses
+from collections import OrderedDict
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from agents.character_agent import (
+    InnerVoiceMode,
+    _complete_fan_out,
+    arecover_inner_voices,
+    build_character_agent,
+    create_character_tools,
+    get_model_runnable,
+)
+from agents.character_prompts import CHARACTER_PROMPTS, get_character_prompts
+from agents.inner_voice_cache import InnerVoiceCache, SemanticInnerVoiceCache
+from benchmarks.simulated import SimulatedCharacterModel
+from core.llm import FakeToolModel
+from core.metrics import MetricsRegistry
+
+
+async def _run_turn(mode: InnerVoiceMode, model: SimulatedCharacterModel) -> list:
+    graph = build_character_agent(checkpointer=MemorySaver(), inner_voice_mode=mode)
+    config = {"configurable": {**graph.character_config["configurable"], "thread_id": str(uuid4())}}
+    with patch("agents.character_agent.get_model", return_value=model):
+        result = await graph.ainvoke({"messages": [HumanMessage(content="Hallo Frank")]}, config)
+    return result["messages"]
+
+
+@pytest.mark.asyncio
+async def test_sequential_mode_consults_one_voice_per_turn() -> None:
+    model = SimulatedCharacterModel()
+    messages = await _run_turn(InnerVoiceMode.SEQUENTIAL, model)
+
+    tool_call_messages = [m for m in messages if isinstance(m, AIMessage) and m.tool_calls]
+    assert [len(m.tool_calls) for m in tool_call_messages] == [1, 1, 1]
+    assert model.calls == 7
+
+
+@pytest.mark.asyncio
+async def test_fan_out_mode_consults_all_voices_in_one_turn() -> None:
+    model = SimulatedCharacterModel()
+    messages = await _run_turn(InnerVoiceMode.FAN_OUT, model)
+
+    tool_call_messages = [m for m in messages if isinstance(m, AIMessage) and m.tool_calls]
+    assert len(tool_call_messages) == 1
+    assert {c["name"] for c in tool_call_messages[0].tool_calls} == {
+        "basic_self",
+        "emotional_self",
+        "social_self",
+    }
+    assert len([m for m in messages if isinstance(m, ToolMessage)]) == 3
+    assert isinstance(messages[-1], AIMessage) and not messages[-1].tool_calls
+    assert messages[-1].content
+    # One consultation turn, three concurrent inner voices and one synthesis call
+    assert model.calls == 5
+
+
+def test_complete_fan_out_adds_missing_voices() -> None:
+    response = AIMessage(
+        content="",
+        tool_calls=[{"name": "emotional_self", "args": {"message": "Hallo"}, "id": "call_1"}],
+    )
+    completed = _complete_fan_out(response)
+    assert [c["name"] for c in completed.tool_calls] == [
+        "emotional_self",
+        "basic_self",
+        "social_self",
+    ]
+    assert all(c["args"] == {"message": "Hallo"} for c in completed.tool_calls)
+    assert len({c["id"] for c in completed.tool_calls}) == 3
+
+    # Plain answers are left alone
+    answer = AIMessage(content="Hallo!")
+    assert _complete_fan_out(answer) is answer
+
+
+class AsyncOnlyModel(SimulatedCharacterModel):
+    def _generate(self, *args, **kwargs):
+        raise AssertionError("inner-voice tools must not block on model.invoke")
+
+
+@pytest.mark.asyncio
+async def test_inner_voice_tools_are_async() -> None:
+    model = AsyncOnlyModel()
+    tools = create_character_tools(get_character_prompts("frank"))
+    assert all(t.coroutine is not None for t in tools)
+
+    with patch("agents.character_agent.get_model", return_value=model):
+        for t in tools:
+            result = await t.ainvoke({"message": "Hallo"})
+            assert result.startswith("Als inneres Selbst")
+    assert model.calls == 3
+
+
+def test_character_prompt_bundles_are_precomputed_and_immutable() -> None:
+    frank = get_character_prompts("frank")
+    lisa = get_character_prompts("lisa")
+    assert frank is CHARACTER_PROMPTS["frank"]
+    assert "Frank Schulz" in frank.system and "Frank Schulz" in frank.social_self
+    assert "Lisa Schulz" in lisa.system and "Frank Schulz" not in lisa.basic_self
+    assert frank.system_prompt(fan_out=True) != frank.system_prompt()
+    assert lisa.inner_voice_prompt("emotional_self") is lisa.emotional_self
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        frank.name = "Lisa"  # type: ignore[misc]
+    with pytest.raises(TypeError):
+        CHARACTER_PROMPTS["frank"] = lisa  # type: ignore[index]
+    with pytest.raises(ValueError, match="Unknown character"):
+        get_character_prompts("maia")
+
+
+def test_model_runnable_is_cached_per_model_and_character() -> None:
+    model = FakeToolModel(responses=["Hallo"])
+    frank = get_character_prompts("frank")
+    runnable = get_model_runnable(model, frank)
+
+    assert get_model_runnable(model, frank) is runnable
+    assert get_model_runnable(model, get_character_prompts("lisa")) is not runnable
+    assert get_model_runnable(model, frank, fan_out=True) is not runnable
+    assert get_model_runnable(FakeToolModel(responses=["Hallo"]), frank) is not runnable
+
+
+def test_model_runnable_cache_is_bounded() -> None:
+    frank = get_character_prompts("frank")
+    models = [FakeToolModel(responses=["Hallo"]) for _ in range(3)]
+    cache = OrderedDict()
+    with (
+        patch("agents.character_agent._runnable_cache", cache),
+        patch("agents.character_agent.RUNNABLE_CACHE_SIZE", 2),
+    ):
+        first = get_model_runnable(models[0], frank)
+        get_model_runnable(models[1], frank)
+        get_model_runnable(models[0], frank)  # refresh, so models[1] is least recently used
+        get_model_runnable(models[2], frank)
+
+        assert len(cache) == 2
+        assert get_model_runnable(models[0], frank) is first
+        assert (id(models[1]), "frank", False) not in cache
+
+
+class CachedPrefixModel(SimulatedCharacterModel):
+    def _respond(self, messages):
+        response = super()._respond(messages)
+        response.usage_metadata = {
+            "input_tokens": 1200,
+            "output_tokens": 10,
+            "total_tokens": 1210,
+            "input_token_details": {"cache_read": 1000},
+        }
+        return response
+
+
+@pytest.mark.asyncio
+async def test_final_answer_reports_prompt_cache_usage_for_the_turn() -> None:
+    messages = await _run_turn(InnerVoiceMode.FAN_OUT, CachedPrefixModel())
+
+    tool_messages = [m for m in messages if isinstance(m, ToolMessage)]
+    assert all(m.artifact["prompt_cache"]["cached_tokens"] == 1000 for m in tool_messages)
+    # Consultation turn, three inner voices and the synthesis
+    assert messages[-1].response_metadata["prompt_cache"] == {
+        "input_tokens": 5 * 1200,
+        "cached_tokens": 5 * 1000,
+    }
+
+
+def test_prompts_share_the_background_prefix() -> None:
+    for prompts in CHARACTER_PROMPTS.values():
+        assert prompts.prefix.startswith(f"{prompts.name} hat folgenden Hintergrund:")
+        for prompt in (prompts.system, prompts.system_fan_out, prompts.basic_self):
+            assert prompt.startswith(prompts.prefix)
+
+
+@pytest.mark.asyncio
+async def test_inner_voice_tools_use_the_cache() -> None:
+    model = SimulatedCharacterModel()
+    tools = create_character_tools(get_character_prompts("frank"))
+    cache = InnerVoiceCache(max_entries=16, ttl_seconds=60)
+
+    with (
+        patch("agents.character_agent.get_model", return_value=model),
+        patch("agents.character_agent.get_inner_voice_cache", return_value=cache),
+    ):
+        for t in tools:
+            first = await t.ainvoke({"message": "Hallo Frank!"})
+            assert await t.ainvoke({"message": "hallo frank"}) == first
+    # Only the first call per inner voice reaches the model
+    assert model.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_inner_voice_tools_use_the_semantic_cache() -> None:
+    model = SimulatedCharacterModel()
+    tools = create_character_tools(get_character_prompts("frank"))
+    cache = SemanticInnerVoiceCache(threshold=0.7, max_entries=16)
+
+    with (
+        patch("agents.character_agent.get_model", return_value=model),
+        patch("agents.character_agent.get_semantic_inner_voice_cache", return_value=cache),
+    ):
+        for t in tools:
+            first = await t.ainvoke({"message": "Wie geht es dir heute?"})
+            assert await t.ainvoke({"message": "Wie geht's dir heute so?"}) == first
+    assert model.calls == 3
+
+
+class RecordingCharacterModel(SimulatedCharacterModel):
+    prompts: list = []
+
+    def _respond(self, messages):
+        self.prompts.append(messages[0].content)
+        return super()._respond(messages)
+
+
+@pytest.mark.asyncio
+async def test_council_mode_consults_all_voices_in_one_call() -> None:
+    model = RecordingCharacterModel(prompts=[])
+    graph = build_character_agent(checkpointer=MemorySaver())
+    # The default mode of the graph is sequential; council mode is picked per request
+    config = {
+        "configurable": {
+            **graph.character_config["configurable"],
+            "inner_voice_mode": "council",
+            "thread_id": str(uuid4()),
+        }
+    }
+    with patch("agents.character_agent.get_model", return_value=model):
+        result = await graph.ainvoke({"messages": [HumanMessage(content="Hallo Frank")]}, config)
+
+    messages = result["messages"]
+    assert [type(m) for m in messages] == [HumanMessage, AIMessage]
+    assert messages[-1].content and not messages[-1].tool_calls
+    assert set(result["inner_voices"]) == {"basic_self", "emotional_self", "social_self"}
+    # One structured-output call, then the answer with the inner voices in its prompt
+    assert model.calls == 2
+    assert "Innere Stimmen:\n- Grundlegendes Selbst: Als inneres Selbst" in model.prompts[1]
+
+
+@pytest.mark.asyncio
+async def test_small_talk_skips_the_inner_voices() -> None:
+    model = RecordingCharacterModel(prompts=[])
+    registry = MetricsRegistry()
+    graph = build_character_agent(checkpointer=MemorySaver())
+    config = {"configurable": {**graph.character_config["configurable"], "thread_id": str(uuid4())}}
+    with (
+        patch("agents.character_agent.get_model", return_value=model),
+        patch("agents.character_agent.metrics", registry),
+    ):
+        result = await graph.ainvoke({"messages": [HumanMessage(content="Danke!")]}, config)
+
+    assert result["turn_route"] == "trivial"
+    assert [type(m) for m in result["messages"]] == [HumanMessage, AIMessage]
+    assert model.calls == 1
+    assert "Smalltalk" in model.prompts[0]
+    assert registry.counter("character_turns_total", route="trivial") == 1
+    assert registry.snapshot()["summaries"]['character_turn_seconds{route="trivial"}']["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_inner_voices_use_the_inner_voice_model() -> None:
+    tools = create_character_tools(get_character_prompts("frank"))
+    config = {
+        "configurable": {
+            "model": "gpt-4o",
+            "inner_voice_model": "gpt-4o-mini",
+            "inner_voice_max_tokens": 100,
+        }
+    }
+    with patch(
+        "agents.character_agent.get_model", return_value=SimulatedCharacterModel()
+    ) as get_model:
+        await tools[0].ainvoke({"message": "Hallo"}, config)
+        get_model.assert_called_once_with("gpt-4o-mini", max_tokens=100)
+
+        # Without an override the inner voices follow the request's model
+        get_model.reset_mock()
+        await tools[0].ainvoke({"message": "Hallo"}, {"configurable": {"model": "gpt-4o"}})
+        get_model.assert_called_once_with("gpt-4o", max_tokens=None)
+
+
+class LongVoiceModel(SimulatedCharacterModel):
+    def _respond(self, messages):
+        response = super()._respond(messages)
+        if not response.tool_calls and "Aspekt von" in messages[0].content:
+            response.content = "Als inneres Selbst " + "denke ich nach. " * 30
+        return response
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compaction", ["drop", "collapse"])
+async def test_earlier_inner_voices_are_compacted(compaction: str) -> None:
+    graph = build_character_agent(
+        checkpointer=MemorySaver(), inner_voice_mode=InnerVoiceMode.FAN_OUT
+    )
+    config = {
+        "configurable": {
+            **graph.character_config["configurable"],
+            "inner_voice_compaction": compaction,
+            "thread_id": str(uuid4()),
+        }
+    }
+    with patch("agents.character_agent.get_model", return_value=LongVoiceModel()):
+        for content in ("Wie war dein Tag?", "Und morgen?"):
+            result = await graph.ainvoke({"messages": [HumanMessage(content=content)]}, config)
+
+    messages = result["messages"]
+    first_turn, current_turn = messages[:-6], messages[-6:]
+    # The current turn is untouched
+    assert [type(m) for m in current_turn] == [HumanMessage, AIMessage] + [ToolMessage] * 3 + [
+        AIMessage
+    ]
+    assert all(len(m.content) > 160 for m in current_turn if isinstance(m, ToolMessage))
+    if compaction == "drop":
+        assert [type(m) for m in first_turn] == [HumanMessage, AIMessage]
+    else:
+        tool_messages = [m for m in first_turn if isinstance(m, ToolMessage)]
+        assert len(tool_messages) == 3
+        assert all(m.content.endswith(" […]") and len(m.content) <= 165 for m in tool_messages)
+
+    # The checkpoint history still has every original inner-voice result
+    recovered = await arecover_inner_voices(graph, config)
+    assert len(recovered) == 6
+    assert all(len(m.content) > 160 for m in recovered)
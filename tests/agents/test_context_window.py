@@ -0,0 +1,92 @@
+from unittest.mock import patch
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from agents.context_window import (
+    add_counted_messages,
+    build_context,
+    context_budget,
+    fit_to_budget,
+    message_tokens,
+)
+from core.metrics import MetricsRegistry
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens():
+    # characters / 4 plus 4 tokens overhead per message, independent of tiktoken
+    with patch("agents.context_window._encoding", return_value=None):
+        yield
+
+
+def _history() -> list:
+    return [
+        HumanMessage(content="a" * 40, id="h1"),
+        AIMessage(content="b" * 40, id="a1"),
+        HumanMessage(content="c" * 40, id="h2"),
+        AIMessage(
+            content="",
+            id="a2",
+            tool_calls=[{"name": "t", "args": {}, "id": "call_1", "type": "tool_call"}],
+        ),
+        ToolMessage(content="d" * 40, tool_call_id="call_1", id="t1"),
+        AIMessage(content="e" * 40, id="a3"),
+    ]
+
+
+def test_token_count_is_stored_when_a_message_is_added() -> None:
+    messages = add_counted_messages([], [HumanMessage(content="a" * 40)])
+    assert messages[0].response_metadata["token_count"] == 14
+
+    messages[0].response_metadata["token_count"] = 99  # never recomputed
+    assert message_tokens(messages[0]) == 99
+
+
+def test_fit_to_budget_keeps_recent_messages() -> None:
+    history = _history()
+    window, saved = fit_to_budget(history, budget=1000)
+    assert window == history and saved == 0
+
+    window, saved = fit_to_budget(history, budget=14 * 4)
+    assert [m.id for m in window] == ["h2", "a2", "t1", "a3"]
+    assert saved == 28
+
+
+def test_fit_to_budget_keeps_tool_calls_with_their_results() -> None:
+    history = _history()
+    # Room for the last answer and the tool result, but not for the tool call
+    window, _ = fit_to_budget(history, budget=30)
+    assert [m.id for m in window] == ["a3"]
+    # The latest block is kept even if it exceeds the budget
+    window, saved = fit_to_budget(history, budget=0)
+    assert [m.id for m in window] == ["a3"]
+    assert saved == sum(message_tokens(m) for m in history[:-1])
+
+
+def test_fit_to_budget_starts_at_a_user_message() -> None:
+    window, _ = fit_to_budget(_history(), budget=14 * 5)
+    assert [m.id for m in window] == ["h2", "a2", "t1", "a3"]
+
+
+def test_build_context_reports_tokens_saved() -> None:
+    registry = MetricsRegistry()
+    system = SystemMessage(content="s" * 40)
+    config = {"configurable": {"context_token_budget": 14 * 5}}
+    with patch("agents.context_window.metrics", registry):
+        messages = build_context(system, _history(), config, agent="test")
+
+    assert messages[0] is system
+    assert [m.id for m in messages[1:]] == ["h2", "a2", "t1", "a3"]
+    summary = registry.snapshot()["summaries"]['context_tokens_saved{agent="test"}']
+    assert summary == {"count": 1, "sum": 28, "mean": 28, "max": 28}
+
+
+def test_context_budget_precedence() -> None:
+    with patch("agents.context_window.settings") as settings:
+        settings.CONTEXT_TOKEN_BUDGET = 1000
+        settings.CONTEXT_TOKEN_BUDGETS = {"gpt-4o-mini": 500}
+        assert context_budget({"configurable": {"model": "gpt-4o"}}) == 1000
+        assert context_budget({"configurable": {"model": "gpt-4o-mini"}}) == 500
+        config = {"configurable": {"model": "gpt-4o-mini", "context_token_budget": 200}}
+        assert context_budget(config) == 200
@@ -0,0 +1,100 @@
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from agents.character_agent import InnerVoiceMode, build_character_agent
+from agents.conversation_summary import asummarize_conversation, messages_after, split_turns
+from benchmarks.simulated import SimulatedCharacterModel
+from core import settings
+
+
+def test_split_turns_and_messages_after() -> None:
+    messages = [
+        HumanMessage(content="a", id="1"),
+        AIMessage(content="b", id="2"),
+        HumanMessage(content="c", id="3"),
+        AIMessage(content="d", id="4"),
+    ]
+    assert [[m.id for m in turn] for turn in split_turns(messages)] == [["1", "2"], ["3", "4"]]
+    assert [m.id for m in messages_after(messages, "2")] == ["3", "4"]
+    assert messages_after(messages, "unknown") == messages
+
+
+class RecordingModel(SimulatedCharacterModel):
+    prompts: list = []
+
+    def _respond(self, messages):
+        self.prompts.append(messages)
+        return super()._respond(messages)
+
+
+@pytest.mark.asyncio
+async def test_older_turns_are_folded_into_the_summary_after_the_run() -> None:
+    model = RecordingModel(prompts=[])
+    graph = build_character_agent(
+        checkpointer=MemorySaver(), inner_voice_mode=InnerVoiceMode.FAN_OUT
+    )
+    config = {"configurable": {**graph.character_config["configurable"], "thread_id": str(uuid4())}}
+    with (
+        patch("agents.character_agent.get_model", return_value=model),
+        patch("agents.conversation_summary.get_model", return_value=model),
+        patch.object(settings, "CONVERSATION_SUMMARY_ENABLED", True),
+        patch.object(settings, "CONVERSATION_SUMMARY_KEEP_TURNS", 2),
+        patch.object(settings, "CONVERSATION_SUMMARY_BATCH_TURNS", 2),
+    ):
+        for turn in range(3):
+            await graph.ainvoke({"messages": [HumanMessage(content=f"Frage {turn}")]}, config)
+            await graph.after_run(graph, config)
+        # Not enough turns yet
+        assert "summary" not in (await graph.aget_state(config)).values
+
+        await graph.ainvoke({"messages": [HumanMessage(content="Frage 3")]}, config)
+        await graph.after_run(graph, config)
+        state = (await graph.aget_state(config)).values
+        assert state["summary"].startswith("Der Nutzer")
+        # The first two turns were folded in
+        first_kept = messages_after(state["messages"], state["summarized_through"])[0]
+        assert first_kept.content == "Frage 2"
+
+        model.prompts.clear()
+        await graph.ainvoke({"messages": [HumanMessage(content="Frage 4")]}, config)
+
+    # The model sees the summary and only the turns after it
+    system, *history = model.prompts[0]
+    assert "Zusammenfassung des bisherigen Gesprächs:\nDer Nutzer" in system.content
+    assert [m.content for m in history if isinstance(m, HumanMessage)] == [
+        "Frage 2",
+        "Frage 3",
+        "Frage 4",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_summary_is_dropped_if_the_thread_moved_on() -> None:
+    model = RecordingModel(prompts=[])
+    graph = build_character_agent(
+        checkpointer=MemorySaver(), inner_voice_mode=InnerVoiceMode.FAN_OUT
+    )
+    config = {"configurable": {**graph.character_config["configurable"], "thread_id": str(uuid4())}}
+
+    async def next_run_meanwhile(summary, messages, config) -> str:
+        await graph.ainvoke({"messages": [HumanMessage(content="Frage 4")]}, config)
+        return "Der Nutzer fragt viel."
+
+    with (
+        patch("agents.character_agent.get_model", return_value=model),
+        patch("agents.conversation_summary.asummarize", side_effect=next_run_meanwhile),
+        patch.object(settings, "CONVERSATION_SUMMARY_ENABLED", True),
+        patch.object(settings, "CONVERSATION_SUMMARY_KEEP_TURNS", 2),
+        patch.object(settings, "CONVERSATION_SUMMARY_BATCH_TURNS", 2),
+    ):
+        for turn in range(4):
+            await graph.ainvoke({"messages": [HumanMessage(content=f"Frage {turn}")]}, config)
+        await asummarize_conversation(graph, config)
+
+    state = (await graph.aget_state(config)).values
+    assert "summary" not in state
+    assert [m.content for m in state["messages"] if isinstance(m, HumanMessage)][-1] == "Frage 4"
@@ -0,0 +1,81 @@
+import time
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+from langchain_core.messages import HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from agents.character_agent import InnerVoiceMode, build_character_agent
+from agents.deadline import deadline_model, remaining_ms
+from benchmarks.simulated import SimulatedCharacterModel
+from core import settings
+from schema.models import OpenAIModelName
+
+
+async def _run(mode: InnerVoiceMode, model, budget_ms: float | None) -> list:
+    graph = build_character_agent(checkpointer=MemorySaver(), inner_voice_mode=mode)
+    configurable = {**graph.character_config["configurable"], "thread_id": str(uuid4())}
+    if budget_ms is not None:
+        configurable["deadline"] = time.time() + budget_ms / 1000
+    with (
+        patch("agents.character_agent.get_model", return_value=model),
+        patch.object(settings, "CONVERSATION_SUMMARY_ENABLED", False),
+    ):
+        result = await graph.ainvoke(
+            {"messages": [HumanMessage(content="Wie war dein Tag?")]},
+            {"configurable": configurable},
+        )
+    return result["messages"]
+
+
+def test_fast_model_below_its_threshold() -> None:
+    config = {"configurable": {"deadline": time.time() + 1}}
+    assert 0 < remaining_ms(config) <= 1000
+    assert remaining_ms({"configurable": {}}) is None
+    with patch.object(settings, "DEADLINE_FAST_MODEL", OpenAIModelName.GPT_4O_MINI):
+        assert deadline_model(OpenAIModelName.GPT_4O, config) == (
+            OpenAIModelName.GPT_4O_MINI,
+            True,
+        )
+        assert deadline_model(OpenAIModelName.GPT_4O, {"configurable": {}}) == (
+            OpenAIModelName.GPT_4O,
+            False,
+        )
+
+
+@pytest.mark.asyncio
+async def test_ample_budget_reports_no_degradations() -> None:
+    model = SimulatedCharacterModel()
+    messages = await _run(InnerVoiceMode.FAN_OUT, model, budget_ms=60_000)
+    assert messages[-1].response_metadata["degradations"] == []
+    assert model.calls == 5
+
+    # Without a deadline there is nothing to report
+    messages = await _run(InnerVoiceMode.FAN_OUT, SimulatedCharacterModel(), budget_ms=None)
+    assert "degradations" not in messages[-1].response_metadata
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", list(InnerVoiceMode))
+async def test_short_budget_skips_the_inner_voices(mode: InnerVoiceMode) -> None:
+    model = SimulatedCharacterModel()
+    messages = await _run(mode, model, budget_ms=1000)
+    assert messages[-1].response_metadata["degradations"] == ["skip_inner_voices"]
+    assert not any(isinstance(m, ToolMessage) for m in messages)
+    # Only the answer
+    assert model.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_running_out_of_budget_cuts_the_tool_loop() -> None:
+    model = SimulatedCharacterModel(latency=0.2)
+    with (
+        patch.object(settings, "DEADLINE_INNER_VOICES_MS", 0),
+        patch.object(settings, "DEADLINE_TOOL_LOOP_MS", 900),
+    ):
+        messages = await _run(InnerVoiceMode.SEQUENTIAL, model, budget_ms=1000)
+    # One inner voice, then the answer instead of the next voice
+    assert [m.name for m in messages if isinstance(m, ToolMessage)] == ["basic_self"]
+    assert messages[-1].response_metadata["degradations"] == ["cut_tool_loop"]
+    assert messages[-1].content
@@ -0,0 +1,95 @@
+from unittest.mock import patch
+
+import pytest
+
+from agents.inner_voice_cache import InnerVoiceCache, SemanticInnerVoiceCache, normalize_message
+from core.metrics import MetricsRegistry
+
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry()
+    with patch("agents.inner_voice_cache.metrics", registry):
+        yield registry
+
+
+def test_normalize_message() -> None:
+    assert normalize_message("  Hallo   Frank! ") == "hallo frank"
+    assert normalize_message("HALLO FRANK?") == normalize_message("hallo frank")
+
+
+def test_key_uses_character_voice_model_and_normalized_message() -> None:
+    key = InnerVoiceCache.make_key("frank", "basic_self", "gpt-4o", "Hallo Frank!")
+    assert key == InnerVoiceCache.make_key("frank", "basic_self", "gpt-4o", "hallo frank")
+    assert key != InnerVoiceCache.make_key("lisa", "basic_self", "gpt-4o", "Hallo Frank!")
+    assert key != InnerVoiceCache.make_key("frank", "social_self", "gpt-4o", "Hallo Frank!")
+    assert key != InnerVoiceCache.make_key("frank", "basic_self", "gpt-4o-mini", "Hallo Frank!")
+
+
+@pytest.mark.asyncio
+async def test_memory_tier_lru_and_ttl(registry) -> None:
+    cache = InnerVoiceCache(max_entries=2, ttl_seconds=60)
+    await cache.aput("a", "A")
+    await cache.aput("b", "B")
+    assert await cache.aget("a") == "A"
+    await cache.aput("c", "C")  # evicts "b", the least recently used
+
+    assert await cache.aget("b") is None
+    assert await cache.aget("c") == "C"
+    assert registry.counter("inner_voice_cache_hits_total", tier="memory") == 2
+    assert registry.counter("inner_voice_cache_misses_total") == 1
+    assert (
+        registry.counter("inner_voice_cache_evictions_total", tier="memory", reason="capacity") == 1
+    )
+
+    with patch("agents.inner_voice_cache.time.monotonic", return_value=10**9):
+        assert await cache.aget("c") is None
+    assert registry.counter("inner_voice_cache_evictions_total", tier="memory", reason="ttl") == 1
+
+
+@pytest.mark.asyncio
+async def test_sqlite_tier_is_shared_between_caches(tmp_path, registry) -> None:
+    path = str(tmp_path / "inner_voice_cache.db")
+    worker_a = InnerVoiceCache(max_entries=2, ttl_seconds=60, sqlite_path=path)
+    worker_b = InnerVoiceCache(max_entries=2, ttl_seconds=60, sqlite_path=path)
+
+    await worker_a.aput("a", "A")
+    assert await worker_b.aget("a") == "A"
+    assert registry.counter("inner_voice_cache_hits_total", tier="sqlite") == 1
+    # Promoted into the memory tier of worker_b
+    assert await worker_b.aget("a") == "A"
+    assert registry.counter("inner_voice_cache_hits_total", tier="memory") == 1
+
+    await worker_a.aput("b", "B")
+    await worker_a.aput("c", "C")
+    assert (
+        registry.counter("inner_voice_cache_evictions_total", tier="sqlite", reason="capacity") == 1
+    )
+
+
+def test_semantic_cache_reuses_similar_messages(registry) -> None:
+    cache = SemanticInnerVoiceCache(threshold=0.7, max_entries=16)
+    cache.add("frank", "basic_self", "gpt-4o", "Wie geht es dir heute?", "Gut.")
+
+    assert cache.lookup("frank", "basic_self", "gpt-4o", "wie geht es dir heute") == "Gut."
+    assert cache.lookup("frank", "basic_self", "gpt-4o", "Wie geht's dir heute so?") == "Gut."
+    assert cache.lookup("frank", "basic_self", "gpt-4o", "Was kostet das Auto?") is None
+    # Partitions are separate per character, voice and model
+    assert cache.lookup("lisa", "basic_self", "gpt-4o", "Wie geht es dir heute?") is None
+    assert cache.lookup("frank", "social_self", "gpt-4o", "Wie geht es dir heute?") is None
+    assert registry.counter("inner_voice_cache_hits_total", tier="semantic") == 2
+    assert registry.counter("inner_voice_cache_misses_total", tier="semantic") == 3
+
+
+def test_semantic_cache_is_bounded(registry) -> None:
+    cache = SemanticInnerVoiceCache(threshold=0.99, max_entries=2)
+    for i, message in enumerate(["eins", "zwei", "drei"]):
+        cache.add("frank", "basic_self", "gpt-4o", message, str(i))
+
+    assert len(cache.partition("frank", "basic_self", "gpt-4o")) == 2
+    assert cache.lookup("frank", "basic_self", "gpt-4o", "eins") is None
+    assert cache.lookup("frank", "basic_self", "gpt-4o", "drei") == "2"
+    assert (
+        registry.counter("inner_voice_cache_evictions_total", tier="semantic", reason="capacity")
+        == 1
+    )
@@ -0,0 +1,64 @@
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+from langchain_core.messages import HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from agents.character_agent import InnerVoiceMode, build_character_agent
+from agents.inner_voice_reuse import fingerprint, reusable_voices, update_results
+from benchmarks.simulated import SimulatedCharacterModel
+from core import settings
+
+TOPIC = "Mein Chef hat mich heute vor allen Kollegen kritisiert."
+FOLLOW_UP = "Soll ich mit meinem Chef über die Kritik reden?"
+OTHER_TOPIC = "Was hältst du von Hunden?"
+
+
+def test_results_are_reused_on_the_same_topic_until_stale() -> None:
+    results = update_results(None, {"basic_self": "a", "social_self": "c"}, [], TOPIC)
+    assert results["basic_self"]["fingerprint"] == fingerprint(TOPIC)
+
+    assert reusable_voices(results, FOLLOW_UP, limit=1) == {"basic_self": "a", "social_self": "c"}
+    assert reusable_voices(results, OTHER_TOPIC, limit=1) == {}
+
+    # After one reuse, basic_self is stale; the freshly consulted social_self is not
+    results = update_results(results, {"social_self": "c2"}, ["basic_self"], FOLLOW_UP)
+    assert reusable_voices(results, FOLLOW_UP, limit=1) == {"social_self": "c2"}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", [InnerVoiceMode.FAN_OUT, InnerVoiceMode.COUNCIL])
+async def test_follow_up_reuses_the_inner_voices(mode: InnerVoiceMode) -> None:
+    model = SimulatedCharacterModel()
+    graph = build_character_agent(checkpointer=MemorySaver(), inner_voice_mode=mode)
+    config = {
+        "configurable": {
+            **graph.character_config["configurable"],
+            "thread_id": str(uuid4()),
+            "inner_voice_reuse_turns": 1,
+        }
+    }
+    calls = []
+    with (
+        patch("agents.character_agent.get_model", return_value=model),
+        patch.object(settings, "CONVERSATION_SUMMARY_ENABLED", False),
+    ):
+        for message in [TOPIC, FOLLOW_UP, FOLLOW_UP, OTHER_TOPIC]:
+            before = model.calls
+            result = await graph.ainvoke({"messages": [HumanMessage(content=message)]}, config)
+            calls.append(model.calls - before)
+
+    if mode == InnerVoiceMode.FAN_OUT:
+        # Consultation turn, three inner voices and the answer; only the two model turns on reuse
+        assert calls == [5, 2, 5, 5]
+        reused = [
+            m
+            for m in result["messages"]
+            if isinstance(m, ToolMessage) and m.artifact == {"inner_voice_reuse": "hit"}
+        ]
+        assert len(reused) == 3
+    else:
+        # Council and answer; only the answer on reuse
+        assert calls == [2, 1, 2, 2]
+    assert set(result["inner_voice_results"]) == {"basic_self", "emotional_self", "social_self"}
@@ -0,0 +1,110 @@
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+from langchain_core.messages import HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from agents.character_agent import InnerVoiceMode, build_character_agent
+from agents.inner_voice_speculation import InnerVoiceSpeculation
+from benchmarks.simulated import SimulatedCharacterModel
+from core import settings
+from core.metrics import MetricsRegistry
+
+RESPONSES = {"basic_self": "a", "emotional_self": "b", "social_self": "c"}
+TOPIC = "Mein Chef hat mich heute vor allen Kollegen kritisiert."
+
+
+def test_similar_message_claims_the_speculation() -> None:
+    registry = MetricsRegistry()
+    speculation = InnerVoiceSpeculation(threshold=0.3, ttl_seconds=60, max_threads=8)
+    with patch("agents.inner_voice_speculation.metrics", registry):
+        speculation.put("t1", "gpt-4o-mini", TOPIC, RESPONSES, calls=3)
+        assert speculation.claim(
+            "t1", "gpt-4o-mini", "Soll ich mit meinem Chef über die Kritik reden?"
+        )
+        assert speculation.use("t1", "emotional_self") == "b"
+        # A speculation is claimed once
+        assert not speculation.claim("t1", "gpt-4o-mini", TOPIC)
+        assert speculation.use("t1", "emotional_self") is None
+
+    assert registry.counter("inner_voice_speculations_total", outcome="hit") == 1
+    assert registry.counter("inner_voice_speculation_calls_total") == 3
+
+
+def test_other_topic_model_or_age_discards_the_speculation() -> None:
+    registry = MetricsRegistry()
+    speculation = InnerVoiceSpeculation(threshold=0.3, ttl_seconds=60, max_threads=8)
+    with patch("agents.inner_voice_speculation.metrics", registry):
+        speculation.put("t1", "gpt-4o-mini", TOPIC, RESPONSES, calls=3)
+        assert not speculation.claim("t1", "gpt-4o-mini", "Was hältst du von Hunden?")
+        speculation.put("t1", "gpt-4o-mini", TOPIC, RESPONSES, calls=3)
+        assert not speculation.claim("t1", "gpt-4o", TOPIC)
+        speculation.put("t1", "gpt-4o-mini", TOPIC, RESPONSES, calls=3)
+        with patch("agents.inner_voice_speculation.time.monotonic", return_value=1e12):
+            assert not speculation.claim("t1", "gpt-4o-mini", TOPIC)
+
+    assert registry.counter("inner_voice_speculations_total", outcome="miss") == 2
+    assert registry.counter("inner_voice_speculations_total", outcome="expired") == 1
+    assert registry.counter("inner_voice_speculation_wasted_calls_total") == 9
+
+
+def test_speculation_is_bounded() -> None:
+    speculation = InnerVoiceSpeculation(threshold=0.3, ttl_seconds=60, max_threads=2)
+    for thread_id in ["t1", "t2", "t3"]:
+        speculation.put(thread_id, "m", TOPIC, RESPONSES, calls=3)
+    assert not speculation.claim("t1", "m", TOPIC)
+    assert speculation.claim("t3", "m", TOPIC)
+
+
+@pytest.mark.asyncio
+async def test_follow_up_uses_the_speculative_inner_voices() -> None:
+    model = SimulatedCharacterModel()
+    speculation = InnerVoiceSpeculation(threshold=0.3, ttl_seconds=60, max_threads=8)
+    graph = build_character_agent(
+        checkpointer=MemorySaver(), inner_voice_mode=InnerVoiceMode.COUNCIL
+    )
+    config = {"configurable": {**graph.character_config["configurable"], "thread_id": str(uuid4())}}
+    with (
+        patch("agents.character_agent.get_model", return_value=model),
+        patch("agents.character_agent.get_inner_voice_speculation", return_value=speculation),
+        patch.object(settings, "CONVERSATION_SUMMARY_ENABLED", False),
+    ):
+        first = await graph.ainvoke({"messages": [HumanMessage(content=TOPIC)]}, config)
+        # Council and answer
+        assert model.calls == 2
+        await graph.after_run(graph, config)
+        # The council's responses are kept without further calls
+        assert model.calls == 2
+
+        follow_up = "Soll ich mit meinem Chef über die Kritik reden?"
+        result = await graph.ainvoke({"messages": [HumanMessage(content=follow_up)]}, config)
+    # Only the answer; the council of the turn before is used again
+    assert model.calls == 3
+    assert result["inner_voices"] == first["inner_voices"]
+
+
+@pytest.mark.asyncio
+async def test_inner_voice_tool_results_are_kept_for_the_follow_up() -> None:
+    model = SimulatedCharacterModel()
+    speculation = InnerVoiceSpeculation(threshold=0.3, ttl_seconds=60, max_threads=8)
+    graph = build_character_agent(
+        checkpointer=MemorySaver(), inner_voice_mode=InnerVoiceMode.FAN_OUT
+    )
+    config = {"configurable": {**graph.character_config["configurable"], "thread_id": str(uuid4())}}
+    with (
+        patch("agents.character_agent.get_model", return_value=model),
+        patch("agents.character_agent.get_inner_voice_speculation", return_value=speculation),
+        patch.object(settings, "CONVERSATION_SUMMARY_ENABLED", False),
+    ):
+        await graph.ainvoke({"messages": [HumanMessage(content=TOPIC)]}, config)
+        calls = model.calls
+        await graph.after_run(graph, config)
+        assert model.calls == calls
+
+        follow_up = "Soll ich mit meinem Chef über die Kritik reden?"
+        result = await graph.ainvoke({"messages": [HumanMessage(content=follow_up)]}, config)
+    turn = result["messages"][[m.content for m in result["messages"]].index(follow_up) + 1 :]
+    tool_messages = [m for m in turn if isinstance(m, ToolMessage)]
+    assert tool_messages
+    assert all(m.artifact == {"inner_voice_speculation": "hit"} for m in tool_messages)
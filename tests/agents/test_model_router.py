@@ -0,0 +1,84 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+
+from agents.model_router import (
+    Complexity,
+    ComplexityClassification,
+    aroute_model,
+    classify_complexity_heuristic,
+    record_routed_turn,
+)
+from core import metrics, settings
+from schema.models import AutoModelName, OpenAIModelName
+
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        ("Danke!", Complexity.SIMPLE),
+        ("Wie heißt deine Katze?", Complexity.SIMPLE),
+        ("Warum hast du damals die Stelle gewechselt? Erkläre es mir.", Complexity.COMPLEX),
+        ("Kannst du mir das ansehen?\n```\nprint(1)\n```", Complexity.COMPLEX),
+        ("wort " * 150, Complexity.COMPLEX),
+        ("Warum bist du heute so gut gelaunt, ist etwas Schönes passiert?", None),
+        ("Gehen wir heute Abend zusammen essen?", Complexity.SIMPLE),
+        ("Fasse unser Gespräch zusammen und erkläre deine Entscheidung.", Complexity.COMPLEX),
+        ("Warum ist das so? Kannst du es zusammenfassen?", Complexity.COMPLEX),
+    ],
+)
+def test_heuristic(message: str, expected: Complexity | None) -> None:
+    assert classify_complexity_heuristic(message) == expected
+
+
+@pytest.mark.asyncio
+async def test_routes_tiers_and_falls_back_to_default_model() -> None:
+    routes = {"simple": OpenAIModelName.GPT_4O_MINI, "complex": AutoModelName.AUTO}
+    with patch.object(settings, "MODEL_ROUTES", routes):
+        assert await aroute_model("Danke!") == (Complexity.SIMPLE, OpenAIModelName.GPT_4O_MINI)
+        # No route, and "auto" is no usable route
+        unclear = "Warum bist du heute so gut gelaunt, ist etwas Schönes passiert?"
+        assert await aroute_model(unclear) == (Complexity.MODERATE, settings.DEFAULT_MODEL)
+        assert await aroute_model("Erkläre und vergleiche beides.") == (
+            Complexity.COMPLEX,
+            settings.DEFAULT_MODEL,
+        )
+
+
+@pytest.mark.asyncio
+async def test_escalates_unclear_messages_to_the_classifier_model() -> None:
+    model = MagicMock()
+    structured = model.with_structured_output.return_value
+    structured.ainvoke = AsyncMock(
+        return_value=ComplexityClassification(complexity=Complexity.COMPLEX)
+    )
+    escalations = metrics.counter("model_router_escalations_total")
+    with (
+        patch.object(settings, "MODEL_ROUTER_MODEL", OpenAIModelName.GPT_4O_MINI),
+        patch("agents.model_router.get_model", return_value=model),
+    ):
+        complexity, _ = await aroute_model(
+            "Was hältst du eigentlich von meinem neuen Plan, nächstes Jahr nach Lissabon zu ziehen?"
+        )
+        assert complexity == Complexity.COMPLEX
+        # Clear cases never reach the model
+        await aroute_model("Danke!")
+    structured.ainvoke.assert_awaited_once()
+    assert metrics.counter("model_router_escalations_total") == escalations + 1
+
+
+def test_records_turn_tokens() -> None:
+    messages = [
+        AIMessage(
+            content="",
+            usage_metadata={"input_tokens": 10, "output_tokens": 5, "total_tokens": 15},
+        ),
+        ToolMessage(content="42", tool_call_id="1"),
+        AIMessage(content="42"),
+    ]
+    metrics.reset()
+    record_routed_turn("complex", 0.5, messages)
+    summaries = metrics.snapshot()["summaries"]
+    assert summaries['model_router_turn_tokens{complexity="complex"}']["sum"] == 15
+    assert summaries['model_router_turn_seconds{complexity="complex"}']["sum"] == 0.5
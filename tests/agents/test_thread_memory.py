@@ -0,0 +1,105 @@
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from agents.character_agent import InnerVoiceMode, build_character_agent
+from agents.thread_memory import aindex_turns, arecall_turns, recall
+from benchmarks.simulated import SimulatedCharacterModel
+from core import settings
+from memory import get_thread_memory_store
+from memory.sqlite import SqliteThreadMemoryStore
+
+
+def _turns(*topics: str) -> list:
+    messages = []
+    for i, topic in enumerate(topics):
+        messages.append(HumanMessage(content=f"Erzähl mir von {topic}", id=f"h{i}"))
+        messages.append(
+            AIMessage(
+                content="",
+                id=f"t{i}",
+                tool_calls=[{"name": "basic_self", "args": {}, "id": f"call_{i}"}],
+            )
+        )
+        messages.append(AIMessage(content=f"{topic} ist mir wichtig", id=f"a{i}"))
+    return messages
+
+
+@pytest.mark.asyncio
+async def test_index_turns_only_indexes_completed_turns(tmp_path) -> None:
+    async with SqliteThreadMemoryStore.from_conn_string(str(tmp_path / "memory.db")) as store:
+        await store.setup()
+        with patch("agents.thread_memory.get_thread_memory_store", return_value=store):
+            messages = _turns("Urlaub", "Arbeit", "Familie")
+            assert await aindex_turns(messages, None, "t1") == "h1"
+            # Nothing new to index until the next turn starts
+            memory = {"indexed_through": "h1"}
+            assert await aindex_turns(messages, memory, "t1") is None
+
+            messages = _turns("Urlaub", "Arbeit", "Familie", "Sport")
+            assert await aindex_turns(messages, memory, "t1") == "h2"
+            # A lost last turn offers everything again, the store keeps one row per turn
+            assert await aindex_turns(messages, {"indexed_through": "gone"}, "t1") == "h2"
+            embeddings = await store.aembeddings("t1")
+            assert sorted(embeddings) == ["h0", "h1", "h2"]
+            assert all(len(embedding) == 256 * 4 for embedding in embeddings.values())
+            assert await store.aembeddings("t2") == {}
+
+
+@pytest.mark.asyncio
+async def test_recall_returns_relevant_older_turns_and_recent_turns() -> None:
+    messages = [
+        *_turns("Urlaub am Meer", "Arbeit im Büro", "Fußball", "Kochen", "Musik"),
+        HumanMessage(content="Wie war noch mal dein Urlaub am Meer?", id="q"),
+    ]
+    thread_id = str(uuid4())
+    await aindex_turns(messages, None, thread_id)
+    recalled_ids = await arecall_turns(messages, thread_id, recent_turns=2, top_k=1)
+    assert recalled_ids == ["h0"]
+    recalled = recall(messages, {"recalled": recalled_ids}, recent_turns=2)
+    # The recalled turn has no tool calls, the recent turns are complete
+    assert [m.id for m in recalled] == ["h0", "a0", "h4", "t4", "a4", "q"]
+
+    # Without recalled turns only the recent turns are sent
+    assert [m.id for m in recall(messages, None, recent_turns=1)] == ["q"]
+
+
+@pytest.mark.asyncio
+async def test_character_agent_recalls_from_thread_memory() -> None:
+    prompts = []
+
+    class RecordingModel(SimulatedCharacterModel):
+        def _respond(self, messages):
+            prompts.append(messages)
+            return super()._respond(messages)
+
+    graph = build_character_agent(
+        checkpointer=MemorySaver(), inner_voice_mode=InnerVoiceMode.COUNCIL
+    )
+    config = {
+        "configurable": {
+            **graph.character_config["configurable"],
+            "thread_id": str(uuid4()),
+            "thread_memory": True,
+        }
+    }
+    questions = ["Ich war im Urlaub am Meer", "Mein Chef nervt", "Was gibt es zu essen"]
+    with (
+        patch("agents.character_agent.get_model", return_value=RecordingModel()),
+        patch.object(settings, "CONVERSATION_SUMMARY_ENABLED", False),
+        patch.object(settings, "THREAD_MEMORY_RECENT_TURNS", 1),
+        patch.object(settings, "THREAD_MEMORY_TOP_K", 1),
+    ):
+        for question in [*questions, "Erzähl noch mal vom Urlaub am Meer"]:
+            await graph.ainvoke({"messages": [HumanMessage(content=question)]}, config)
+
+    state = (await graph.aget_state(config)).values
+    # The state only points into the store, which has the three completed turns
+    assert set(state["thread_memory"]) == {"indexed_through", "recalled"}
+    embeddings = await get_thread_memory_store().aembeddings(config["configurable"]["thread_id"])
+    assert len(embeddings) == 3
+    sent = [m.content for m in prompts[-1] if isinstance(m, HumanMessage)]
+    assert sent == ["Ich war im Urlaub am Meer", "Erzähl noch mal vom Urlaub am Meer"]
@@ -0,0 +1,51 @@
+from unittest.mock import Mock, patch
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from agents.turn_classifier import (
+    TurnClassification,
+    TurnRoute,
+    aclassify_turn,
+    classify_heuristic,
+)
+from core.metrics import MetricsRegistry
+
+
+@pytest.mark.parametrize("message", ["ok", "Danke!", "  Vielen Dank. ", "Hallo", "👍", "thx"])
+def test_heuristic_small_talk(message: str) -> None:
+    assert classify_heuristic(message) == TurnRoute.TRIVIAL
+
+
+@pytest.mark.parametrize(
+    "message", ["Hallo Frank, wie war dein Tag?", "ok?", "Danke, aber warum?", "Ich bin traurig"]
+)
+def test_heuristic_substantive(message: str) -> None:
+    assert classify_heuristic(message) == TurnRoute.SUBSTANTIVE
+
+
+@pytest.mark.parametrize("message", ["ja", "Nein.", "bitte", "👍"])
+def test_heuristic_answers_to_questions_are_substantive(message: str) -> None:
+    assert classify_heuristic(message, "Ich war heute im Wald.") == TurnRoute.TRIVIAL
+    assert classify_heuristic(message, "Kommst du mit?") == TurnRoute.SUBSTANTIVE
+
+
+@pytest.mark.asyncio
+async def test_classifier_is_selected_per_request() -> None:
+    registry = MetricsRegistry()
+    model = Mock()
+    model.with_structured_output.return_value = RunnableLambda(
+        lambda _: TurnClassification(trivial=True)
+    )
+    with (
+        patch("agents.turn_classifier.metrics", registry),
+        patch("agents.turn_classifier.get_model", return_value=model),
+    ):
+        off = {"configurable": {"turn_classifier": "off"}}
+        assert await aclassify_turn("danke", off) == TurnRoute.SUBSTANTIVE
+        small_model = {"configurable": {"turn_classifier": "model"}}
+        assert await aclassify_turn("Ich bin traurig", small_model) == TurnRoute.TRIVIAL
+
+    summaries = registry.snapshot()["summaries"]
+    assert summaries['character_turn_classifier_seconds{classifier="off"}']["count"] == 1
+    assert summaries['character_turn_classifier_seconds{classifier="model"}']["count"] == 1
@@ -6,7 +6,14 @@ import pytest
 from httpx import Request, Response
 
 from client import AgentClient, AgentClientError
-from schema import AgentInfo, ChatHistory, ChatMessage, ServiceMetadata
+from schema import (
+    AgentInfo,
+    BatchInvokeResult,
+    ChatHistory,
+    ChatMessage,
+    ServiceMetadata,
+    UserInput,
+)
 from schema.models import OpenAIModelName
 
 
@@ -332,3 +339,57 @@ def test_info(agent_client):
     with pytest.raises(AgentClientError) as exc:
         agent_client.invoke("test")
     assert "No agent selected. Use update_agent() to select an agent." in str(exc.value)
+
+
+@pytest.mark.asyncio
+async def test_ainvoke_batch(agent_client):
+    """Test batch invoke results, including failed inputs."""
+    lines = [
+        BatchInvokeResult(index=1, output=ChatMessage(type="ai", content="Two")).model_dump_json(),
+        BatchInvokeResult(index=0, status_code=500, error="Unexpected error").model_dump_json(),
+    ]
+
+    async def async_lines():
+        for line in lines:
+            yield line
+
+    mock_response = AsyncMock()
+    mock_response.status_code = 200
+    mock_response.request = Request("POST", "http://test/invoke/batch")
+    mock_response.aiter_lines = Mock(return_value=async_lines())
+    mock_response.raise_for_status = Mock()
+    mock_response.__aenter__ = AsyncMock(return_value=mock_response)
+
+    mock_client = AsyncMock()
+    mock_client.__aenter__.return_value = mock_client
+    mock_client.stream = Mock(return_value=mock_response)
+
+    inputs = [UserInput(message="One"), UserInput(message="Two")]
+    with patch("httpx.AsyncClient", return_value=mock_client):
+        results = [result async for result in agent_client.ainvoke_batch(inputs, 2)]
+
+    assert [result.index for result in results] == [1, 0]
+    assert results[0].output.content == "Two"
+    assert results[1].error == "Unexpected error"
+    kwargs = mock_client.stream.call_args.kwargs
+    assert kwargs["params"] == {"max_concurrency": 2}
+    assert [item["message"] for item in kwargs["json"]] == ["One", "Two"]
+
+
+def test_get_history_window(agent_client):
+    HISTORY = {
+        "messages": [{"type": "ai", "content": "Hallo"}],
+        "first_id": "m9",
+        "last_id": "m9",
+        "total": 10,
+    }
+    mock_response = Response(200, json=HISTORY, request=Request("POST", "http://test/history"))
+    with patch("httpx.post", return_value=mock_response) as mock_post:
+        history = agent_client.get_history("test-thread", limit=1, before="m10")
+        assert history.first_id == "m9"
+        assert mock_post.call_args.args[0] == "http://test/test-agent/history"
+        assert mock_post.call_args.kwargs["json"] == {
+            "thread_id": "test-thread",
+            "limit": 1,
+            "before": "m10",
+        }
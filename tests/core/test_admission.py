@@ -0,0 +1,98 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from core import get_model, metrics
+from core.admission import AdmissionController, ProviderBusyError, admit_calls
+from schema.models import FakeModelName, OpenAIModelName
+
+
+@pytest.mark.asyncio
+async def test_limits_in_flight_runs_and_queues_the_rest() -> None:
+    controller = AdmissionController({"openai": 2}, max_queue=1, timeout_seconds=5)
+    first = await controller.acquire(OpenAIModelName.GPT_4O)
+    second = await controller.acquire(OpenAIModelName.GPT_4O_MINI)
+
+    waiting = asyncio.create_task(controller.acquire(OpenAIModelName.GPT_4O))
+    await asyncio.sleep(0)
+    assert not waiting.done()
+    assert metrics.snapshot()["gauges"]['admission_queue_depth{key="openai"}'] == 1
+
+    # The queue is full: fail fast
+    with pytest.raises(ProviderBusyError) as busy:
+        await controller.acquire(OpenAIModelName.GPT_4O)
+    assert busy.value.retry_after >= 1
+
+    first()
+    first()  # releasing twice frees one slot only
+    third = await asyncio.wait_for(waiting, 1)
+    assert controller.limiter(OpenAIModelName.GPT_4O)._in_flight == 2
+    second()
+    third()
+
+
+@pytest.mark.asyncio
+async def test_wait_times_out() -> None:
+    controller = AdmissionController({"openai": 1}, max_queue=10, timeout_seconds=0.01)
+    release = await controller.acquire(OpenAIModelName.GPT_4O)
+    rejected = metrics.counter("admission_rejected_total", key="openai", reason="timeout")
+    with pytest.raises(ProviderBusyError):
+        await controller.acquire(OpenAIModelName.GPT_4O)
+    assert (
+        metrics.counter("admission_rejected_total", key="openai", reason="timeout") == rejected + 1
+    )
+    release()
+    (await controller.acquire(OpenAIModelName.GPT_4O))()
+
+
+def test_model_limit_takes_precedence_over_provider() -> None:
+    controller = AdmissionController(
+        {"openai": 8, "openai:gpt-4o": 2}, max_queue=10, timeout_seconds=1
+    )
+    assert controller.limiter(OpenAIModelName.GPT_4O).limit == 2
+    assert controller.limiter(OpenAIModelName.GPT_4O_MINI).limit == 8
+    assert controller.limiter("claude-3-haiku") is None
+    assert controller.limiter("auto") is None
+
+
+@pytest.mark.asyncio
+async def test_model_calls_are_admitted_per_call() -> None:
+    controller = AdmissionController({"fake": 1}, max_queue=0, timeout_seconds=1)
+    model = get_model(FakeModelName.FAKE)
+    with patch("core.admission.get_admission_controller", return_value=controller):
+        release = await controller.acquire(FakeModelName.FAKE)
+        with pytest.raises(ProviderBusyError):
+            await model.ainvoke("Hallo")
+        release()
+
+        await model.ainvoke("Hallo")
+        assert [chunk async for chunk in model.astream("Hallo")]
+    assert controller.limiter(FakeModelName.FAKE)._in_flight == 0
+
+
+class SlowModel(FakeListChatModel):
+    async def _agenerate(self, *args, **kwargs):
+        await asyncio.sleep(10)
+        return await super()._agenerate(*args, **kwargs)
+
+    async def _astream(self, *args, **kwargs):
+        await asyncio.sleep(10)
+        async for chunk in super()._astream(*args, **kwargs):
+            yield chunk
+
+
+@pytest.mark.asyncio
+async def test_cancelled_call_gives_back_its_slot() -> None:
+    controller = AdmissionController({"fake": 1}, max_queue=0, timeout_seconds=1)
+    model = admit_calls(SlowModel(responses=["Hallo"]), FakeModelName.FAKE)
+    with patch("core.admission.get_admission_controller", return_value=controller):
+        for call in (model.ainvoke("Hallo"), anext(model.astream("Hallo"))):
+            task = asyncio.create_task(call)
+            await asyncio.sleep(0.01)
+            assert controller.limiter(FakeModelName.FAKE)._in_flight == 1
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert controller.limiter(FakeModelName.FAKE)._in_flight == 0
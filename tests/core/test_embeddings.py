@@ -0,0 +1,44 @@
+import numpy as np
+
+from core.embeddings import HashingEmbedder, VectorIndex, normalize_rows
+
+
+def test_hashing_embedder_is_deterministic_and_normalized() -> None:
+    embedder = HashingEmbedder(dim=64)
+    vectors = embedder.embed(["Wie geht es dir?", "Wie geht es dir?", ""])
+
+    assert vectors.shape == (3, 64)
+    assert vectors.dtype == np.float32
+    np.testing.assert_array_equal(vectors[0], vectors[1])
+    assert np.isclose(np.linalg.norm(vectors[0]), 1)
+    assert not vectors[2].any()
+
+
+def test_hashing_embedder_ranks_overlapping_texts_higher() -> None:
+    query, close, far = HashingEmbedder().embed(
+        ["wie geht es dir heute", "wie geht es dir", "das wetter ist schlecht"]
+    )
+    assert query @ close > query @ far
+
+
+def test_vector_index_search() -> None:
+    index = VectorIndex(dim=3, max_entries=10)
+    index.extend(np.eye(3, dtype=np.float32), ["x", "y", "z"])
+    query = normalize_rows(np.array([[0.1, 1.0, 0.5]], dtype=np.float32))[0]
+
+    assert [i for i, _ in index.search(query, k=2)] == [1, 2]
+    assert index.payloads[index.search(query)[0][0]] == "y"
+    assert VectorIndex(dim=3, max_entries=10).search(query) == []
+
+
+def test_vector_index_evicts_least_recently_used() -> None:
+    index = VectorIndex(dim=3, max_entries=2)
+    vectors = np.eye(3, dtype=np.float32)
+    index.add(vectors[0], "x")
+    index.add(vectors[1], "y")
+    index.touch(0)
+
+    assert index.add(vectors[2], "z") == 1
+    assert sorted(index.payloads) == ["x", "z"]
+    assert index.extend(np.stack([vectors[1]] * 3), ["a", "b", "c"]) == 3
+    assert len(index) == 2
@@ -4,11 +4,13 @@ from unittest.mock import patch
 import pytest
 from langchain_anthropic import ChatAnthropic
 from langchain_community.chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
 from langchain_groq import ChatGroq
 from langchain_ollama import ChatOllama
 from langchain_openai import ChatOpenAI
 
-from core.llm import get_model
+from core.llm import build_system_message, get_model, get_prompt_cache_usage
+from core.responses_api import ChatOpenAIResponses
 from schema.models import (
     AnthropicModelName,
     FakeModelName,
@@ -70,3 +72,78 @@ def test_get_model_invalid():
     with pytest.raises(ValueError, match="Unsupported model:"):
         # Using type: ignore since we're intentionally testing invalid input
         get_model("invalid_model")  # type: ignore
+
+
+def test_build_system_message_marks_prefix_for_anthropic():
+    with patch.dict(os.environ, {"ANTHROPIC_API_KEY": "test_key"}):
+        anthropic = get_model(AnthropicModelName.HAIKU_3)
+    message = build_system_message("Background. Instructions.", anthropic, "Background. ")
+    assert message.content == [
+        {"type": "text", "text": "Background. ", "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": "Instructions."},
+    ]
+
+    # OpenAI caches identical prefixes automatically, the content stays a plain string
+    openai = get_model(OpenAIModelName.GPT_4O_MINI)
+    message = build_system_message("Background. Instructions.", openai, "Background. ")
+    assert message.content == "Background. Instructions."
+
+    # A prefix that does not match is ignored
+    message = build_system_message("Instructions.", anthropic, "Background. ")
+    assert message.content == "Instructions."
+
+
+def test_get_prompt_cache_usage():
+    normalized = AIMessage(
+        content="",
+        usage_metadata={
+            "input_tokens": 1500,
+            "output_tokens": 20,
+            "total_tokens": 1520,
+            "input_token_details": {"cache_read": 1024},
+        },
+    )
+    assert get_prompt_cache_usage(normalized) == {"input_tokens": 1500, "cached_tokens": 1024}
+
+    openai = AIMessage(
+        content="",
+        response_metadata={
+            "token_usage": {"prompt_tokens": 1300, "prompt_tokens_details": {"cached_tokens": 1152}}
+        },
+    )
+    assert get_prompt_cache_usage(openai) == {"input_tokens": 1300, "cached_tokens": 1152}
+
+    anthropic = AIMessage(
+        content="",
+        response_metadata={"usage": {"input_tokens": 50, "cache_read_input_tokens": 1200}},
+    )
+    assert get_prompt_cache_usage(anthropic) == {"input_tokens": 1250, "cached_tokens": 1200}
+
+    assert get_prompt_cache_usage(AIMessage(content="")) == {"input_tokens": 0, "cached_tokens": 0}
+
+
+def test_get_model_max_tokens():
+    with patch.dict(os.environ, {"OPENAI_API_KEY": "test_key", "ANTHROPIC_API_KEY": "test_key"}):
+        assert get_model(OpenAIModelName.GPT_4O_MINI).max_tokens is None
+        assert get_model(OpenAIModelName.GPT_4O_MINI, max_tokens=64).max_tokens == 64
+        assert get_model(AnthropicModelName.HAIKU_3, max_tokens=64).max_tokens == 64
+
+
+def test_get_model_accepts_plain_model_names():
+    with patch.dict(os.environ, {"OPENAI_API_KEY": "test_key"}):
+        model = get_model("gpt-4o-mini")
+        assert isinstance(model, ChatOpenAI)
+        assert model.model_name == "gpt-4o-mini"
+
+
+def test_get_model_openai_responses_api():
+    get_model.cache_clear()
+    try:
+        with patch("core.settings.settings.OPENAI_RESPONSES_API", True):
+            model = get_model(OpenAIModelName.GPT_4O_MINI, max_tokens=64)
+        assert isinstance(model, ChatOpenAIResponses)
+        assert model.model_name == "gpt-4o-mini"
+        assert model.max_output_tokens == 64
+        assert model.streaming is True
+    finally:
+        get_model.cache_clear()
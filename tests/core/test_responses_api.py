@@ -0,0 +1,156 @@
+import json
+
+import httpx
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from benchmarks.stored_conversation import REPLY, create_stand_in_app
+from core import metrics
+from core.responses_api import ChatOpenAIResponses
+
+
+def _model(app, requests: list[dict], **kwargs) -> ChatOpenAIResponses:
+    async def record(request: httpx.Request) -> None:
+        requests.append(json.loads(request.content))
+
+    client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), event_hooks={"request": [record]}
+    )
+    return ChatOpenAIResponses(
+        model_name="gpt-4o-mini", base_url="http://stand-in/v1", http_async_client=client, **kwargs
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("streaming", [False, True])
+async def test_sends_only_new_messages_after_a_stored_response(streaming: bool) -> None:
+    requests: list[dict] = []
+    model = _model(create_stand_in_app(), requests, streaming=streaming)
+    messages = [SystemMessage(content="Du bist Frank."), HumanMessage(content="Hallo")]
+
+    first = await model.ainvoke(messages)
+    assert first.content == REPLY
+    assert first.response_metadata["response_id"].startswith("resp_")
+    assert requests[0]["instructions"] == "Du bist Frank."
+    assert "previous_response_id" not in requests[0]
+
+    messages += [first, HumanMessage(content="Wie geht's?")]
+    second = await model.ainvoke(messages)
+    assert second.content == REPLY
+    assert requests[1]["previous_response_id"] == first.response_metadata["response_id"]
+    assert requests[1]["input"] == [{"role": "user", "content": "Wie geht's?"}]
+    # Instructions are not kept by the provider and are sent with every call
+    assert requests[1]["instructions"] == "Du bist Frank."
+
+
+@pytest.mark.asyncio
+async def test_edited_history_is_sent_in_full() -> None:
+    requests: list[dict] = []
+    model = _model(create_stand_in_app(), requests)
+    first = await model.ainvoke([HumanMessage(content="Hallo")])
+
+    # e.g. compacted by the agent: the provider's copy of the conversation no longer matches
+    edited = AIMessage(content="Hallo!", response_metadata=first.response_metadata)
+    await model.ainvoke([HumanMessage(content="Hallo"), edited, HumanMessage(content="Und?")])
+    assert "previous_response_id" not in requests[1]
+    assert len(requests[1]["input"]) == 3
+
+
+@pytest.mark.asyncio
+async def test_expired_response_falls_back_to_full_history() -> None:
+    requests: list[dict] = []
+    app = create_stand_in_app()
+    model = _model(app, requests)
+    first = await model.ainvoke([HumanMessage(content="Hallo")])
+    app.state.responses.clear()
+
+    breaks = metrics.counter("responses_api_chain_breaks_total")
+    second = await model.ainvoke([HumanMessage(content="Hallo"), first, HumanMessage("Und?")])
+    assert second.content == REPLY
+    assert [len(request["input"]) for request in requests[1:]] == [1, 3]
+    assert "previous_response_id" not in requests[2]
+    assert metrics.counter("responses_api_chain_breaks_total") == breaks + 1
+
+
+@pytest.mark.asyncio
+async def test_tool_results_continue_the_chain() -> None:
+    def respond(items: list[dict]) -> list[dict]:
+        if items[-1].get("role") == "user":
+            call = {"type": "function_call", "call_id": "call_1", "name": "get_time"}
+            return [{**call, "arguments": json.dumps({"city": "Berlin"})}]
+        return [{"type": "message", "content": [{"type": "output_text", "text": "12 Uhr"}]}]
+
+    requests: list[dict] = []
+    model = _model(create_stand_in_app(respond=respond), requests)
+
+    def get_time(city: str) -> str:
+        """Return the time in a city."""
+        return "12:00"
+
+    model_with_tools = model.bind_tools([get_time])
+    messages = [HumanMessage(content="Wie spät ist es in Berlin?")]
+    call = await model_with_tools.ainvoke(messages)
+    assert call.tool_calls[0]["args"] == {"city": "Berlin"}
+    assert requests[0]["tools"][0]["name"] == "get_time"
+
+    messages += [call, ToolMessage(content="12:00", tool_call_id="call_1")]
+    answer = await model_with_tools.ainvoke(messages)
+    assert answer.content == "12 Uhr"
+    assert requests[1]["previous_response_id"] == call.response_metadata["response_id"]
+    assert requests[1]["input"] == [
+        {"type": "function_call_output", "call_id": "call_1", "output": "12:00"}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_full_history_mode_never_chains() -> None:
+    requests: list[dict] = []
+    model = _model(create_stand_in_app(), requests, use_previous_response_id=False)
+    first = await model.ainvoke([HumanMessage(content="Hallo")])
+    await model.ainvoke([HumanMessage(content="Hallo"), first, HumanMessage(content="Und?")])
+    assert requests[0]["store"] is False
+    assert "previous_response_id" not in requests[1]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "error, retried",
+    [
+        ({"message": "Invalid schema for function 'get_time'", "param": "tools[0]"}, False),
+        ({"message": "Previous response not found", "param": "previous_response_id"}, True),
+    ],
+)
+async def test_only_chain_errors_fall_back_to_full_history(error: dict, retried: bool) -> None:
+    requests: list[dict] = []
+    app = create_stand_in_app()
+    model = _model(app, requests)
+    first = await model.ainvoke([HumanMessage(content="Hallo")])
+
+    def reject_chained(request: httpx.Request) -> httpx.Response | None:
+        if "previous_response_id" in json.loads(request.content):
+            return httpx.Response(400, json={"error": error})
+        return None
+
+    stand_in = httpx.ASGITransport(app=app)
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        return reject_chained(request) or await stand_in.handle_async_request(request)
+
+    model.http_async_client = httpx.AsyncClient(transport=httpx.MockTransport(handle))
+    breaks = metrics.counter("responses_api_chain_breaks_total")
+    messages = [HumanMessage(content="Hallo"), first, HumanMessage(content="Und?")]
+    if retried:
+        assert (await model.ainvoke(messages)).content == REPLY
+    else:
+        with pytest.raises(httpx.HTTPStatusError):
+            await model.ainvoke(messages)
+    assert len(requests) == (3 if retried else 2)
+    assert metrics.counter("responses_api_chain_breaks_total") == breaks + int(retried)
+
+
+@pytest.mark.asyncio
+async def test_stop_sequences_are_rejected() -> None:
+    model = _model(create_stand_in_app(), [])
+    with pytest.raises(ValueError, match="stop sequences"):
+        await model.ainvoke([HumanMessage(content="Hallo")], stop=["\n"])
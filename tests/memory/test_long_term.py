@@ -0,0 +1,91 @@
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from agents.character_agent import InnerVoiceMode, build_character_agent
+from benchmarks.simulated import SimulatedCharacterModel
+from core import settings
+from memory import set_long_term_store
+from memory.sqlite import SqliteLongTermStore
+
+
+@pytest_asyncio.fixture
+async def store(tmp_path):
+    async with SqliteLongTermStore.from_conn_string(str(tmp_path / "memory.db"), 3) as store:
+        await store.setup()
+        yield store
+
+
+@pytest.mark.asyncio
+async def test_store_is_namespaced_by_user_and_character(store) -> None:
+    await store.aput(("anna", "frank"), "wohnort", "Anna wohnt in Hamburg")
+    await store.aput(("anna", "frank"), "wohnort", "Anna ist nach Berlin gezogen")
+
+    assert await store.aget(("anna", "frank"), "wohnort") == "Anna ist nach Berlin gezogen"
+    assert await store.aget(("anna", "lisa"), "wohnort") is None
+    assert await store.aget(("ben", "frank"), "wohnort") is None
+
+
+@pytest.mark.asyncio
+async def test_store_search_returns_similar_facts(store) -> None:
+    namespace = ("anna", "frank")
+    await store.aput(namespace, "beruf", "Anna arbeitet als Krankenschwester im Nachtdienst")
+    await store.aput(namespace, "hund", "Anna hat einen Hund namens Bello")
+    await store.aput(namespace, "urlaub", "Anna fährt im Sommer nach Italien")
+
+    found = await store.asearch(namespace, "Wie geht es deinem Hund Bello?", limit=1)
+    assert [item["key"] for item in found] == ["hund"]
+
+
+@pytest.mark.asyncio
+async def test_store_evicts_least_recently_used(store) -> None:
+    namespace = ("anna", "frank")
+    for key in ["a", "b", "c"]:
+        await store.aput(namespace, key, f"Fakt {key}")
+    # Using "a" keeps it, so "b" is evicted by the next write
+    await store.asearch(namespace, "a: Fakt a", limit=1)
+    await store.aput(namespace, "d", "Fakt d")
+
+    assert sorted(item["key"] for item in await store.alist(namespace)) == ["a", "c", "d"]
+
+
+@pytest.mark.asyncio
+async def test_character_agent_remembers_user_across_threads(store) -> None:
+    prompts = []
+
+    class RecordingModel(SimulatedCharacterModel):
+        def _respond(self, messages):
+            prompts.append(messages)
+            return super()._respond(messages)
+
+    graph = build_character_agent(
+        checkpointer=MemorySaver(), inner_voice_mode=InnerVoiceMode.COUNCIL
+    )
+    model = RecordingModel()
+    set_long_term_store(store)
+    try:
+        with (
+            patch("agents.character_agent.get_model", return_value=model),
+            patch("agents.user_memory.get_model", return_value=model),
+            patch.object(settings, "CONVERSATION_SUMMARY_ENABLED", False),
+        ):
+            for message in ["Ich habe einen Hund namens Bello", "Erzähl mir von Bello"]:
+                config = {
+                    "configurable": {
+                        **graph.character_config["configurable"],
+                        "thread_id": str(uuid4()),
+                        "user_id": "anna",
+                    }
+                }
+                await graph.ainvoke({"messages": [HumanMessage(content=message)]}, config)
+                await graph.after_run(graph, config)
+    finally:
+        set_long_term_store(None)
+
+    assert await store.aget(("anna", "frank"), "zuletzt_erzaehlt") == "Erzähl mir von Bello"
+    # The new thread's answer already knew the fact from the first thread
+    assert "Ich habe einen Hund namens Bello" in prompts[-2][0].content
@@ -0,0 +1,29 @@
+from service.interrupt_index import InterruptIndex
+
+
+def test_unknown_threads_return_none() -> None:
+    index = InterruptIndex(max_threads=10)
+    assert index.get("agent", "t1") is None
+    index.set("agent", "t1", False)
+    index.set("agent", "t2", True)
+    assert index.get("agent", "t1") is False
+    assert index.get("agent", "t2") is True
+    index.discard("agent", "t2")
+    assert index.get("agent", "t2") is None
+    assert index.get("other-agent", "t1") is None
+
+
+def test_least_recently_used_threads_are_dropped() -> None:
+    index = InterruptIndex(max_threads=2)
+    index.set("agent", "t1", True)
+    index.set("agent", "t2", False)
+    index.get("agent", "t1")
+    index.set("agent", "t3", False)
+    assert index.get("agent", "t2") is None
+    assert index.get("agent", "t1") is True
+
+
+def test_disabled_index_knows_no_threads() -> None:
+    index = InterruptIndex(max_threads=0)
+    index.set("agent", "t1", True)
+    assert index.get("agent", "t1") is None
@@ -1,15 +1,31 @@
+import asyncio
 import json
-from unittest.mock import AsyncMock, patch
+import time
+from unittest.mock import AsyncMock, Mock, patch
 
+import httpx
 import langsmith
 import pytest
 from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langgraph.checkpoint.base import CheckpointTuple
 from langgraph.pregel.types import StateSnapshot
 from langgraph.types import Interrupt
 
 from agents.agents import Agent
-from schema import ChatHistory, ChatMessage, ServiceMetadata
-from schema.models import OpenAIModelName
+from core import settings
+from core.admission import AdmissionController, ProviderBusyError
+from core.metrics import MetricsRegistry
+from schema import (
+    BatchInvokeResult,
+    ChatHistory,
+    ChatMessage,
+    ServiceMetadata,
+    ServiceMetrics,
+)
+from schema.models import FakeModelName, OpenAIModelName
+from service import app
+from service.interrupt_index import InterruptIndex
+from service.thread_runs import ThreadBusyError, ThreadRunPolicy, ThreadRuns
 
 
 def test_invoke(test_client, mock_agent) -> None:
@@ -125,6 +141,76 @@ def test_invoke_custom_agent_config(test_client, mock_agent) -> None:
     assert response.status_code == 422
 
 
+def test_invoke_agent_config_overrides_character_defaults(test_client, mock_agent) -> None:
+    mock_agent.character_config = {
+        "configurable": {"character": "frank", "inner_voice_mode": "sequential"}
+    }
+
+    response = test_client.post(
+        "/invoke", json={"message": "Hallo", "agent_config": {"inner_voice_mode": "council"}}
+    )
+    assert response.status_code == 200
+    config = mock_agent.ainvoke.await_args.kwargs["config"]
+    assert config["configurable"]["inner_voice_mode"] == "council"
+    assert config["configurable"]["character"] == "frank"
+
+    # The character of an agent is fixed
+    response = test_client.post(
+        "/invoke", json={"message": "Hallo", "agent_config": {"character": "lisa"}}
+    )
+    assert response.status_code == 422
+
+
+def test_invoke_passes_user_id(test_client, mock_agent) -> None:
+    mock_agent.character_config = {}
+    response = test_client.post("/invoke", json={"message": "Hallo", "user_id": "user-123"})
+    assert response.status_code == 200
+    config = mock_agent.ainvoke.await_args.kwargs["config"]
+    assert config["configurable"]["user_id"] == "user-123"
+
+    # The user can only be set with user_id
+    response = test_client.post(
+        "/invoke", json={"message": "Hallo", "agent_config": {"user_id": "someone-else"}}
+    )
+    assert response.status_code == 422
+
+
+def test_invoke_deadline_from_agent_config_or_header(test_client, mock_agent) -> None:
+    mock_agent.character_config = {}
+
+    before = time.time()
+    response = test_client.post(
+        "/invoke", json={"message": "Hallo"}, headers={"X-Deadline-Ms": "4000"}
+    )
+    assert response.status_code == 200
+    deadline = mock_agent.ainvoke.await_args.kwargs["config"]["configurable"]["deadline"]
+    assert before + 4 <= deadline <= time.time() + 4
+
+    # agent_config takes precedence over the header
+    response = test_client.post(
+        "/invoke",
+        json={"message": "Hallo", "agent_config": {"deadline_ms": 1000}},
+        headers={"X-Deadline-Ms": "4000"},
+    )
+    deadline = mock_agent.ainvoke.await_args.kwargs["config"]["configurable"]["deadline"]
+    assert deadline <= time.time() + 1
+
+    for invalid in ["soon", -5, True]:
+        response = test_client.post(
+            "/invoke", json={"message": "Hallo", "agent_config": {"deadline_ms": invalid}}
+        )
+        assert response.status_code == 422
+    response = test_client.post(
+        "/invoke", json={"message": "Hallo"}, headers={"X-Deadline-Ms": "-1"}
+    )
+    assert response.status_code == 422
+    # The absolute deadline cannot be set directly
+    response = test_client.post(
+        "/invoke", json={"message": "Hallo", "agent_config": {"deadline": time.time() + 3600}}
+    )
+    assert response.status_code == 422
+
+
 def test_invoke_interrupt(test_client, mock_agent) -> None:
     QUESTION = "What is the weather in Tokyo?"
     ANSWER = "The weather in Tokyo is 70 degrees."
@@ -170,14 +256,10 @@ def test_history(test_client, mock_agent) -> None:
     ANSWER = "The weather in Tokyo is 70 degrees."
     user_question = HumanMessage(content=QUESTION)
     agent_response = AIMessage(content=ANSWER)
-    mock_agent.get_state.return_value = StateSnapshot(
-        values={"messages": [user_question, agent_response]},
-        next=(),
+    mock_agent.checkpointer.aget_tuple.return_value = CheckpointTuple(
         config={},
-        metadata=None,
-        created_at=None,
-        parent_config=None,
-        tasks=(),
+        checkpoint={"channel_values": {"messages": [user_question, agent_response]}},
+        metadata={},
     )
 
     response = test_client.post(
@@ -354,3 +436,324 @@ def test_info(test_client, mock_settings) -> None:
 
     assert output.default_model == OpenAIModelName.GPT_4O_MINI
     assert output.models == [OpenAIModelName.GPT_4O, OpenAIModelName.GPT_4O_MINI]
+
+
+def test_metrics(test_client) -> None:
+    """Test that /metrics returns the in-process metrics snapshot."""
+    registry = MetricsRegistry()
+    registry.increment("inner_voice_cache_hits_total", tier="memory")
+    registry.set_gauge("inner_voice_cache_entries", 3, tier="memory")
+    registry.observe("inner_voice_latency_seconds", 0.5)
+    with patch("service.service.metrics", registry):
+        response = test_client.get("/metrics")
+    assert response.status_code == 200
+
+    output = ServiceMetrics.model_validate(response.json())
+    assert output.counters == {'inner_voice_cache_hits_total{tier="memory"}': 1}
+    assert output.gauges == {'inner_voice_cache_entries{tier="memory"}': 3}
+    assert output.summaries["inner_voice_latency_seconds"]["mean"] == 0.5
+
+
+def test_invoke_auto_model_is_routed(test_client, mock_agent) -> None:
+    mock_agent.character_config = {}
+    routes = {"simple": OpenAIModelName.GPT_4O_MINI, "complex": OpenAIModelName.GPT_4O}
+
+    with patch.object(settings, "MODEL_ROUTES", routes):
+        response = test_client.post("/invoke", json={"message": "Danke!", "model": "auto"})
+        assert response.status_code == 200
+        configurable = mock_agent.ainvoke.await_args.kwargs["config"]["configurable"]
+        assert configurable["model"] == OpenAIModelName.GPT_4O_MINI
+        assert configurable["model_route"] == "simple"
+
+        response = test_client.post(
+            "/invoke",
+            json={"message": "Erkläre und vergleiche beide Ansätze.", "model": "auto"},
+        )
+        configurable = mock_agent.ainvoke.await_args.kwargs["config"]["configurable"]
+        assert configurable["model"] == OpenAIModelName.GPT_4O
+
+
+def test_invoke_batch_streams_results_with_per_item_errors(test_client, mock_agent) -> None:
+    mock_agent.character_config = {}
+    running = 0
+    peak = 0
+
+    async def ainvoke(input, config, **kwargs):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        message = input["messages"][0].content
+        if message == "fail":
+            raise ValueError("provider error")
+        return [("values", {"messages": [AIMessage(content=f"re: {message}")]})]
+
+    mock_agent.ainvoke.side_effect = ainvoke
+    inputs = [{"message": f"m{i}"} for i in range(6)]
+    inputs[2] = {"message": "fail"}
+    inputs[4] = {"message": "m4", "agent_config": {"thread_id": "x"}}
+
+    with patch.object(settings, "BATCH_INVOKE_MAX_CONCURRENCY", 4):
+        response = test_client.post("/invoke/batch?max_concurrency=2", json=inputs)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    results = {
+        result.index: result
+        for result in map(BatchInvokeResult.model_validate_json, response.text.splitlines())
+    }
+    assert sorted(results) == list(range(6))
+    assert results[0].output.content == "re: m0"
+    assert results[2].status_code == 500
+    assert results[2].error == "Unexpected error"
+    assert results[4].status_code == 422
+    assert "reserved keys" in results[4].error
+    assert peak == 2
+
+
+def test_busy_provider_answers_429(test_client, mock_agent) -> None:
+    mock_agent.character_config = {}
+    mock_agent.ainvoke.side_effect = ProviderBusyError("openai", 7)
+
+    response = test_client.post("/invoke", json={"message": "Hallo"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
+
+    # The model router's call is admitted too, before the stream starts
+    with patch("service.service.aroute_model", side_effect=ProviderBusyError("openai", 7)):
+        response = test_client.post("/stream", json={"message": "Hallo", "model": "auto"})
+    assert response.status_code == 429
+    mock_agent.astream.assert_not_called()
+
+    async def busy_stream(**kwargs):
+        raise ProviderBusyError("openai", 7)
+        yield
+
+    mock_agent.astream = busy_stream
+    response = test_client.post("/stream", json={"message": "Hallo"})
+    assert response.status_code == 200
+    events = [line for line in response.text.splitlines() if line]
+    assert json.loads(events[0][len("data: ") :])["type"] == "error"
+    assert events[-1] == "data: [DONE]"
+
+
+def test_busy_thread_answers_409(test_client, mock_agent) -> None:
+    mock_agent.character_config = {}
+    thread_runs = Mock()
+    thread_runs.enter = AsyncMock(side_effect=ThreadBusyError("t1"))
+
+    with patch("service.service.get_thread_runs", return_value=thread_runs):
+        for path in ("/invoke", "/stream"):
+            response = test_client.post(
+                path,
+                json={
+                    "message": "Hallo",
+                    "thread_id": "t1",
+                    "agent_config": {"thread_run_policy": "reject"},
+                },
+            )
+            assert response.status_code == 409
+        thread_runs.enter.assert_awaited_with("t1", ThreadRunPolicy.REJECT)
+
+        response = test_client.post(
+            "/invoke",
+            json={
+                "message": "Hallo",
+                "thread_id": "t1",
+                "agent_config": {"thread_run_policy": "x"},
+            },
+        )
+        assert response.status_code == 422
+    mock_agent.ainvoke.assert_not_awaited()
+    mock_agent.astream.assert_not_called()
+
+
+def test_interrupt_index_skips_state_reads(test_client, mock_agent) -> None:
+    mock_agent.character_config = {}
+    mock_agent.aget_state = AsyncMock(
+        return_value=StateSnapshot(
+            values={"messages": []},
+            next=(),
+            config={},
+            metadata=None,
+            created_at=None,
+            parent_config=None,
+            tasks=(),
+        )
+    )
+    mock_agent.ainvoke.return_value = [
+        ("updates", {"__interrupt__": [Interrupt(value="Confirm weather check")]})
+    ]
+
+    with patch("service.service.get_interrupt_index", return_value=InterruptIndex(100)):
+        # A new thread has no interrupts to resume
+        assert test_client.post("/invoke", json={"message": "Hallo"}).status_code == 200
+        mock_agent.aget_state.assert_not_awaited()
+
+        # The first request on an existing thread reads its state, later ones the index
+        for message in ("Wie ist das Wetter?", "Ja"):
+            response = test_client.post("/invoke", json={"message": message, "thread_id": "t1"})
+            assert response.status_code == 200
+        mock_agent.aget_state.assert_awaited_once()
+        assert mock_agent.ainvoke.await_args.kwargs["input"].resume == "Ja"
+
+
+def _history_checkpoint(count: int, checkpoint_id: str, first: int = 0) -> CheckpointTuple:
+    messages = [HumanMessage(content=f"m{i}", id=f"m{i}") for i in range(first, count)]
+    return CheckpointTuple(
+        config={"configurable": {"thread_id": "t1", "checkpoint_id": checkpoint_id}},
+        checkpoint={"channel_values": {"messages": messages}},
+        metadata={},
+    )
+
+
+def test_history_window(test_client, mock_agent) -> None:
+    mock_agent.checkpointer.aget_tuple.return_value = _history_checkpoint(10, "c1")
+
+    def window(**params) -> list[str]:
+        response = test_client.post("/custom_agent/history", json={"thread_id": "t1", **params})
+        assert response.status_code == 200
+        history = ChatHistory.model_validate(response.json())
+        assert history.total == 10
+        return [m.content for m in history.messages]
+
+    assert window(limit=3) == ["m7", "m8", "m9"]
+    assert window(limit=3, before="m7") == ["m4", "m5", "m6"]
+    assert window(limit=3, after="m7") == ["m8", "m9"]
+    assert window(after="m2", before="m5") == ["m3", "m4"]
+    assert window(after="m9") == []
+    config = mock_agent.checkpointer.aget_tuple.await_args.args[0]
+    assert config["configurable"]["thread_id"] == "t1"
+
+    response = test_client.post("/history", json={"thread_id": "t1", "limit": 3})
+    history = ChatHistory.model_validate(response.json())
+    assert (history.first_id, history.last_id) == ("m7", "m9")
+
+    # Compaction dropped the first messages, and with them the cursors pointing at them
+    mock_agent.checkpointer.aget_tuple.return_value = _history_checkpoint(10, "c2", first=4)
+    response = test_client.post("/history", json={"thread_id": "t1", "before": "m7"})
+    assert [m["content"] for m in response.json()["messages"]] == ["m4", "m5", "m6"]
+    response = test_client.post("/history", json={"thread_id": "t1", "before": "m2"})
+    assert response.status_code == 410
+
+
+def test_history_not_modified(test_client, mock_agent) -> None:
+    mock_agent.checkpointer.aget_tuple.return_value = _history_checkpoint(2, "c1")
+
+    response = test_client.get("/history", params={"thread_id": "t1", "limit": 1})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"c1"'
+    assert [m["content"] for m in response.json()["messages"]] == ["m1"]
+
+    response = test_client.get(
+        "/history", params={"thread_id": "t1"}, headers={"If-None-Match": '"c1"'}
+    )
+    assert response.status_code == 304
+
+    for if_none_match in ('"c0", "c1"', 'W/"c1"', "*"):
+        response = test_client.get(
+            "/history", params={"thread_id": "t1"}, headers={"If-None-Match": if_none_match}
+        )
+        assert response.status_code == 304
+
+    mock_agent.checkpointer.aget_tuple.return_value = _history_checkpoint(3, "c2")
+    response = test_client.get(
+        "/history", params={"thread_id": "t1"}, headers={"If-None-Match": '"c1"'}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"c2"'
+    assert len(response.json()["messages"]) == 3
+
+
+@pytest.mark.asyncio
+async def test_stream_disconnect_before_first_chunk_releases_the_thread(mock_agent) -> None:
+    mock_agent.character_config = {}
+    runs = ThreadRuns(wait_timeout_seconds=1)
+    body = json.dumps({"message": "Hallo", "thread_id": "t1"}).encode()
+    received = [
+        {"type": "http.request", "body": body, "more_body": False},
+        {"type": "http.disconnect"},
+    ]
+
+    async def receive() -> dict:
+        # The client is gone before the response body is read
+        return received.pop(0) if received else {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        await asyncio.sleep(0)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/stream",
+        "raw_path": b"/stream",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json")],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+    with patch("service.service.get_thread_runs", return_value=runs):
+        await app(scope, receive, send)
+    assert not runs._locks
+    assert not runs._active
+
+
+@pytest.mark.asyncio
+async def test_after_run_does_not_keep_the_thread_busy(mock_agent) -> None:
+    mock_agent.character_config = {}
+    summarized = asyncio.Event()
+    after_runs = []
+
+    async def after_run(agent, config) -> None:
+        after_runs.append(config)
+        await summarized.wait()
+
+    mock_agent.after_run = after_run
+    runs = ThreadRuns(wait_timeout_seconds=1)
+    body = {"message": "Hallo", "thread_id": "t1", "agent_config": {"thread_run_policy": "reject"}}
+    transport = httpx.ASGITransport(app=app)
+    with patch("service.service.get_thread_runs", return_value=runs):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            assert (await client.post("/invoke", json=body)).status_code == 200
+            assert not runs._locks
+            # The summary of the first run is not written yet, the next message runs anyway
+            assert (await client.post("/invoke", json=body)).status_code == 200
+            assert mock_agent.ainvoke.await_count == 2
+            await asyncio.sleep(0.01)
+            assert len(after_runs) == 2
+            summarized.set()
+
+
+def test_invalid_turn_classifier_answers_422(test_client, mock_agent) -> None:
+    mock_agent.character_config = {}
+    response = test_client.post(
+        "/invoke", json={"message": "Hallo", "agent_config": {"turn_classifier": "magic"}}
+    )
+    assert response.status_code == 422
+    assert "turn_classifier" in response.json()["detail"]
+    mock_agent.ainvoke.assert_not_awaited()
+
+    response = test_client.post(
+        "/invoke", json={"message": "Hallo", "agent_config": {"turn_classifier": "off"}}
+    )
+    assert response.status_code == 200
+
+
+def test_busy_provider_fails_a_real_character_turn(test_client) -> None:
+    controller = AdmissionController({"fake": 1}, max_queue=0, timeout_seconds=1)
+    with patch("core.admission.get_admission_controller", return_value=controller):
+        release = asyncio.run(controller.acquire(FakeModelName.FAKE))
+        try:
+            response = test_client.post(
+                "/frank-character/invoke",
+                json={"message": "Hallo", "model": "fake", "thread_id": "busy-frank"},
+            )
+        finally:
+            release()
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
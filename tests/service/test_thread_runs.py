@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+
+from memory.sqlite import SqliteThreadLeases
+from service.thread_runs import ThreadBusyError, ThreadRunPolicy, ThreadRuns
+
+
+@pytest.mark.asyncio
+async def test_wait_runs_one_after_the_other() -> None:
+    runs = ThreadRuns(wait_timeout_seconds=1)
+    first = await runs.enter("t1", ThreadRunPolicy.WAIT)
+    second = asyncio.create_task(runs.enter("t1", ThreadRunPolicy.WAIT))
+    other = await runs.enter("t2", ThreadRunPolicy.WAIT)
+    await asyncio.sleep(0.01)
+    assert not second.done()
+
+    await first.release()
+    slot = await second
+    assert not slot.attached
+    assert first.run.finished
+    await slot.release()
+    await other.release()
+    assert not runs._locks
+
+
+@pytest.mark.asyncio
+async def test_wait_times_out_as_busy() -> None:
+    runs = ThreadRuns(wait_timeout_seconds=0.05)
+    first = await runs.enter("t1", ThreadRunPolicy.WAIT)
+    with pytest.raises(ThreadBusyError):
+        await runs.enter("t1", ThreadRunPolicy.WAIT)
+    await first.release()
+    await (await runs.enter("t1", ThreadRunPolicy.WAIT)).release()
+
+
+@pytest.mark.asyncio
+async def test_reject_and_attach() -> None:
+    runs = ThreadRuns(wait_timeout_seconds=1)
+    first = await runs.enter("t1", ThreadRunPolicy.REJECT)
+    with pytest.raises(ThreadBusyError):
+        await runs.enter("t1", ThreadRunPolicy.REJECT)
+
+    first.run.publish("a")
+    attached = await runs.enter("t1", ThreadRunPolicy.ATTACH)
+    assert attached.attached
+    assert attached.run is first.run
+
+    async def follow() -> list[str]:
+        return [event async for event in attached.run.follow()]
+
+    followed = asyncio.create_task(follow())
+    await asyncio.sleep(0.01)
+    first.run.publish("b")
+    await first.release()
+    assert await followed == ["a", "b"]
+
+
+@pytest_asyncio.fixture
+async def leases(tmp_path):
+    async with SqliteThreadLeases.from_conn_string(str(tmp_path / "leases.db"), 30) as leases:
+        await leases.setup()
+        yield leases
+
+
+@pytest.mark.asyncio
+async def test_leases_serialize_processes(leases) -> None:
+    process_a = ThreadRuns(wait_timeout_seconds=1, leases=leases, poll_seconds=0.01)
+    process_b = ThreadRuns(wait_timeout_seconds=0.1, leases=leases, poll_seconds=0.01)
+    first = await process_a.enter("t1", ThreadRunPolicy.WAIT)
+    assert await leases.aheld("t1")
+
+    with pytest.raises(ThreadBusyError):
+        await process_b.enter("t1", ThreadRunPolicy.REJECT)
+    with pytest.raises(ThreadBusyError):
+        await process_b.enter("t1", ThreadRunPolicy.WAIT)
+
+    attached = await process_b.enter("t1", ThreadRunPolicy.ATTACH)
+    assert attached.attached
+    assert len(process_b._watchers) == 1
+    waiting = asyncio.create_task(process_b.enter("t1", ThreadRunPolicy.WAIT))
+    await first.release()
+    await asyncio.wait_for(attached.run.wait(), 1)
+    second = await waiting
+    assert not process_b._watchers
+    assert not second.attached
+    await second.release()
+    assert not await leases.aheld("t1")
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_taken_over(leases) -> None:
+    leases.ttl_seconds = 0
+    # Held by a process that crashed and stopped renewing it
+    assert await leases.atry_acquire("t1", "crashed-process")
+    await asyncio.sleep(0.01)
+    assert await leases.atry_acquire("t1", "other-process")